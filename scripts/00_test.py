@@ -1,17 +1,17 @@
-import json
-from collections import defaultdict
+import numpy as np
+from utils.feature_store import FeatureStore
 
-JSONL_PATH = "mfcc_data/mfcc_data_ultracleaned.jsonl"
+STORE_PATH = "mfcc_data/mfcc_store"
 TARGET_SOURATE = 112
 
-counts = defaultdict(int)
+store = FeatureStore(STORE_PATH, create=False)
+meta = store.meta()
 
-with open(JSONL_PATH, "r", encoding="utf-8") as f:
-    for line in f:
-        entry = json.loads(line)
-        if entry["sourate"] == TARGET_SOURATE:
-            counts[entry["imam"]] += 1
+# 🔢 Comptage vectorisé sur la colonne imam des entrées de la sourate
+imam_ids = meta[meta[:, 1] == TARGET_SOURATE, 0]
+counts = np.bincount(imam_ids, minlength=len(store.dictionaries["imam"]))
 
 print(f"📊 Nombre d'échantillons pour la sourate {TARGET_SOURATE} :")
-for imam, count in sorted(counts.items(), key=lambda x: -x[1]):
-    print(f"  {imam:<30} : {count}")
+for idx in np.argsort(-counts):
+    if counts[idx]:
+        print(f"  {store.dictionaries['imam'][idx]:<30} : {counts[idx]}")
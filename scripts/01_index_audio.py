@@ -1,109 +1,189 @@
 import os
-import librosa
-import numpy as np
-import json
-import gc
-import concurrent.futures
+import hashlib
+import argparse
 from concurrent.futures import ProcessPoolExecutor
-from opensearchpy import OpenSearch
-
-# 🔹 Connexion à OpenSearch
-client = OpenSearch(
-    hosts=[{"host": "localhost", "port": 9200}],
-    http_auth=("admin", "MonSuperMotDePasse123!"),
-    use_ssl=True,
-    verify_certs=True,
-    ca_certs="/etc/opensearch/certs/ca.crt",
-    ssl_show_warn=False,
-)
-
-# 🔹 Vérification de la connexion
-print(client.info())
+from time import perf_counter
+from tqdm import tqdm
+from utils.mfcc import extract_mfcc_from_file
+from utils.feature_store import FeatureStore
 
 # 🔹 Chemins et configurations
-index_name = "quran_audio"
-base_path = "/mnt/e/DIN/data"
-mfcc_output_file = "/mfcc_data/mfcc_data.jsonl"
-BATCH_SIZE = 50  # Réduction pour éviter les crashs
-
-# 🔹 Vérifier si l’index existe
-if not client.indices.exists(index=index_name):
-    print(f"❌ Erreur : L'index {index_name} n'existe pas. Crée-le avant d'indexer.")
-    exit()
-
-# 🔹 Récupération des fichiers déjà indexés
-indexed_files = set()
-query = {"size": 10000, "_source": ["file_path"]}
-response = client.search(index=index_name, body=query)
-if "hits" in response and "hits" in response["hits"]:
-    for doc in response["hits"]["hits"]:
-        indexed_files.add(doc["_source"]["file_path"])
-
-print(f"👂 {len(indexed_files)} fichiers déjà indexés.")
-
-# 🔹 Fonction pour traiter un fichier audio
-def process_audio(file_path, imam, sourate):
-    try:
-        file_size = os.path.getsize(file_path) / (1024 * 1024)  # Convertir en Mo
-        print(f"📂 Traitement en cours : {file_path} ({file_size:.2f} Mo)")
-
-        # Chargement du fichier audio
-        y, sr = librosa.load(file_path, sr=None)
-
-        # Extraction des MFCCs
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        mfcc_mean = np.mean(mfcc, axis=1).tolist()
-
-        # Stocker dans un fichier JSONL
-        with open(mfcc_output_file, "a") as f:
-            json.dump({"imam": imam, "sourate": sourate, "file_path": file_path, "mfcc": mfcc_mean}, f)
-            f.write("\n")
-
-        # 🔹 Indexation dans OpenSearch
-        document = {
-            "imam": imam,
-            "sourate": sourate,
-            "file_path": file_path
-        }
-        client.index(index=index_name, body=document)
-
-        print(f"✅ Indexé : {file_path}")
-        return True
-    except Exception as e:
-        print(f"⚠️ Erreur lors du traitement de {file_path} : {e}")
-        return False
-
-# 🔹 Liste des fichiers à indexer
-files_to_process = []
-for imam in os.listdir(base_path):
-    imam_path = os.path.join(base_path, imam)
-    if os.path.isdir(imam_path):
-        for filename in os.listdir(imam_path):
+INDEX_NAME = "quran_audio"
+BASE_PATH = "/mnt/e/DIN/data"
+STORE_PATH = "mfcc_data/mfcc_store"
+OPENSEARCH_HOST = os.environ.get("OPENSEARCH_HOST", "localhost")
+OPENSEARCH_PORT = int(os.environ.get("OPENSEARCH_PORT", 9200))
+OPENSEARCH_USER = os.environ.get("OPENSEARCH_USER", "admin")
+OPENSEARCH_CA_CERTS = os.environ.get("OPENSEARCH_CA_CERTS", "/etc/opensearch/certs/ca.crt")
+
+SCAN_SIZE = 1000                    # documents par page de scroll (reprise)
+CHUNK_SIZE = 500                    # documents par requête _bulk
+MAX_CHUNK_BYTES = 10 * 1024 * 1024  # plafond d'une requête _bulk
+BULK_THREADS = 2                    # requêtes _bulk en vol (parallel_bulk)
+MAX_WORKERS = os.cpu_count() or 4   # processus de décodage / extraction MFCC
+WRITE_BATCH = 512                   # lignes accumulées avant un append au feature store
+
+
+def make_client(stub=False):
+    """
+    Client OpenSearch créé à la demande (plus à l'import). Le mot de passe vient de
+    OPENSEARCH_ADMIN_PWD, comme pour docker-compose. stub=True : stand-in en mémoire.
+    """
+    if stub:
+        from utils.opensearch_stub import InMemoryOpenSearch
+        client = InMemoryOpenSearch()
+        client.indices.create(index=INDEX_NAME)
+        return client
+
+    from opensearchpy import OpenSearch
+    password = os.environ.get("OPENSEARCH_ADMIN_PWD")
+    if not password:
+        raise SystemExit("❌ Variable OPENSEARCH_ADMIN_PWD manquante.")
+    return OpenSearch(
+        hosts=[{"host": OPENSEARCH_HOST, "port": OPENSEARCH_PORT}],
+        http_auth=(OPENSEARCH_USER, password),
+        use_ssl=True,
+        verify_certs=True,
+        ca_certs=OPENSEARCH_CA_CERTS,
+        ssl_show_warn=False,
+    )
+
+
+def indexed_paths(client, index=INDEX_NAME, scan_size=SCAN_SIZE):
+    """
+    Chemins déjà indexés, via scroll (helpers.scan) : aucune limite à 10 000 documents.
+    """
+    from opensearchpy import helpers
+    query = {"_source": ["file_path"], "query": {"match_all": {}}}
+    return {
+        hit["_source"]["file_path"]
+        for hit in helpers.scan(client, index=index, query=query, size=scan_size, scroll="5m")
+        if "file_path" in hit.get("_source", {})
+    }
+
+
+def collect_files(base_path, skip):
+    files = []
+    for imam in sorted(os.listdir(base_path)):
+        imam_path = os.path.join(base_path, imam)
+        if not os.path.isdir(imam_path):
+            continue
+        for filename in sorted(os.listdir(imam_path)):
             if filename.endswith(".mp3") or filename.endswith(".wav"):
                 file_path = os.path.join(imam_path, filename)
-                if file_path not in indexed_files:
-                    try:
-                        sourate = int(filename.split("-")[0])
-                        files_to_process.append((file_path, imam, sourate))
-                    except ValueError:
-                        print(f"⚠️ Nom de fichier invalide ignoré : {filename}")
-
-print(f"🚀 {len(files_to_process)} fichiers à indexer.")
-
-# 🔹 Traitement par batch
-for i in range(0, len(files_to_process), BATCH_SIZE):
-    batch = files_to_process[i:i + BATCH_SIZE]
-    print(f"💧 Traitement du batch {i//BATCH_SIZE + 1}/{len(files_to_process)//BATCH_SIZE + 1}...")
-
-    with ProcessPoolExecutor() as executor:
-        future_to_file = {executor.submit(process_audio, *args): args for args in batch}
-        for future in concurrent.futures.as_completed(future_to_file, timeout=120):  # Timeout de 120 sec max
-            try:
-                future.result()
-            except Exception as e:
-                print(f"⚠️ Erreur lors du traitement de {future_to_file[future]} : {e}")
-
-    # 🔹 Libération de la mémoire après chaque batch
-    gc.collect()
-
-print("🚀 Indexation terminée !")
+                if file_path in skip:
+                    continue
+                try:
+                    sourate = int(filename.split("-")[0])
+                    files.append((file_path, imam, sourate))
+                except ValueError:
+                    print(f"⚠️ Nom de fichier invalide ignoré : {filename}")
+    return files
+
+
+def doc_id(file_path):
+    """_id déterministe : réindexer un fichier remplace son document au lieu de le dupliquer."""
+    return hashlib.sha1(file_path.encode("utf-8")).hexdigest()
+
+
+# 🔧 Worker : décodage + MFCC seulement (aucun client, aucune écriture)
+def extract(task):
+    file_path, imam, sourate = task
+    start = perf_counter()
+    _, mfcc, error = extract_mfcc_from_file(file_path, use_cache=True)
+    return task, mfcc, error, perf_counter() - start
+
+
+def index_actions(results, store, stats, pbar, index=INDEX_NAME):
+    """
+    Transforme les résultats des workers en actions _bulk. C'est aussi l'unique
+    writer du feature store : un seul thread consomme ce générateur.
+    """
+    existing = store.key_set()
+    pending = []
+    for (file_path, imam, sourate), mfcc, error, seconds in results:
+        pbar.update(1)
+        stats["extract_seconds"] += seconds
+        if error:
+            stats["errors"] += 1
+            tqdm.write(f"⚠️ Erreur lors du traitement de {file_path} : {error}")
+            continue
+
+        key = store.encode_key(imam, sourate, file_path, "original", add=True)
+        if key not in existing:
+            existing.add(key)
+            pending.append({"imam": imam, "sourate": sourate, "file_path": file_path,
+                            "augmentation": "original", "mfcc": mfcc})
+            if len(pending) >= WRITE_BATCH:
+                store.append(pending)
+                pending = []
+
+        yield {
+            "_op_type": "index",
+            "_index": index,
+            "_id": doc_id(file_path),
+            "_source": {"imam": imam, "sourate": sourate, "file_path": file_path},
+        }
+    store.append(pending)
+
+
+def run(client, files, store, workers=MAX_WORKERS, chunk_size=CHUNK_SIZE, threads=BULK_THREADS):
+    from opensearchpy import helpers
+
+    stats = {"indexed": 0, "failed": 0, "errors": 0, "extract_seconds": 0.0}
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            tqdm(total=len(files), desc="Indexation", dynamic_ncols=True) as pbar:
+        results = executor.map(extract, files, chunksize=4)
+        actions = index_actions(results, store, stats, pbar)
+        for ok, item in helpers.parallel_bulk(
+            client, actions, thread_count=threads, chunk_size=chunk_size,
+            max_chunk_bytes=MAX_CHUNK_BYTES, raise_on_error=False,
+        ):
+            if ok:
+                stats["indexed"] += 1
+            else:
+                stats["failed"] += 1
+                tqdm.write(f"⚠️ Échec d'indexation : {item}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexation OpenSearch des fichiers audio (bulk, reprise)")
+    parser.add_argument("--base-path", default=BASE_PATH)
+    parser.add_argument("--store", default=STORE_PATH, help="Feature store des MFCC (sidecar)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--bulk-threads", type=int, default=BULK_THREADS)
+    parser.add_argument("--stub", action="store_true", help="Stand-in OpenSearch en mémoire (sans cluster)")
+    args = parser.parse_args()
+
+    client = make_client(stub=args.stub)
+    print(client.info())
+
+    # 🔹 Vérifier si l’index existe
+    if not client.indices.exists(index=INDEX_NAME):
+        print(f"❌ Erreur : L'index {INDEX_NAME} n'existe pas. Crée-le avant d'indexer.")
+        return
+
+    # 🔹 Reprise : tous les fichiers déjà indexés (scroll)
+    indexed_files = indexed_paths(client)
+    print(f"👂 {len(indexed_files)} fichiers déjà indexés.")
+
+    files = collect_files(args.base_path, indexed_files)
+    print(f"🚀 {len(files)} fichiers à indexer ({args.workers} processus, _bulk par {args.chunk_size}).")
+    if not files:
+        return
+
+    store = FeatureStore(args.store, dim=26)
+    start = perf_counter()
+    stats = run(client, files, store, workers=args.workers, chunk_size=args.chunk_size, threads=args.bulk_threads)
+    elapsed = perf_counter() - start
+
+    decode_rate = len(files) * args.workers / stats["extract_seconds"] if stats["extract_seconds"] else 0.0
+    print(f"\n✅ {stats['indexed']} indexés, {stats['failed']} échecs d'indexation, {stats['errors']} erreurs audio.")
+    print(f"⚡ {len(files) / elapsed:.1f} fichiers/s (plafond décodage ≈ {decode_rate:.1f} fichiers/s)")
+    print("🚀 Indexation terminée !")
+
+
+if __name__ == "__main__":
+    main()
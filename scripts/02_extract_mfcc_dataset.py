@@ -1,147 +1,159 @@
 import os
-import json
-import librosa
-import scipy.signal
-import numpy as np
-from concurrent.futures import ThreadPoolExecutor
-from threading import Lock
+import queue
+import threading
+from itertools import groupby
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
-from utils.mfcc import extract_mfcc_from_audio
+from utils.augment import AugmentationEngine, DEFAULT_AUGMENTATIONS, dataset_features
+from utils.feature_store import FeatureStore
 
 # 📁 Chemins
 AUDIO_BASE_PATH = "/mnt/e/DIN/data"
-OUTPUT_JSONL = "mfcc_data/mfcc_data_augmented.jsonl"
-MAX_WORKERS = 4
-os.makedirs("mfcc_data", exist_ok=True)
-
-# 🔧 Augmentations
-def apply_pitch_shift(y, sr): return librosa.effects.pitch_shift(y=y, sr=sr, n_steps=2)
-def apply_time_stretch(y, sr): return librosa.effects.time_stretch(y, rate=1.1)
-def apply_white_noise(y, sr): return y + 0.005 * np.random.randn(len(y))
-def apply_low_pass_filter(y, sr):
-    b, a = scipy.signal.butter(6, 0.1, btype='low', analog=False)
-    return scipy.signal.lfilter(b, a, y)
-def apply_random_gain(y, sr):
-    gain = np.random.uniform(0.7, 1.3)
-    return y * gain
-def apply_background_noise(y, sr):
-    noise = np.random.normal(0, 0.003, len(y))
-    return y + noise
-from scipy.signal import fftconvolve
-def apply_reverb(y, sr):
-    impulse = np.zeros_like(y)
-    impulse[0] = 1.0
-    impulse[5000:] += 0.5 * np.random.randn(len(y) - 5000)
-    return fftconvolve(y, impulse, mode='full')[:len(y)]
-
-# 🎛️ Registre des augmentations
-AUGMENTATIONS = {
-    "original": lambda y, sr: y,
-    "pitch_shift": apply_pitch_shift,
-    "time_stretch": apply_time_stretch,
-    "white_noise": apply_white_noise,
-    "reverb": apply_reverb,
-    "low_pass_filter": apply_low_pass_filter,
-    "random_gain": apply_random_gain,
-    "background_noise": apply_background_noise,
-}
-
-# 🧠 Charger les clés déjà présentes
-existing_keys = set()
-if os.path.exists(OUTPUT_JSONL):
-    with open(OUTPUT_JSONL, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                data = json.loads(line.strip())
-                key = (data["imam"], data["sourate"], data["file_path"], data["augmentation"])
-                existing_keys.add(key)
-            except json.JSONDecodeError:
-                continue
-
-# 🔐 Verrou pour accès au fichier
-write_lock = Lock()
-mfcc_counter = 0  # Compteur global
-
-# 🔧 Fonction de traitement
-def process_file(file_info):
-    global mfcc_counter
-    file_path, imam, sourate = file_info
-
+STORE_PATH = "mfcc_data/mfcc_store"
+MAX_WORKERS = os.cpu_count() or 4
+WRITE_BATCH = 512     # lignes accumulées par le writer avant un append
+QUEUE_SIZE = 64       # lots de résultats en attente d'écriture
+WRITER_POLL_S = 1.0   # attente maximale d'un put avant de vérifier que le writer tourne encore
+
+# 🎛️ Augmentations : moteur partagé (un seul STFT/mel pour gain, bruit et masques,
+# filtres et réponses impulsionnelles précalculés pour les autres)
+AUGMENTATIONS = DEFAULT_AUGMENTATIONS
+ENGINE = AugmentationEngine()
+
+# 🔧 Fonction de traitement (exécutée dans un processus worker)
+def process_file(task):
+    """
+    Calcule les augmentations manquantes d'un fichier (cache disque d'abord, décodage seulement si besoin).
+    Retourne (lot de résultats, erreurs) sans toucher au store : seul le writer écrit.
+    """
+    file_path, imam, sourate, aug_names = task
+    features, error = dataset_features(file_path, aug_names, ENGINE)
+    if error:
+        return [], [error]
+
+    results = [
+        {
+            "imam": imam,
+            "sourate": sourate,
+            "file_path": file_path,
+            "augmentation": aug_name,
+            "mfcc": features[aug_name].tolist()
+        }
+        for aug_name in aug_names
+    ]
+    return results, []
+
+
+# ✍️ Writer unique : reçoit les lots par une file et écrit dans le store
+def writer_loop(store, results_queue, stats):
     try:
-        y, sr = librosa.load(file_path, sr=None)
+        pending = []
+        while True:
+            batch = results_queue.get()
+            if batch is None:
+                break
+            pending.extend(batch)
+            if len(pending) >= WRITE_BATCH:
+                store.append(pending)
+                stats["written"] += len(pending)
+                pending = []
+        store.append(pending)
+        stats["written"] += len(pending)
     except Exception as e:
-        tqdm.write(f"❌ Erreur chargement : {file_path} → {e}")
-        return
+        # Erreur d'écriture (dimension, disque...) : conservée pour le thread principal
+        stats["error"] = e
 
-    for aug_name, aug_func in AUGMENTATIONS.items():
-        key = (imam, sourate, file_path, aug_name)
-        if key in existing_keys:
-            continue
 
+def put_result(results_queue, item, writer, stats):
+    """put bloquant, mais jamais indéfiniment : lève l'erreur du writer s'il s'est arrêté."""
+    while True:
+        if stats["error"] is not None or not writer.is_alive():
+            raise RuntimeError("❌ Le writer du store s'est arrêté") from stats["error"]
         try:
-            y_aug = aug_func(y, sr)
-            mfcc_mean = extract_mfcc_from_audio(y=y_aug, sr=sr)
-
-            result = {
-                "imam": imam,
-                "sourate": sourate,
-                "file_path": file_path,
-                "augmentation": aug_name,
-                "mfcc": mfcc_mean
-            }
-
-            with write_lock:
-                with open(OUTPUT_JSONL, "a", encoding="utf-8") as f_out:
-                    f_out.write(json.dumps(result) + "\n")
-                existing_keys.add(key)
-                mfcc_counter += 1
-
-        except Exception as e:
-            tqdm.write(f"❌ Erreur augmentation ({aug_name}) : {file_path} → {e}")
-
-# 📂 Collecte des fichiers audio
-files_to_process = []
-for imam in os.listdir(AUDIO_BASE_PATH):
-    imam_path = os.path.join(AUDIO_BASE_PATH, imam)
-    if not os.path.isdir(imam_path):
-        continue
-    for filename in os.listdir(imam_path):
-        if filename.endswith(".mp3") or filename.endswith(".wav"):
-            file_path = os.path.join(imam_path, filename)
-            try:
-                sourate = int(filename.split("-")[0])
-                files_to_process.append((file_path, imam, sourate))
-            except ValueError:
-                print(f"⚠️ Fichier ignoré : {filename}")
-
-print(f"🚀 Lancement du traitement sur {len(files_to_process)} fichiers audio...")
-
-# 🔄 Exécution multi-thread + barre de progression
-with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-    with tqdm(total=len(files_to_process), desc="Traitement des fichiers", dynamic_ncols=True) as pbar:
-
-        def wrapper(file_info):
-            process_file(file_info)
-            pbar.update(1)
-
-        list(executor.map(wrapper, files_to_process))
-
-print(f"\n✅ Tous les fichiers traités.")
-print(f"📊 Nombre total de MFCCs extraits : {mfcc_counter}")
-
-# 🧹 Tri du fichier JSONL final
-print("🔄 Tri du fichier JSONL final...")
-
-with open(OUTPUT_JSONL, "r", encoding="utf-8") as f:
-    lines = [json.loads(line.strip()) for line in f if line.strip()]
-
-sorted_lines = sorted(
-    lines,
-    key=lambda x: (x["imam"], int(x["sourate"]), x["augmentation"])
-)
+            results_queue.put(item, timeout=WRITER_POLL_S)
+            return
+        except queue.Full:
+            continue
 
-with open(OUTPUT_JSONL, "w", encoding="utf-8") as f:
-    for line in sorted_lines:
-        f.write(json.dumps(line) + "\n")
 
-print("✅ Fichier trié par imam, sourate, augmentation.")
+def collect_files(base_path):
+    files = []
+    for imam in os.listdir(base_path):
+        imam_path = os.path.join(base_path, imam)
+        if not os.path.isdir(imam_path):
+            continue
+        for filename in os.listdir(imam_path):
+            if filename.endswith(".mp3") or filename.endswith(".wav"):
+                file_path = os.path.join(imam_path, filename)
+                try:
+                    sourate = int(filename.split("-")[0])
+                    files.append((file_path, imam, sourate))
+                except ValueError:
+                    print(f"⚠️ Fichier ignoré : {filename}")
+    return files
+
+
+def main():
+    os.makedirs("mfcc_data", exist_ok=True)
+
+    # 🧠 Clés déjà présentes (index entier du store, pas de parsing JSON)
+    store = FeatureStore(STORE_PATH, dim=26)
+    existing_keys = store.key_set()
+
+    # 📂 Tâches triées par clé : seules les augmentations manquantes sont demandées
+    tasks = []
+    for file_path, imam, sourate in sorted(collect_files(AUDIO_BASE_PATH), key=lambda f: (f[1], f[2], f[0])):
+        missing = [
+            aug for aug in sorted(AUGMENTATIONS)
+            if not store.has_key(existing_keys, imam, sourate, file_path, aug)
+        ]
+        if missing:
+            tasks.append((file_path, imam, sourate, missing))
+
+    print(f"🚀 Lancement du traitement sur {len(tasks)} fichiers audio ({MAX_WORKERS} processus)...")
+
+    results_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    stats = {"written": 0, "error": None}
+    writer = threading.Thread(target=writer_loop, args=(store, results_queue, stats), daemon=True)
+    writer.start()
+
+    # 🔄 Extraction multi-processus ; executor.map rend les résultats dans l'ordre des tâches.
+    # Les fichiers d'un même (imam, sourate) sont regroupés puis émis par augmentation :
+    # la sortie d'un nouveau run est déjà ordonnée par (imam, sourate, augmentation).
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        with tqdm(total=len(tasks), desc="Traitement des fichiers", dynamic_ncols=True) as pbar:
+            outputs = executor.map(process_file, tasks, chunksize=2)
+            try:
+                for _, group in groupby(zip(tasks, outputs), key=lambda t: (t[0][1], t[0][2])):
+                    group_results = []
+                    for _, (results, errors) in group:
+                        for error in errors:
+                            tqdm.write(error)
+                        group_results.extend(results)
+                        pbar.update(1)
+                    group_results.sort(key=lambda r: r["augmentation"])
+                    put_result(results_queue, group_results, writer, stats)
+            except RuntimeError:
+                # Writer arrêté : inutile de finir l'extraction des fichiers restants
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    put_result(results_queue, None, writer, stats)
+    writer.join()
+    if stats["error"] is not None:
+        raise stats["error"]
+
+    print(f"\n✅ Tous les fichiers traités.")
+    print(f"📊 Nombre total de MFCCs extraits : {stats['written']}")
+
+    # 🧹 Tri final seulement si nécessaire (reprise) : tri des métadonnées,
+    # features réécrites par blocs depuis le memmap, sans charger le dataset en RAM
+    print("🔄 Vérification de l'ordre du store...")
+    if store.sort_by_key():
+        print("✅ Store trié par imam, sourate, augmentation.")
+    else:
+        print("✅ Store déjà ordonné, aucun tri nécessaire.")
+
+
+if __name__ == "__main__":
+    main()
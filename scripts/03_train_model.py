@@ -1,67 +1,57 @@
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
-import json
 import numpy as np
 import matplotlib
 matplotlib.use('Agg')
 
 import matplotlib.pyplot as plt
 
-from sklearn.model_selection import train_test_split
 from keras.models import Sequential
 from keras.layers import Dense, Conv1D, MaxPooling1D, Flatten, Dropout, BatchNormalization, GlobalAveragePooling1D
-from keras.utils import to_categorical
 from keras.callbacks import EarlyStopping
-from collections import Counter
+from utils.feature_store import FeatureStore
+from utils.tf_dataset import export_shards, shards_are_fresh, load_shards_config, make_dataset, SHARDS_PATH
 
 # 📁 Chemin des données
-JSONL_PATH = "mfcc_data/mfcc_data_v2.jsonl"
-
-# 📥 Chargement et filtrage des données
-X, y_labels = [], []
-with open(JSONL_PATH, "r", encoding="utf-8") as f:
-    for line in f:
-        data = json.loads(line)
-        mfcc = data["mfcc"]
-
-        # ⚠️ On ignore les entrées incorrectes
-        if len(mfcc) != 26:
-            continue
-
-        # Facultatif : filtrer les extraits courts uniquement
-        if "augmentation" in data and data["augmentation"] == "original":
-            continue
-
-        X.append(mfcc)
-        y_labels.append(data["imam"])
-
-print(f"✅ Données chargées : {len(X)} échantillons valides.")
-
-# 🎯 Vérification de la distribution
-counter = Counter(y_labels)
+STORE_PATH = "mfcc_data/mfcc_store"
+FEATURE_DIM = 26
+BATCH_SIZE = 64
+SHUFFLE_BUFFER = 65536
+
+# Facultatif : filtrer les extraits courts uniquement
+EXCLUDED_AUGMENTATIONS = ("original",)
+
+# 📦 Shards binaires (export seulement si le store a changé depuis le dernier export)
+store = FeatureStore(STORE_PATH, create=False)
+if not shards_are_fresh(store, SHARDS_PATH):
+    print(f"📦 Export du store ({len(store)} lignes) en shards → {SHARDS_PATH}...")
+    export_shards(store, SHARDS_PATH)
+config = load_shards_config(SHARDS_PATH)
+unique_labels = config["labels"]
+
+# 🎯 Vérification de la distribution (métadonnées seules, aucun vecteur chargé)
+meta = store.meta()
+keep = ~np.isin(meta[:, 3], [store.code("augmentation", a) for a in EXCLUDED_AUGMENTATIONS])
+counts = np.bincount(meta[keep, 0], minlength=len(store.dictionaries["imam"]))
+print(f"✅ Données : {int(keep.sum())} échantillons valides.")
 print("\n📊 Répartition des imams :")
-for imam, count in sorted(counter.items()):
-    print(f"  ➤ {imam:<25} : {count}")
-
-# 🏷️ Encodage des labels
-unique_labels = sorted(list(set(y_labels)))
-label_to_index = {label: idx for idx, label in enumerate(unique_labels)}
-y = np.array([label_to_index[label] for label in y_labels])
-y = to_categorical(y, num_classes=len(unique_labels))
-
-# 🔄 Mise en forme pour CNN
-X = np.array(X)
-X = np.expand_dims(X, axis=-1)
-
-# ✂️ Split train / test
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, stratify=y, random_state=42
-)
+for idx in np.argsort(store.dictionaries["imam"]):
+    if counts[idx]:
+        print(f"  ➤ {store.dictionaries['imam'][idx]:<25} : {counts[idx]}")
+
+# 🚚 Streaming tf.data : interleave des shards, filtre dim / augmentation, shuffle, prefetch.
+# ✂️ Split train / test par fichier : les augmentations d'un enregistrement ne sont
+# jamais partagées entre train et test (voir utils/check_doublons.py pour la fuite mesurée)
+train_ds = make_dataset("train", SHARDS_PATH, batch_size=BATCH_SIZE, dim=FEATURE_DIM,
+                        exclude_augmentations=EXCLUDED_AUGMENTATIONS, shuffle_buffer=SHUFFLE_BUFFER)
+test_ds = make_dataset("test", SHARDS_PATH, batch_size=BATCH_SIZE, dim=FEATURE_DIM,
+                       exclude_augmentations=EXCLUDED_AUGMENTATIONS)
+print(f"✂️ Split : {config['splits']['train']['rows']} train / {config['splits']['test']['rows']} test (toutes augmentations)")
 
 # 🧠 Définition du modèle CNN (amélioré)
 model = Sequential([
-    Conv1D(64, kernel_size=3, activation='relu', input_shape=(X.shape[1], 1), padding='same'),
+    Conv1D(64, kernel_size=3, activation='relu', input_shape=(FEATURE_DIM, 1), padding='same'),
     BatchNormalization(),
     MaxPooling1D(pool_size=2),
 
@@ -79,23 +69,22 @@ model = Sequential([
     Dense(len(unique_labels), activation='softmax')
 ])
 
-model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
 
 # ⏱️ EarlyStopping
 early_stop = EarlyStopping(monitor="val_loss", patience=5, restore_best_weights=True)
 
 # 🚀 Entraînement
 history = model.fit(
-    X_train, y_train,
-    validation_data=(X_test, y_test),
+    train_ds,
+    validation_data=test_ds,
     epochs=50,
-    batch_size=64,
     callbacks=[early_stop],
     verbose=2
 )
 
 # 🎯 Évaluation finale
-loss, accuracy = model.evaluate(X_test, y_test)
+loss, accuracy = model.evaluate(test_ds)
 print(f"\n🎯 Précision test : {accuracy * 100:.2f}%")
 
 # 💾 Sauvegarde
@@ -0,0 +1,17 @@
+############### BUILD CORPUS CORAN + INDEX ###############
+
+from time import time
+from utils.quran_corpus import build_corpus, get_corpus, QURAN_VERSES_PATH, CORPUS_PATH
+from utils.verse_index import VerseIndex, INDEX_PATH
+
+# 📦 Corpus binaire (texte normalisé + bornes des fenêtres)
+start = time()
+build_corpus(QURAN_VERSES_PATH, CORPUS_PATH)
+corpus = get_corpus(CORPUS_PATH)
+print(f"✅ Corpus écrit : {CORPUS_PATH} ({corpus.n_suras} sourates, {corpus.n_verses} versets, "
+      f"{corpus.n_windows} fenêtres) en {time() - start:.2f}s")
+
+# 🔎 Index n-gramme
+start = time()
+VerseIndex.build(corpus).save(INDEX_PATH)
+print(f"✅ Index écrit : {INDEX_PATH} en {time() - start:.2f}s")
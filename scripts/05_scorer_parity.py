@@ -0,0 +1,67 @@
+############### PARITÉ DES SCORERS (difflib vs rapidfuzz) ###############
+
+import os
+import json
+from time import perf_counter
+from detect_versets import load_versets, detect_top_versets
+from utils.scoring import get_scorer
+from utils.synthetic import sample_transcriptions
+
+QURAN_VERSES_PATH = "quran_versets.json"
+REPORT_PATH = "output/scorer_parity.json"
+N_QUERIES = 30
+EXHAUSTIVE = True  # True = toutes les fenêtres, False = candidats de l'index
+
+corpus = load_versets(QURAN_VERSES_PATH)
+queries = sample_transcriptions(corpus, N_QUERIES)
+backends = {name: get_scorer(name) for name in ("difflib", "rapidfuzz")}
+
+# 🔁 Top-1 de chaque backend sur les mêmes requêtes
+results = {name: [] for name in backends}
+timings = {name: 0.0 for name in backends}
+for text, _ in queries:
+    for name, scorer in backends.items():
+        start = perf_counter()
+        best = detect_top_versets([{"text": text}], corpus, top_k=1, scorer=scorer, exhaustive=EXHAUSTIVE)[0]
+        timings[name] += perf_counter() - start
+        results[name].append(best)
+
+def span_of(match):
+    return (match["sourate_id"], match["start_verse"], match["end_verse"])
+
+def expected_span(span):
+    return (corpus.sourate_id(corpus.sourate_of(span[0])), corpus.verse_id(span[0]), corpus.verse_id(span[1]))
+
+agree = sum(span_of(a) == span_of(b) for a, b in zip(results["difflib"], results["rapidfuzz"]))
+report = {
+    "n_queries": len(queries),
+    "exhaustive": EXHAUSTIVE,
+    "top1_agreement": agree / len(queries),
+    "mean_abs_score_diff": sum(
+        abs(a["similarity"] - b["similarity"]) for a, b in zip(results["difflib"], results["rapidfuzz"])
+    ) / len(queries),
+    "backends": {
+        name: {
+            "top1_accuracy": sum(
+                span_of(m) == expected_span(span) for m, (_, span) in zip(results[name], queries)
+            ) / len(queries),
+            "mean_latency_ms": 1000 * timings[name] / len(queries),
+        }
+        for name in backends
+    },
+}
+
+# 📊 Rapport
+print(f"📊 Parité sur {report['n_queries']} requêtes ({'exhaustif' if EXHAUSTIVE else 'index'}) :")
+print(f"  ➤ Accord top-1 difflib/rapidfuzz : {report['top1_agreement']:.1%}")
+print(f"  ➤ Écart moyen de score           : {report['mean_abs_score_diff']:.4f}")
+for name, stats in report["backends"].items():
+    print(f"  ➤ {name:<10} : précision top-1 {stats['top1_accuracy']:.1%} | {stats['mean_latency_ms']:.1f} ms/requête")
+
+os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+with open(REPORT_PATH, "w", encoding="utf-8") as f:
+    json.dump(report, f, indent=2)
+print(f"💾 Rapport sauvegardé : {REPORT_PATH}")
+
+for scorer in backends.values():
+    scorer.close()
@@ -0,0 +1,19 @@
+############### CONVERSION JSONL → FEATURE STORE ###############
+
+import sys
+from time import time
+from utils.feature_store import jsonl_to_store, FeatureStore, STORE_PATH
+
+JSONL_PATHS = sys.argv[1:] or ["mfcc_data/mfcc_data_augmented.jsonl"]
+
+for jsonl_path in JSONL_PATHS:
+    start = time()
+    print(f"🔄 Conversion de {jsonl_path} → {STORE_PATH}...")
+    stats = jsonl_to_store(jsonl_path, STORE_PATH)
+    print(f"  ➤ Ajoutées            : {stats['added']}")
+    print(f"  ➤ Déjà présentes      : {stats['skipped_existing']}")
+    print(f"  ➤ Mauvaise dimension  : {stats['skipped_dim']}")
+    print(f"  ➤ Lignes invalides    : {stats['invalid']}")
+    print(f"⏱️ {time() - start:.1f}s")
+
+print(f"\n✅ Store : {len(FeatureStore(STORE_PATH))} entrées dans {STORE_PATH}")
@@ -1,22 +1,16 @@
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 import sys
-import json
-import shutil
 import numpy as np
-import whisper
-import pickle
-
-from termcolor import colored
-from time import time, sleep
-from tensorflow.keras.models import load_model
-from sklearn.preprocessing import LabelEncoder
-from difflib import SequenceMatcher
-from rich.progress import Progress, BarColumn, TimeElapsedColumn, TextColumn
 
 # 🔁 Import utils
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from utils.mfcc import extract_mfcc_from_audio
+from utils.audio import load_audio_buffer, SAMPLE_RATE
+from utils.quran_corpus import get_corpus
+from utils.streaming_matcher import StreamingVerseMatcher
+from transcribe_audio import load_whisper_model, transcribe_audio
+from predict_imam import load_imam_model, load_label_encoder
 
 # 📍 Config
 AUDIO_PATH = "audios/Turkmensitan_03.mp3"
@@ -29,40 +23,24 @@ LABELS_PATH = "dataset/labels.json"
 SCORE_HIGH = 0.60
 SCORE_MEDIUM = 0.35
 WINDOW_SIZES = [1, 2, 3, 4, 5]
+SCORER = "rapidfuzz"  # "difflib" pour retrouver les scores historiques
 
-# 🧠 Chargement du Coran
-with open(QURAN_VERSES_PATH, "r", encoding="utf-8") as f:
-    versets = json.load(f)
-
-# 📚 Indexation des combinaisons versets
-combinations = []
-for sourate in versets:
-    verses = sourate["verses"]
-    for w in WINDOW_SIZES:
-        for i in range(len(verses) - w + 1):
-            segment = verses[i:i+w]
-            combined_text = " ".join(v["text"] for v in segment)
-            combinations.append({
-                "sourate_id": sourate["id"],
-                "sourate_name": sourate["name"],
-                "start_verse": segment[0]["id"],
-                "end_verse": segment[-1]["id"],
-                "verses": segment,
-                "text": combined_text
-            })
+# 🧠 Chargement du corpus précompilé (memory-mappé, déjà normalisé)
+corpus = get_corpus(source_path=QURAN_VERSES_PATH)
+matcher = StreamingVerseMatcher(
+    corpus, scorer=SCORER, window_sizes=WINDOW_SIZES,
+    score_high=SCORE_HIGH, score_medium=SCORE_MEDIUM
+)
 
 # 🔧 Nettoyage
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 print("🎧 Transcription (streaming)...")
-model_whisper = whisper.load_model("medium")
-result = model_whisper.transcribe(AUDIO_PATH, language="ar", verbose=False)
-segments = result["segments"]
-
-# 🔍 Analyse avec early stop + barre custom
-best_match = None
-best_score = 0.0
-transcription_progressive = ""
+audio = load_audio_buffer(AUDIO_PATH)  # décodé une seule fois pour Whisper et les MFCC
+model_whisper = load_whisper_model("medium")
+segments = transcribe_audio(audio, model=model_whisper)  # cache disque : Whisper sauté au 2e passage
 
+# 🔍 Analyse incrémentale avec early stop + barre custom
+from rich.progress import Progress, BarColumn, TimeElapsedColumn, TextColumn
 with Progress(
     TextColumn("🔍 Analyse audio...", justify="left"),
     BarColumn(bar_width=None, complete_style="bold magenta"),
@@ -72,28 +50,14 @@ with Progress(
     task = progress.add_task("analyse", total=len(segments))
 
     for segment in segments:
-        transcription_progressive += segment["text"]
-        current_text = transcription_progressive.strip()
-
-        for item in combinations:
-            score = SequenceMatcher(None, current_text, item["text"]).ratio()
-
-            if score > best_score:
-                best_score = score
-                best_match = {**item, "similarity": score}
-
-            # 🎯 Early stop conditions
-            individual_scores = [SequenceMatcher(None, current_text, v["text"]).ratio() for v in item["verses"]]
-            if any(s >= SCORE_HIGH for s in individual_scores):
-                progress.update(task, completed=len(segments))
-                break
-            for i in range(len(individual_scores) - 1):
-                if individual_scores[i] >= SCORE_MEDIUM and individual_scores[i+1] >= SCORE_MEDIUM:
-                    progress.update(task, completed=len(segments))
-                    break
-
+        # 🎯 Early stop : le matcher émet dès que le seuil de confiance est franchi
+        if matcher.feed(segment["text"]):
+            progress.update(task, completed=len(segments))
+            break
         progress.update(task, advance=1)
 
+best_match = matcher.emitted or matcher.best
+
 # 📊 Résultat final
 if best_match:
     print("\n🔍 Meilleur match :")
@@ -105,14 +69,12 @@ else:
     exit()
 
 # 🔊 Extraction MFCC + prédiction imam
-y, sr = whisper.audio.load_audio(AUDIO_PATH), whisper.audio.SAMPLE_RATE
-mfcc_values = extract_mfcc_from_audio(y, sr)
-model = load_model(MODEL_PATH)
+mfcc_values = extract_mfcc_from_audio(audio, SAMPLE_RATE)
+model = load_imam_model(MODEL_PATH)  # TensorFlow importé seulement ici (ou runtime .tflite)
 preds = model.predict(np.array([mfcc_values]))[0]
 
 # 🔎 Chargement des labels
-with open("dataset/label_encoder_imam.pkl", "rb") as f:
-    label_encoder = pickle.load(f)
+label_encoder = load_label_encoder("dataset/label_encoder_imam.pkl")
 
 # 🔝 TOP 3 imams
 top_indices = preds.argsort()[-3:][::-1]
@@ -120,7 +82,3 @@ print("\n👤 TOP 3 des imams les plus probables :")
 for idx in top_indices:
     imam = label_encoder.inverse_transform([idx])[0]
     print(f"  {imam:<30} : {preds[idx]*100:.1f}%")
-
-# 🧹 Nettoyage Whisper
-shutil.rmtree(os.path.expanduser("~/.cache/whisper"), ignore_errors=True)
-print("\n🧹 Cache Whisper supprimé.")
@@ -0,0 +1,89 @@
+############### PRÉDICTION IMAM PAR LOTS ###############
+
+import os
+import csv
+import json
+import argparse
+from time import perf_counter
+
+MODEL_PATH = "models/model_cnn_imam_v4.keras"
+LABEL_ENCODER_PATH = "dataset/label_encoder_imam.pkl"
+OUTPUT_PATH = "output/imam_predictions.jsonl"
+AUDIO_EXTENSIONS = (".mp3", ".wav")
+
+
+def collect_audio_files(inputs):
+    """
+    Liste triée des fichiers audio à partir de fichiers et/ou dossiers (parcours récursif).
+    """
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, n) for n in names if n.lower().endswith(AUDIO_EXTENSIONS))
+        else:
+            files.append(item)
+    return sorted(files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prédiction imam sur une liste ou un dossier de fichiers audio")
+    parser.add_argument("inputs", nargs="+", help="Fichiers audio et/ou dossiers")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="Fichier .jsonl ou .csv")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="Processus d'extraction MFCC (défaut : nb de cœurs)")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--model", default=MODEL_PATH, help="Modèle .keras ou .tflite (runtime léger)")
+    parser.add_argument("--labels", default=LABEL_ENCODER_PATH, help="Label encoder .pkl ou labels.json")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore le cache de features (cache/features)")
+    args = parser.parse_args()
+
+    # ⏳ Import tardif : les workers (spawn) n'importent pas TensorFlow
+    from predict_imam import predict_imam_batch
+
+    files = collect_audio_files(args.inputs)
+    print(f"🚀 {len(files)} fichiers audio à analyser...")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    as_csv = args.output.endswith(".csv")
+    n_ok, n_err = 0, 0
+    start = perf_counter()
+
+    with open(args.output, "w", encoding="utf-8", newline="") as f:
+        writer = None
+        if as_csv:
+            writer = csv.writer(f)
+            header = ["file_path", "error"]
+            for k in range(1, args.top_k + 1):
+                header += [f"imam_{k}", f"score_{k}"]
+            writer.writerow(header)
+
+        for result in predict_imam_batch(files, args.model, args.labels, top_k=args.top_k,
+                                         workers=args.workers, batch_size=args.batch_size,
+                                         use_cache=not args.no_cache):
+            if result["error"]:
+                n_err += 1
+                print(f"⚠️ Erreur : {result['file_path']} → {result['error']}")
+            else:
+                n_ok += 1
+
+            if as_csv:
+                row = [result["file_path"], result["error"] or ""]
+                for imam, score in result["top"]:
+                    row += [imam, f"{score:.6f}"]
+                writer.writerow(row)
+            else:
+                f.write(json.dumps({
+                    "file_path": result["file_path"],
+                    "top": [{"imam": imam, "score": score} for imam, score in result["top"]],
+                    "error": result["error"],
+                }, ensure_ascii=False) + "\n")
+
+    elapsed = perf_counter() - start
+    print(f"\n✅ Résultats sauvegardés : {args.output}")
+    print(f"📊 {n_ok} fichiers prédits, {n_err} erreurs en {elapsed:.1f}s "
+          f"→ {len(files) / max(elapsed, 1e-9):.2f} fichiers/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+############### TIMELINE DES RÉCITANTS (FENÊTRES GLISSANTES) ###############
+
+import json
+import argparse
+
+MODEL_PATH = "models/model_cnn_imam_v4.keras"
+LABEL_ENCODER_PATH = "dataset/label_encoder_imam.pkl"
+
+
+def format_time(seconds):
+    return f"{int(seconds // 3600):02d}:{int(seconds % 3600 // 60):02d}:{seconds % 60:05.2f}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Attribution imam par fenêtres glissantes")
+    parser.add_argument("audio_path")
+    parser.add_argument("--window", type=float, default=10.0, help="Durée d'une fenêtre (s)")
+    parser.add_argument("--hop", type=float, default=5.0, help="Pas entre deux fenêtres (s)")
+    parser.add_argument("--json", dest="json_path", help="Sauvegarde du résultat complet en JSON")
+    parser.add_argument("--model", default=MODEL_PATH, help="Modèle .keras ou .tflite (runtime léger)")
+    parser.add_argument("--labels", default=LABEL_ENCODER_PATH, help="Label encoder .pkl ou labels.json")
+    args = parser.parse_args()
+
+    from predict_imam import predict_imam_timeline
+    result = predict_imam_timeline(args.audio_path, args.model, args.labels, window_s=args.window, hop_s=args.hop)
+
+    print("🕒 Timeline des récitants :")
+    for seg in result["segments"]:
+        print(f"  {format_time(seg['start'])} → {format_time(seg['end'])} : {seg['imam']} ({seg['windows']} fenêtres)")
+
+    print("\n👤 TOP 3 agrégé :")
+    for imam, score in result["top"]:
+        print(f"  {imam:<30} : {score * 100:.1f}%")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"💾 Résultat sauvegardé : {args.json_path}")
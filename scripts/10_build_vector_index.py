@@ -0,0 +1,116 @@
+############### INDEX VECTORIEL IMAM / SOURATE ###############
+
+import os
+import json
+import pickle
+import argparse
+from time import perf_counter
+import numpy as np
+from utils.feature_store import FeatureStore, STORE_PATH
+from utils.vector_index import VectorIndex, build_vector_index, INDEX_PATH, NPROBE
+
+REPORT_PATH = "output/vector_index_report.json"
+KNN_MODEL_PATH = "models/imam_knn_model.pkl"
+SCALER_PATH = "models/scaler.pkl"
+N_QUERIES = 500
+K = 10
+
+
+def percentile_ms(times, q):
+    return float(np.percentile(times, q) * 1000)
+
+
+def evaluate(index, queries, k=K, nprobe=NPROBE):
+    """Recall@k et latence de chaque mode, comparés à la recherche exacte."""
+    exact, times = [], []
+    for q in queries:
+        start = perf_counter()
+        exact.append(set(index.search(q, k=k, mode="exact")[0].tolist()))
+        times.append(perf_counter() - start)
+    report = {"exact": {"recall": 1.0, "p50_ms": percentile_ms(times, 50), "p99_ms": percentile_ms(times, 99)}}
+
+    for mode in ("ivf", "pq") if index.pq_m else ("ivf",):
+        hits, times = 0, []
+        for q, truth in zip(queries, exact):
+            start = perf_counter()
+            ids, _ = index.search(q, k=k, mode=mode, nprobe=nprobe)
+            times.append(perf_counter() - start)
+            hits += len(truth & set(ids.tolist()))
+        report[mode] = {
+            "recall": hits / (k * len(queries)),
+            "p50_ms": percentile_ms(times, 50),
+            "p99_ms": percentile_ms(times, 99),
+        }
+    return report
+
+
+def evaluate_sklearn_knn(queries, k=K):
+    """Latence du KNN sklearn historique (si sklearn et les pickles sont disponibles)."""
+    try:
+        start = perf_counter()
+        with open(KNN_MODEL_PATH, "rb") as f:
+            knn = pickle.load(f)
+        with open(SCALER_PATH, "rb") as f:
+            scaler = pickle.load(f)
+        load_s = perf_counter() - start
+    except Exception as e:
+        print(f"⚠️ KNN sklearn indisponible : {e}")
+        return None
+    times = []
+    for q in queries:
+        start = perf_counter()
+        knn.kneighbors(scaler.transform([q]), n_neighbors=min(k, knn.n_samples_fit_))
+        times.append(perf_counter() - start)
+    return {"load_s": load_s, "p50_ms": percentile_ms(times, 50), "p99_ms": percentile_ms(times, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construction et évaluation de l'index vectoriel MFCC")
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--output", default=INDEX_PATH)
+    parser.add_argument("--nlist", type=int, default=None, help="Listes IVF (défaut ≈ 4·√N)")
+    parser.add_argument("--pq-m", type=int, default=13, help="Sous-espaces PQ (0 = IVF seul)")
+    parser.add_argument("--nprobe", type=int, default=NPROBE)
+    parser.add_argument("--queries", type=int, default=N_QUERIES)
+    parser.add_argument("--skip-build", action="store_true", help="Évaluer un index existant")
+    args = parser.parse_args()
+
+    store = FeatureStore(args.store, create=False)
+    if args.skip_build:
+        index = VectorIndex(args.output)
+    else:
+        print(f"🧱 Construction de l'index sur {len(store)} vecteurs...")
+        start = perf_counter()
+        index = build_vector_index(store, args.output, nlist=args.nlist, pq_m=args.pq_m)
+        print(f"✅ Index construit en {perf_counter() - start:.1f}s ({index.nlist} listes, pq_m={index.pq_m})")
+
+    start = perf_counter()
+    VectorIndex(args.output)
+    open_ms = (perf_counter() - start) * 1000
+
+    # 🎲 Requêtes : vecteurs du store légèrement bruités
+    rng = np.random.default_rng(0)
+    rows = np.sort(rng.choice(len(store), size=min(args.queries, len(store)), replace=False))
+    raw = np.asarray(store.features()[rows])
+    queries = raw + rng.normal(0, 0.05, raw.shape).astype(np.float32) * np.std(raw, axis=0)
+
+    report = {"n": index.n, "nlist": index.nlist, "pq_m": index.pq_m, "nprobe": args.nprobe,
+              "open_ms": open_ms, "modes": evaluate(index, queries, nprobe=args.nprobe)}
+    knn = evaluate_sklearn_knn(queries)
+    if knn:
+        report["sklearn_knn"] = knn
+
+    print(f"\n📊 Index ouvert en {open_ms:.1f} ms")
+    for mode, stats in report["modes"].items():
+        print(f"  ➤ {mode:<6} recall@{K} {stats['recall']:.3f}  p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+    if knn:
+        print(f"  ➤ sklearn KNN  chargement {knn['load_s']:.2f}s  p50 {knn['p50_ms']:.3f} ms  p99 {knn['p99_ms']:.3f} ms")
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Rapport : {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+############### EXPORT TFLITE QUANTIFIÉ (CNN IMAM) ###############
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from time import perf_counter
+import numpy as np
+from utils.feature_store import FeatureStore, STORE_PATH
+from utils.splits import test_mask
+
+MODEL_PATH = "models/model_cnn_imam_v4.keras"
+LABEL_ENCODER_PATH = "dataset/label_encoder_imam.pkl"
+LABELS_JSON_PATH = "dataset/labels.json"
+REPORT_PATH = "output/tflite_report.json"
+QUANTIZATIONS = ("float16", "int8")
+REPRESENTATIVE_SAMPLES = 500   # exemples de calibration pour l'int8
+EVAL_SAMPLES = 5000            # exemples du split de test pour la parité
+LATENCY_RUNS = 200
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def sample_rows(store, mask, n, seed=0):
+    rows = np.flatnonzero(mask)
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(rows, size=min(n, len(rows)), replace=False))
+
+
+def convert(model, quantization, calibration):
+    """Keras → TFLite. float16 : poids en demi-précision ; int8 : poids et activations calibrés."""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        def representative_dataset():
+            for x in calibration:
+                yield [x.reshape(1, -1, 1).astype(np.float32)]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(f"Quantification inconnue : {quantization}")
+    return converter.convert()
+
+
+def cold_start(model_path, label_path):
+    """Import + chargement + première prédiction dans un processus neuf (secondes)."""
+    code = (
+        "import sys, time; t = time.perf_counter(); sys.path.insert(0, %r)\n"
+        "import numpy as np\n"
+        "from predict_imam import load_imam_model, load_label_encoder\n"
+        "load_label_encoder(%r); load_imam_model(%r).predict(np.zeros((1, 26, 1), dtype=np.float32), verbose=0)\n"
+        "print(time.perf_counter() - t)"
+    ) % (SCRIPTS_DIR, label_path, model_path)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def latency_ms(model, x, runs=LATENCY_RUNS):
+    times = []
+    for i in range(runs):
+        start = perf_counter()
+        model.predict(x[i % len(x)].reshape(1, -1, 1), verbose=0)
+        times.append(perf_counter() - start)
+    return {"p50_ms": float(np.percentile(times, 50) * 1000), "p99_ms": float(np.percentile(times, 99) * 1000)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export TFLite float16 / int8 du CNN imam + rapport de parité")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--store", default=STORE_PATH, help="Feature store (calibration + évaluation)")
+    parser.add_argument("--quantization", nargs="+", default=list(QUANTIZATIONS), choices=QUANTIZATIONS)
+    args = parser.parse_args()
+
+    os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
+    from tensorflow.keras.models import load_model
+    from predict_imam import TFLiteClassifier, load_label_encoder
+
+    model = load_model(args.model)
+    label_encoder = load_label_encoder(LABEL_ENCODER_PATH)
+    classes = list(label_encoder.classes_)
+
+    # 🏷️ labels.json : encodeur sans sklearn pour le runtime léger
+    with open(LABELS_JSON_PATH, "w", encoding="utf-8") as f:
+        json.dump({str(i): name for i, name in enumerate(classes)}, f, ensure_ascii=False, indent=2)
+
+    # 🎯 Calibration sur le train, évaluation sur le test (split par fichier)
+    store = FeatureStore(args.store, create=False)
+    is_test = test_mask(store)
+    features = store.features()
+    calibration = np.asarray(features[sample_rows(store, ~is_test, REPRESENTATIVE_SAMPLES)])
+    eval_rows = sample_rows(store, is_test, EVAL_SAMPLES)
+    x_eval = np.asarray(features[eval_rows]).reshape(len(eval_rows), -1, 1)
+    names = store.column("imam")[eval_rows]
+    known = np.isin(names, classes)
+    y_eval = np.array([classes.index(n) if n in classes else -1 for n in names])
+
+    keras_top1 = model.predict(x_eval, batch_size=256, verbose=0).argmax(axis=1)
+    report = {
+        "eval_samples": int(len(eval_rows)),
+        "keras": {
+            "size_kb": os.path.getsize(args.model) / 1024,
+            "accuracy": float((keras_top1 == y_eval)[known].mean()) if known.any() else None,
+            "cold_start_s": cold_start(args.model, LABEL_ENCODER_PATH),
+            **latency_ms(model, x_eval),
+        },
+    }
+
+    base, _ = os.path.splitext(args.model)
+    for quantization in args.quantization:
+        output = f"{base}.{quantization}.tflite"
+        print(f"🧮 Conversion {quantization} → {output}")
+        with open(output, "wb") as f:
+            f.write(convert(model, quantization, calibration))
+
+        tflite = TFLiteClassifier(output)
+        top1 = tflite.predict(x_eval, batch_size=256).argmax(axis=1)
+        report[quantization] = {
+            "path": output,
+            "size_kb": os.path.getsize(output) / 1024,
+            "accuracy": float((top1 == y_eval)[known].mean()) if known.any() else None,
+            "agreement_with_keras": float((top1 == keras_top1).mean()),
+            "cold_start_s": cold_start(output, LABELS_JSON_PATH),
+            **latency_ms(tflite, x_eval),
+        }
+
+    print("\n📊 Parité et latence (CPU) :")
+    for name, stats in report.items():
+        if not isinstance(stats, dict):
+            continue
+        accuracy = f"{stats['accuracy'] * 100:.2f}%" if stats["accuracy"] is not None else "n/a"
+        agreement = f"  accord {stats['agreement_with_keras'] * 100:.2f}%" if "agreement_with_keras" in stats else ""
+        print(f"  ➤ {name:<8} {stats['size_kb']:>8.1f} Ko  précision {accuracy}{agreement}  "
+              f"démarrage {stats['cold_start_s']:.2f}s  p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Rapport : {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
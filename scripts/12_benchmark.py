@@ -0,0 +1,181 @@
+############### BENCHMARK HORS LIGNE (MATCHING, MFCC, AUGMENTATIONS, PIPELINE) ###############
+# Aucune donnée ni modèle réel : audio synthétique, transcriptions bruitées tirées du corpus,
+# Whisper et CNN remplacés par des modèles factices à poids aléatoires (utils/bench.py).
+# Tout est seedé : deux exécutions sur la même machine mesurent exactement le même travail.
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import numpy as np
+import librosa
+from detect_versets import load_versets, detect_top_versets
+from pipeline import run_pipeline
+from utils.audio import load_audio_buffer, SAMPLE_RATE
+from utils.mfcc import extract_mfcc_from_audio
+from utils.augment import AugmentationEngine, DEFAULT_AUGMENTATIONS
+from utils.scoring import get_scorer
+from utils.synthetic import sample_transcriptions
+from utils.bench import synthetic_audio, TinyWhisper, TinyCNN, measure, compare, max_rss_mb
+
+QURAN_VERSES_PATH = "quran_versets.json"
+REPORT_PATH = "output/benchmark_report.json"
+BASELINE_PATH = "output/benchmark_baseline.json"
+SEED = 42
+N_QUERIES = 200
+N_EXHAUSTIVE = 10           # le mode exhaustif score tout le corpus : peu de requêtes suffisent
+AUDIO_LENGTHS = (5, 30, 120)
+AUGMENT_LENGTHS = (5, 30)   # pitch_shift / time_stretch : coûteux sur les longues durées
+REPEATS = 3
+REGRESSION_RATIO = 1.25     # +25 % de p50 ou de pic mémoire par rapport à la référence = régression
+
+STAGES = ("detect", "detect_exhaustive", "mfcc", "augment", "pipeline")
+
+
+def bench_detect(corpus, quick):
+    scorer = get_scorer()
+    queries = [[{"text": text}] for text, _ in sample_transcriptions(corpus, N_QUERIES // (5 if quick else 1), seed=SEED)]
+    results = {f"detect[{scorer.name}]": measure(
+        lambda segments: detect_top_versets(segments, corpus, scorer=scorer), queries, repeats=1 if quick else REPEATS,
+    )}
+    scorer.close()
+    return results
+
+
+def bench_detect_exhaustive(corpus, quick):
+    scorer = get_scorer()
+    queries = [[{"text": text}] for text, _ in sample_transcriptions(corpus, N_EXHAUSTIVE // (5 if quick else 1), seed=SEED)]
+    results = {f"detect_exhaustive[{scorer.name}]": measure(
+        lambda segments: detect_top_versets(segments, corpus, scorer=scorer, exhaustive=True), queries,
+    )}
+    scorer.close()
+    return results
+
+
+def audio_inputs(lengths, quick):
+    return {seconds: [synthetic_audio(seconds, seed=SEED + i) for i in range(1 if quick else 3)] for seconds in lengths}
+
+
+def audio_seconds(y):
+    return len(y) / SAMPLE_RATE
+
+
+def bench_mfcc(corpus, quick):
+    results = {}
+    for seconds, inputs in audio_inputs(AUDIO_LENGTHS, quick).items():
+        results[f"mfcc_{seconds}s"] = measure(
+            lambda y: extract_mfcc_from_audio(y, SAMPLE_RATE), inputs, repeats=1 if quick else REPEATS, units=audio_seconds,
+        )
+    return results
+
+
+def bench_augment(corpus, quick):
+    engine = AugmentationEngine()
+    results = {}
+    for seconds, inputs in audio_inputs(AUGMENT_LENGTHS, quick).items():
+        results[f"augment_{seconds}s"] = measure(
+            lambda y: engine.features(y, SAMPLE_RATE, DEFAULT_AUGMENTATIONS, np.random.default_rng(SEED)),
+            inputs, units=audio_seconds,
+        )
+    return results
+
+
+def bench_pipeline(corpus, quick):
+    """
+    Flux de 98_run_test.py (décodage → transcription → versets → imam) avec les modèles factices.
+    Le décodage ffmpeg n'est mesuré que si ffmpeg est disponible.
+    """
+    texts = [text for text, _ in sample_transcriptions(corpus, 50, seed=SEED)]
+    whisper, cnn = TinyWhisper(texts, seed=SEED), TinyCNN(seed=SEED)
+    results = {}
+    for seconds, inputs in audio_inputs(AUDIO_LENGTHS, quick).items():
+        results[f"pipeline_{seconds}s"] = measure(
+            lambda y: run_pipeline(y, corpus, whisper_model=whisper, imam_model=cnn, label_encoder=cnn),
+            inputs, repeats=1 if quick else REPEATS, units=audio_seconds,
+        )
+
+    if shutil.which("ffmpeg"):
+        import soundfile as sf
+        os.makedirs("output", exist_ok=True)
+        path = "output/benchmark_audio.wav"
+        sf.write(path, synthetic_audio(AUDIO_LENGTHS[-1], seed=SEED), SAMPLE_RATE)
+        results[f"decode_{AUDIO_LENGTHS[-1]}s"] = measure(load_audio_buffer, [path] * 3, units=lambda _: AUDIO_LENGTHS[-1])
+        os.remove(path)
+    return results
+
+
+BENCHMARKS = {
+    "detect": bench_detect,
+    "detect_exhaustive": bench_detect_exhaustive,
+    "mfcc": bench_mfcc,
+    "augment": bench_augment,
+    "pipeline": bench_pipeline,
+}
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "librosa": librosa.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne : latences, débit et pic mémoire par étape")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--quick", action="store_true", help="Moins de requêtes / répétitions (vérification rapide)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="Enregistre les mesures comme nouvelle référence")
+    args = parser.parse_args()
+
+    corpus = load_versets(QURAN_VERSES_PATH)
+    results = {}
+    for stage in args.stages:
+        print(f"⏱️ {stage}...")
+        results.update(BENCHMARKS[stage](corpus, args.quick))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+    regressions = compare(results, baseline, REGRESSION_RATIO)
+    flagged = {(r["stage"], r["metric"]) for r in regressions}
+
+    print("\n📊 Résultats (débit : appels/s, ou secondes d'audio/s pour les étapes audio) :")
+    for stage, r in results.items():
+        ref = baseline.get(stage)
+        delta = f"  (réf. p50 {ref['p50_ms']:.2f} ms)" if ref else ""
+        if (stage, "p50_ms") in flagged or (stage, "peak_mb") in flagged:
+            delta += " ❌ régression"
+        print(f"  ➤ {stage:<28} p50 {r['p50_ms']:>9.2f} ms  p90 {r['p90_ms']:>9.2f}  p99 {r['p99_ms']:>9.2f}  "
+              f"débit {r['throughput_per_s']:>9.1f}/s  pic {r['peak_mb']:>7.1f} Mo{delta}")
+
+    report = {
+        "environment": environment(),
+        "seed": SEED,
+        "quick": args.quick,
+        "max_rss_mb": max_rss_mb(),
+        "results": results,
+        "regressions": regressions,
+    }
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Rapport : {REPORT_PATH}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Référence enregistrée : {args.baseline}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
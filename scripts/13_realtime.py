@@ -0,0 +1,103 @@
+############### DÉTECTION EN TEMPS RÉEL (FLUX AUDIO) ###############
+# Exemples :
+#   ffmpeg -i live.mp3 -f s16le -ac 1 -ar 16000 - | python scripts/13_realtime.py --stdin
+#   mkfifo /tmp/sawt.pcm && python scripts/13_realtime.py --fifo /tmp/sawt.pcm
+#   python scripts/13_realtime.py --follow enregistrement_en_cours.wav
+#   python scripts/13_realtime.py --replay audios/082_Dosari_live2.wav --speed 1
+
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+import sys
+import json
+import argparse
+from detect_versets import load_versets
+from utils.realtime import RealtimeSession, stdin_blocks, fifo_blocks, follow_blocks, replay_blocks
+
+QURAN_VERSES_PATH = "quran_versets.json"
+MODEL_PATH = "models/model_cnn_imam_v4.keras"
+LABEL_ENCODER_PATH = "dataset/label_encoder_imam.pkl"
+WHISPER_SIZE = "small"   # les énoncés sont courts : un modèle plus léger tient le temps réel
+REPORT_PATH = "output/realtime_report.json"
+
+
+def load_models(args, corpus):
+    if args.stand_in:
+        # 🧪 Modèles factices (utils/bench.py) : mesure de la latence de la chaîne sans Whisper ni CNN
+        from utils.bench import TinyWhisper, TinyCNN
+        from utils.synthetic import sample_transcriptions
+        cnn = TinyCNN()
+        return TinyWhisper([text for text, _ in sample_transcriptions(corpus, 50)]), cnn, cnn
+
+    from transcribe_audio import load_whisper_model
+    whisper_model = load_whisper_model(args.whisper)
+    if args.no_imam:
+        return whisper_model, None, None
+    from predict_imam import load_imam_model, load_label_encoder
+    return whisper_model, load_imam_model(args.model), load_label_encoder(args.labels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Versets et imam en continu depuis un flux audio")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--stdin", action="store_true", help="PCM s16le mono 16 kHz sur l'entrée standard")
+    source.add_argument("--fifo", help="FIFO nommé recevant du PCM s16le mono 16 kHz")
+    source.add_argument("--follow", help="Fichier en cours d'écriture (PCM ou WAV 16 bits mono 16 kHz)")
+    source.add_argument("--replay", help="WAV rejoué comme un flux (mesure de latence)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Vitesse du rejeu (0 = sans attente)")
+    parser.add_argument("--whisper", default=WHISPER_SIZE)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--labels", default=LABEL_ENCODER_PATH)
+    parser.add_argument("--no-imam", action="store_true", help="Versets seulement")
+    parser.add_argument("--stand-in", action="store_true", help="Whisper et CNN factices (tests hors ligne)")
+    parser.add_argument("--json", action="store_true", help="Un événement JSON par ligne")
+    args = parser.parse_args()
+
+    corpus = load_versets(QURAN_VERSES_PATH)
+    whisper_model, imam_model, label_encoder = load_models(args, corpus)
+    session = RealtimeSession(corpus, whisper_model, imam_model, label_encoder)
+
+    if args.stdin:
+        blocks = stdin_blocks()
+    elif args.fifo:
+        blocks = fifo_blocks(args.fifo)
+    elif args.follow:
+        blocks = follow_blocks(args.follow)
+    else:
+        blocks = replay_blocks(args.replay, speed=args.speed)
+
+    def show(event):
+        if args.json:
+            print(json.dumps(event, ensure_ascii=False, default=str), flush=True)
+        elif event["type"] == "utterance":
+            print(f"🗣️ [{event['start']:7.1f}s → {event['end']:7.1f}s] {event['text']}  ⏱️ {event['latency_ms']:.0f} ms", flush=True)
+            if event["match"]:
+                m = event["match"]
+                print(f"📖 Sourate {m['sourate_id']} ({m['sourate_name']}) | Versets {m['start_verse']}-{m['end_verse']} "
+                      f"| Score {m['similarity']:.2%}", flush=True)
+        else:
+            top = " | ".join(f"{imam} {score:.0%}" for imam, score in event["top"])
+            print(f"👳 [{event['end']:7.1f}s] {top}", flush=True)
+
+    try:
+        for block, arrived in blocks:
+            for event in session.feed(block, arrived):
+                show(event)
+    except KeyboardInterrupt:
+        print("\n🛑 Flux interrompu.", file=sys.stderr)
+    for event in session.close():
+        show(event)
+
+    report = {"latency": session.latency_report(), "best": session.matcher.best,
+              "matches": session.matches, "seconds": session.ring.total / session.sr}
+    if report["latency"]:
+        lat = report["latency"]
+        print(f"\n⏱️ {lat['utterances']} énoncés | latence p50 {lat['p50_ms']:.0f} ms | p90 {lat['p90_ms']:.0f} ms "
+              f"| max {lat['max_ms']:.0f} ms", file=sys.stderr)
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
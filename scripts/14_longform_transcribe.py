@@ -0,0 +1,68 @@
+############### TRANSCRIPTION DES LONGS ENREGISTREMENTS (TARAWIH...) ###############
+# Silences retirés, morceaux découpés aux pauses et transcrits en parallèle, puis recousus.
+# --compare : mesure l'accélération et la parité (WER) par rapport à l'appel Whisper unique.
+
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+import json
+import argparse
+from time import perf_counter
+from utils.audio import load_audio_buffer
+from utils.longform import transcribe_long, word_error_rate, CHUNK_S, OVERLAP_S
+
+WHISPER_SIZE = "medium"
+REPORT_PATH = "output/longform_report.json"
+
+
+def segments_text(segments):
+    return " ".join(s["text"].strip() for s in segments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcription parallèle par morceaux des longs enregistrements")
+    parser.add_argument("audio_path")
+    parser.add_argument("--whisper", default=WHISPER_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="Processus (défaut : cœurs et mémoire disponibles)")
+    parser.add_argument("--chunk", type=float, default=CHUNK_S, help="Durée visée d'un morceau (s)")
+    parser.add_argument("--overlap", type=float, default=OVERLAP_S)
+    parser.add_argument("--output", default=None, help="Fichier JSON des segments recousus")
+    parser.add_argument("--compare", action="store_true", help="Compare à l'appel unique (vitesse et WER)")
+    args = parser.parse_args()
+
+    y = load_audio_buffer(args.audio_path)  # décodé une fois pour les deux chemins
+
+    start = perf_counter()
+    # Cache désactivé : les deux chemins sont réellement exécutés pour la mesure
+    segments, stats = transcribe_long(y, model_size=args.whisper, workers=args.workers,
+                                      chunk_s=args.chunk, overlap_s=args.overlap, use_cache=not args.compare)
+    stats["wall_s"] = perf_counter() - start
+    print(f"🕰️ {stats['duration_s'] / 60:.1f} min d'audio | {stats['silence_dropped']:.1%} de silence retiré | "
+          f"{stats['chunks']} morceaux | {stats['workers']} processus × {stats['threads_per_worker']} threads "
+          f"| {stats['wall_s']:.1f}s")
+
+    report = {"audio_path": args.audio_path, "whisper": args.whisper, "longform": stats}
+    if args.compare:
+        from transcribe_audio import load_whisper_model, transcribe_audio
+        model = load_whisper_model(args.whisper)
+        start = perf_counter()
+        reference = transcribe_audio(y, model=model, use_cache=False)
+        single_s = perf_counter() - start
+        report["single"] = {"wall_s": single_s}
+        report["speedup"] = single_s / stats["wall_s"]
+        report["wer_vs_single"] = word_error_rate(segments_text(reference), segments_text(segments))
+        print(f"⚖️ Appel unique {single_s:.1f}s | accélération x{report['speedup']:.2f} "
+              f"| WER vs appel unique {report['wer_vs_single']:.2%}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(segments, f, ensure_ascii=False, indent=2, default=lambda o: o.item() if hasattr(o, "item") else str(o))
+        print(f"💾 Segments : {args.output}")
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Rapport : {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
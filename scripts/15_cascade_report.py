@@ -0,0 +1,173 @@
+############### PRÉDICTION IMAM EN CASCADE : MODÈLE LÉGER D'ABORD, CNN SI INCERTAIN ###############
+# Évalue sur le split de test (par fichier) : CNN seul, modèle léger seul, et la cascade
+# pour une grille de seuils (taux d'escalade, précision, accord avec le CNN, débit).
+# Le modèle léger (plus proche centroïde numpy) est construit s'il n'existe pas encore.
+
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+import json
+import argparse
+from time import perf_counter
+import numpy as np
+from utils.feature_store import FeatureStore, STORE_PATH
+from utils.splits import test_mask
+from utils.cascade import (CascadeClassifier, NearestCentroidModel, build_centroid_model, load_cheap_model,
+                           CENTROIDS_PATH, MIN_CONFIDENCE, MIN_MARGIN, ENSEMBLE_WEIGHT)
+
+MODEL_PATH = "models/model_cnn_imam_v4.keras"
+LABEL_ENCODER_PATH = "dataset/label_encoder_imam.pkl"
+REPORT_PATH = "output/cascade_report.json"
+EXCLUDED_AUGMENTATIONS = ("original",)  # comme 03_train_model.py
+MAX_TEST_ROWS = 50000
+BATCH_SIZE = 256
+LATENCY_SAMPLES = 200
+SEED = 42
+# (confiance minimale, marge minimale) évalués
+THRESHOLDS = [(0.0, 0.0), (0.4, 0.1), (0.5, 0.15), (0.6, 0.2), (0.7, 0.3), (0.8, 0.4), (0.9, 0.6), (1.01, 1.01)]
+
+
+def held_out(store, max_rows=MAX_TEST_ROWS, seed=SEED):
+    """Lignes du split de test (hors augmentations exclues), sous-échantillonnées si besoin."""
+    meta = np.asarray(store.meta())
+    keep = test_mask(store)
+    for name in EXCLUDED_AUGMENTATIONS:
+        if name in store.dictionaries["augmentation"]:
+            keep &= meta[:, 3] != store.code("augmentation", name)
+    rows = np.flatnonzero(keep)
+    if len(rows) > max_rows:
+        rows = np.sort(np.random.default_rng(seed).choice(rows, size=max_rows, replace=False))
+    imams = np.array(store.dictionaries["imam"])
+    return np.asarray(store.features()[rows], dtype=np.float32), imams[meta[rows, 0]]
+
+
+def throughput(model, x, batch_size=BATCH_SIZE):
+    """(échantillons / s par lots, latence p50 d'un échantillon isolé en ms)."""
+    start = perf_counter()
+    for i in range(0, len(x), batch_size):
+        model.predict(x[i:i + batch_size], batch_size=batch_size, verbose=0)
+    batch_rate = len(x) / (perf_counter() - start)
+    times = []
+    for row in x[:LATENCY_SAMPLES]:
+        start = perf_counter()
+        model.predict(row[None], verbose=0)
+        times.append(perf_counter() - start)
+    return batch_rate, float(np.median(times) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascade modèle léger → CNN : taux d'escalade, précision et débit")
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--model", default=MODEL_PATH, help="CNN .keras ou .tflite")
+    parser.add_argument("--labels", default=LABEL_ENCODER_PATH)
+    parser.add_argument("--cheap", choices=("centroid", "knn"), default="centroid",
+                        help="centroid (numpy) ou knn (imam_knn_model.pkl, nécessite sklearn)")
+    parser.add_argument("--centroids", default=CENTROIDS_PATH)
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruit le modèle à centroïdes")
+    parser.add_argument("--min-confidence", type=float, default=MIN_CONFIDENCE)
+    parser.add_argument("--min-margin", type=float, default=MIN_MARGIN)
+    parser.add_argument("--ensemble", action="store_true", help="Mélange modèle léger / CNN sur les escalades")
+    parser.add_argument("--weight", type=float, default=ENSEMBLE_WEIGHT)
+    parser.add_argument("--max-rows", type=int, default=MAX_TEST_ROWS)
+    parser.add_argument("--stand-in", action="store_true", help="CNN factice (utils/bench.py), tests hors ligne")
+    args = parser.parse_args()
+
+    store = FeatureStore(args.store, create=False)
+    if args.cheap == "centroid":
+        if args.rebuild or not os.path.exists(args.centroids):
+            print(f"🧮 Construction du modèle à centroïdes → {args.centroids}...")
+            info = build_centroid_model(store, args.centroids, exclude_augmentations=EXCLUDED_AUGMENTATIONS)
+            print(f"✅ {info['classes']} imams | {info['prototypes']} prototypes | {info['train_rows']} lignes "
+                  f"| T = {info['temperature']:.3g} (calibrée sur {info['calibration_rows']} lignes tenues à l'écart)")
+        cheap = NearestCentroidModel(args.centroids)
+    else:
+        cheap = load_cheap_model("knn")
+
+    if args.stand_in:
+        from utils.bench import TinyCNN
+        cnn = TinyCNN(n_classes=len(cheap.classes_), dim=store.dim)
+        cnn.classes_ = np.asarray(cheap.classes_).astype(str)
+        classes = cnn.classes_
+    else:
+        from predict_imam import load_imam_model, load_label_encoder
+        cnn = load_imam_model(args.model)
+        classes = load_label_encoder(args.labels).classes_
+
+    x, y_true = held_out(store, args.max_rows)
+    y = np.array([np.flatnonzero(classes == name)[0] if name in classes else -1 for name in y_true])
+    print(f"✂️ Split de test : {len(x)} échantillons, {len(set(y_true))} imams")
+
+    def cascade(min_confidence, min_margin, ensemble=args.ensemble):
+        return CascadeClassifier(cheap, classes, lambda: cnn, min_confidence=min_confidence,
+                                 min_margin=min_margin, ensemble=ensemble, weight=args.weight)
+
+    # 🔮 Prédictions calculées une fois : la grille de seuils se déduit sans réexécuter les modèles
+    cnn_probs = np.concatenate([cnn.predict(x[i:i + BATCH_SIZE].reshape(-1, store.dim, 1), verbose=0)
+                                for i in range(0, len(x), BATCH_SIZE)])
+    cheap_probs = cascade(0.0, 0.0).predict(x)  # seuils nuls : jamais d'escalade
+    cnn_pred, cheap_pred = cnn_probs.argmax(axis=1), cheap_probs.argmax(axis=1)
+
+    def accuracy(pred):
+        return float(np.mean(pred == y))
+
+    sweep = []
+    for min_confidence, min_margin in THRESHOLDS:
+        c = cascade(min_confidence, min_margin)
+        unsure = c.uncertain(cheap_probs)
+        probs = cheap_probs.copy()
+        probs[unsure] = (args.weight * cheap_probs[unsure] + (1 - args.weight) * cnn_probs[unsure]
+                         if args.ensemble else cnn_probs[unsure])
+        pred = probs.argmax(axis=1)
+        sweep.append({"min_confidence": min_confidence, "min_margin": min_margin,
+                      "escalation_rate": float(unsure.mean()), "accuracy": accuracy(pred),
+                      "agreement_with_cnn": float(np.mean(pred == cnn_pred))})
+
+    # ⏱️ Débit réel : CNN seul, modèle léger seul, cascade aux seuils choisis
+    class CnnOnly:
+        def predict(self, rows, batch_size=BATCH_SIZE, verbose=0):
+            return cnn.predict(rows.reshape(-1, store.dim, 1), batch_size=batch_size, verbose=0)
+
+    timings = {}
+    for name, model in (("cnn", CnnOnly()), ("cheap", cascade(0.0, 0.0)),
+                        ("cascade", cascade(args.min_confidence, args.min_margin))):
+        rate, latency = throughput(model, x)
+        timings[name] = {"samples_per_s": rate, "single_p50_ms": latency}
+    chosen = cascade(args.min_confidence, args.min_margin)
+    chosen_probs = chosen.predict(x)
+
+    report = {
+        "store": args.store,
+        "cheap_model": args.cheap,
+        "cnn": "stand-in" if args.stand_in else args.model,
+        "test_rows": int(len(x)),
+        "ensemble": args.ensemble,
+        "cnn_only": {"accuracy": accuracy(cnn_pred), **timings["cnn"]},
+        "cheap_only": {"accuracy": accuracy(cheap_pred), "agreement_with_cnn": float(np.mean(cheap_pred == cnn_pred)),
+                       **timings["cheap"]},
+        "cascade": {"min_confidence": args.min_confidence, "min_margin": args.min_margin,
+                    "escalation_rate": chosen.escalation_rate, "accuracy": accuracy(chosen_probs.argmax(axis=1)),
+                    "agreement_with_cnn": float(np.mean(chosen_probs.argmax(axis=1) == cnn_pred)),
+                    **timings["cascade"]},
+        "sweep": sweep,
+    }
+
+    print(f"\n🧠 CNN seul      : précision {report['cnn_only']['accuracy']:.2%} "
+          f"| {timings['cnn']['samples_per_s']:.0f} éch./s | {timings['cnn']['single_p50_ms']:.2f} ms")
+    print(f"🪶 Léger seul    : précision {report['cheap_only']['accuracy']:.2%} "
+          f"| {timings['cheap']['samples_per_s']:.0f} éch./s | {timings['cheap']['single_p50_ms']:.2f} ms")
+    print(f"🪜 Cascade       : précision {report['cascade']['accuracy']:.2%} "
+          f"| escalade {report['cascade']['escalation_rate']:.1%} "
+          f"| {timings['cascade']['samples_per_s']:.0f} éch./s | {timings['cascade']['single_p50_ms']:.2f} ms")
+    print("\n📈 Seuils (confiance, marge) → escalade | précision | accord CNN")
+    for s in sweep:
+        print(f"  ➤ ({s['min_confidence']:.2f}, {s['min_margin']:.2f}) → {s['escalation_rate']:6.1%} "
+              f"| {s['accuracy']:.2%} | {s['agreement_with_cnn']:.2%}")
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Rapport : {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
-import shutil
 from transcribe_audio import transcribe_audio
 from detect_versets import load_versets, detect_top_versets
 from predict_imam import predict_imam
+from utils.audio import load_audio_buffer
 
 AUDIO_PATH = "audios/082_Dosari_live2.wav"
 QURAN_VERSES_PATH = "quran_versets.json"
@@ -12,9 +12,13 @@ MODEL_PATH = "models/model_cnn_imam_v4.keras"
 LABEL_ENCODER_PATH = "dataset/label_encoder_imam.pkl"
 
 
+# ✅ Étape 0 - Décodage unique (tampon partagé par toutes les étapes)
+audio = load_audio_buffer(AUDIO_PATH)
+
+
 # ✅ Étape 1 - Transcription
 print("🎧 Transcription complète avec Whisper...")
-segments = transcribe_audio(AUDIO_PATH)
+segments = transcribe_audio(audio)
 text = " ".join([s["text"] for s in segments])
 print("\n📝 Transcription brute :")
 print(text)
@@ -24,24 +28,24 @@ print("-" * 80)
 # ✅ Étape 2 - Matching versets
 print("\n🔍 Recherche des versets les plus proches...")
 versets = load_versets(QURAN_VERSES_PATH)
-match = detect_top_versets(segments, versets)
+matches = detect_top_versets(segments, versets)
+match = matches[0] if matches else None
 
-
-print(f"\n📖 Sourate {match['sourate_id']} ({match['sourate_name']}) | Versets {match['start_verse']}-{match['end_verse']}")
 from termcolor import colored
-score_str = colored(f"{match['similarity']*100:.2f}%", "cyan", attrs=["bold"])
-print(f"🔹 Score : {score_str}")
-print("🕌 Texte :", " ".join([v["text"] for v in match["verses"]]))
+if match is None:
+    # Transcription vide ou trop courte (silence, échec Whisper)
+    print("\n❌ Aucun verset détecté.")
+else:
+    print(f"\n📖 Sourate {match['sourate_id']} ({match['sourate_name']}) | Versets {match['start_verse']}-{match['end_verse']}")
+    score_str = colored(f"{match['similarity']*100:.2f}%", "cyan", attrs=["bold"])
+    print(f"🔹 Score : {score_str}")
+    print("🕌 Texte :", " ".join([v["text"] for v in match["verses"]]))
 
 
 # ✅ Étape 3 - Prédiction imam
 print("\n👳 Prédiction de l'imam (si modèle dispo)...")
-top_imams = predict_imam(AUDIO_PATH, MODEL_PATH, LABEL_ENCODER_PATH)
+top_imams = predict_imam(AUDIO_PATH, MODEL_PATH, LABEL_ENCODER_PATH, y=audio)
 for imam, score in top_imams:
     score_str = colored(f"{score*100:.2f}%", "magenta" if score > 0.8 else "yellow")
     print(f"  ➤ {imam:<30} : {score_str}")
 
-
-# ✅ Nettoyage
-shutil.rmtree(os.path.expanduser("~/.cache/whisper"), ignore_errors=True)
-print("\n🧹 Cache Whisper supprimé.")
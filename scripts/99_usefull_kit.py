@@ -1,39 +1,50 @@
 ############### FIX OLD MFCC from 13 to 26 entires ###############
 
 import json
-import os
 from tqdm import tqdm
-from utils.mfcc import extract_mfcc_from_audio
+from utils.augment import AugmentationEngine, dataset_features
+from utils.feature_store import FeatureStore
 
 INPUT_JSONL = "mfcc_data/mfcc_data_augmented.jsonl"
-OUTPUT_JSONL = "mfcc_data/mfcc_data_augmented_fixed.jsonl"
+STORE_PATH = "mfcc_data/mfcc_store"
+BATCH_SIZE = 1000
+# Même chaîne que 02_extract_mfcc_dataset.py (librosa, fréquence d'origine, même augmentation) :
+# les lignes réparées ont les mêmes statistiques MFCC que le reste du store
+ENGINE = AugmentationEngine()
+
+store = FeatureStore(STORE_PATH, dim=26)
+keys = store.key_set()
+batch = []
+n_fixed, n_errors = 0, 0
+
+print(f"🔍 Correction des anciennes entrées MFCC (13 valeurs) vers {STORE_PATH}...")
 
 with open(INPUT_JSONL, "r", encoding="utf-8") as f:
-    data = [json.loads(line.strip()) for line in f]
-
-fixed_data = []
-
-print(f"🔍 Correction des anciennes entrées MFCC (13 valeurs)...")
-
-for entry in tqdm(data):
-    mfcc = entry["mfcc"]
-    if len(mfcc) == 13:
-        try:
-            mfcc_fixed = extract_mfcc_from_audio(
-                AUDIO_PATH=entry["file_path"]
-            )
-            entry["mfcc"] = mfcc_fixed
-        except Exception as e:
-            print(f"❌ Erreur retraitement : {entry['file_path']} → {e}")
+    for line in tqdm(f):
+        entry = json.loads(line)
+        entry.setdefault("augmentation", "original")
+        key = store.encode_key(entry["imam"], entry["sourate"], entry["file_path"], entry["augmentation"], add=True)
+        if key in keys:
             continue
-    fixed_data.append(entry)
 
-# 🔃 Tri par imam puis sourate
-fixed_data.sort(key=lambda x: (x["imam"], x["sourate"]))
+        if len(entry["mfcc"]) == 13:
+            features, error = dataset_features(entry["file_path"], [entry["augmentation"]], ENGINE)
+            if error:
+                print(error)
+                n_errors += 1
+                continue
+            entry["mfcc"] = features[entry["augmentation"]].tolist()
+            n_fixed += 1
+
+        keys.add(key)
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            store.append(batch)
+            batch = []
+
+store.append(batch)
 
-# 💾 Sauvegarde du fichier corrigé
-with open(OUTPUT_JSONL, "w", encoding="utf-8") as f_out:
-    for entry in fixed_data:
-        f_out.write(json.dumps(entry) + "\n")
+# 🔃 Tri par imam puis sourate (sur les métadonnées, features réécrites par blocs)
+store.sort_by_key()
 
-print(f"\n✅ Sauvegarde terminée dans {OUTPUT_JSONL}")
+print(f"\n✅ {n_fixed} entrées corrigées, {n_errors} erreurs. Store : {len(store)} entrées dans {STORE_PATH}")
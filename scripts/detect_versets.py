@@ -1,38 +1,40 @@
-import os
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
-
-import json
-from difflib import SequenceMatcher
+import heapq
 from utils.normalize_arabic import normalize_arabic
+from utils.quran_corpus import get_corpus, CORPUS_PATH
+from utils.verse_index import get_verse_index
+from utils.scoring import get_scorer
+from utils import tracing
 
-def load_versets(path):
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def detect_top_versets(segments, versets, window_sizes=[1, 2, 3, 4, 5], top_k=5):
+def load_versets(path, corpus_path=CORPUS_PATH):
     """
-    Retourne les top_k versets ou combinaisons les plus proches
+    Ouvre le corpus binaire memory-mappé (construit depuis le JSON au premier appel).
     """
-    transcription = normalize_arabic(" ".join([s["text"] for s in segments]).strip())
-    matches = []
+    return get_corpus(corpus_path, source_path=path)
 
-    for sourate in versets:
-        verses = sourate["verses"]
-        for w in window_sizes:
-            for i in range(len(verses) - w + 1):
-                segment = verses[i:i + w]
-                combined_text = normalize_arabic(" ".join(v["text"] for v in segment))
-                score = SequenceMatcher(None, transcription, combined_text).ratio()
+def detect_top_versets(segments, corpus, window_sizes=[1, 2, 3, 4, 5], top_k=5, n_candidates=40,
+                       scorer=None, exhaustive=False):
+    """
+    Retourne les top_k versets ou combinaisons les plus proches (du meilleur au moins bon).
+    Par défaut, seules les fenêtres candidates de l'index n-gramme sont scorées ;
+    exhaustive=True score toutes les fenêtres du corpus en un seul appel du scorer.
+    """
+    with tracing.span("detect", exhaustive=exhaustive, top_k=top_k):
+        with tracing.span("normalize"):
+            transcription = normalize_arabic(" ".join([s["text"] for s in segments]).strip())
+        if scorer is None or isinstance(scorer, str):
+            scorer = get_scorer(scorer)
 
-                matches.append({
-                    "sourate_id": sourate["id"],
-                    "sourate_name": sourate["name"],
-                    "start_verse": segment[0]["id"],
-                    "end_verse": segment[-1]["id"],
-                    "verses": segment,
-                    "text": combined_text,
-                    "similarity": score
-                })
+        with tracing.span("candidates"):
+            if exhaustive:
+                wids, texts = corpus.window_texts(window_sizes)
+                spans = [corpus.window_span(wid) for wid in wids]
+            else:
+                index = get_verse_index(corpus)
+                spans = index.candidates(transcription, window_sizes, n_candidates=n_candidates)
+                texts = [corpus.span_text(first_vid, last_vid) for first_vid, last_vid in spans]
 
-    matches.sort(key=lambda x: -x["similarity"])
-    return matches[0]
+        with tracing.span("score", scorer=scorer.name, windows=len(texts)):
+            scores = scorer.score(transcription, texts)
+        tracing.count("windows_scored", len(texts))
+        best = heapq.nlargest(top_k, range(len(spans)), key=scores.__getitem__)
+    return [{**corpus.span_match(*spans[i]), "similarity": scores[i]} for i in best]
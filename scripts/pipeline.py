@@ -0,0 +1,177 @@
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+import json
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from utils.audio import load_audio_buffer, decode_footprint, SAMPLE_RATE
+from utils import tracing
+
+QURAN_VERSES_PATH = "quran_versets.json"
+MODEL_PATH = "models/model_cnn_imam_v4.keras"
+LABEL_ENCODER_PATH = "dataset/label_encoder_imam.pkl"
+SYNTHETIC_BLOCK_S = 60   # écriture par blocs de l'audio synthétique (mémoire constante)
+
+
+def run_pipeline(audio, corpus, model_path=MODEL_PATH, label_path=LABEL_ENCODER_PATH,
+                 whisper_model=None, top_k=5, imam_model=None, label_encoder=None, use_cache=True):
+    """
+    Pipeline complet à décodage unique : le fichier est décodé une fois en float32 16 kHz
+    et ce même tableau (aucune copie) sert à la transcription puis aux MFCC / CNN.
+    audio peut être un chemin ou un tampon déjà décodé ; les modèles déjà chargés
+    (Whisper, CNN, encodeur) peuvent être passés directement.
+    """
+    from transcribe_audio import transcribe_audio
+    from detect_versets import detect_top_versets
+    from predict_imam import predict_imam
+
+    timings = {}
+    with tracing.span("pipeline") as root:
+        start = perf_counter()
+        y = load_audio_buffer(audio) if isinstance(audio, str) else audio
+        timings["decode"] = perf_counter() - start
+        root.set(seconds=len(y) / SAMPLE_RATE)
+
+        start = perf_counter()
+        segments = transcribe_audio(y, model=whisper_model, use_cache=use_cache)
+        timings["transcribe"] = perf_counter() - start
+
+        start = perf_counter()
+        versets = detect_top_versets(segments, corpus, top_k=top_k)
+        timings["detect"] = perf_counter() - start
+
+        start = perf_counter()
+        with tracing.span("predict_imam"):
+            imams = predict_imam(None, model_path, label_path, y=y, model=imam_model, label_encoder=label_encoder,
+                                 use_cache=use_cache)
+        timings["predict_imam"] = perf_counter() - start
+
+    return {
+        "duration": len(y) / SAMPLE_RATE,
+        "segments": segments,
+        "versets": versets,
+        "imams": [(imam, float(score)) for imam, score in imams],
+        "timings": timings,
+        "decode_bytes": decode_footprint(y),
+    }
+
+
+def _load_models(corpus, stand_in):
+    if stand_in:
+        # 🧪 Modèles factices (utils/bench.py) : seuls les tampons audio pèsent dans la mesure
+        from utils.bench import TinyWhisper, TinyCNN
+        from utils.synthetic import sample_transcriptions
+        cnn = TinyCNN()
+        return TinyWhisper([text for text, _ in sample_transcriptions(corpus, 50)]), cnn, cnn
+    from transcribe_audio import load_whisper_model
+    from predict_imam import load_imam_model, load_label_encoder
+    return load_whisper_model("medium"), load_imam_model(MODEL_PATH), load_label_encoder(LABEL_ENCODER_PATH)
+
+
+def _peak_rss(mode, audio_path, stand_in):
+    """
+    Exécuté dans un processus neuf : un flux complet puis le pic de mémoire résidente (octets).
+    - legacy : chaque étape décode le fichier de son côté (Whisper, puis la prédiction imam)
+    - shared : décodage unique, même tampon pour toutes les étapes (run_pipeline)
+    """
+    from detect_versets import load_versets, detect_top_versets
+    from transcribe_audio import transcribe_audio
+    from predict_imam import predict_imam
+
+    corpus = load_versets(QURAN_VERSES_PATH)
+    whisper_model, imam_model, label_encoder = _load_models(corpus, stand_in)
+    if mode == "legacy":
+        # whisper.transcribe(chemin) décodait via whisper.audio.load_audio : même conversion ffmpeg
+        segments = transcribe_audio(load_audio_buffer(audio_path), model=whisper_model, use_cache=False)
+        detect_top_versets(segments, corpus)
+        predict_imam(audio_path, MODEL_PATH, LABEL_ENCODER_PATH, model=imam_model, label_encoder=label_encoder,
+                     use_cache=False)
+    else:
+        run_pipeline(audio_path, corpus, whisper_model=whisper_model, imam_model=imam_model,
+                     label_encoder=label_encoder, use_cache=False)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Ko → octets (Linux)
+
+
+def memory_report(audio_path, stand_in=False):
+    """
+    Pic de mémoire résidente mesuré (ru_maxrss) de l'ancien flux à deux décodages et du flux
+    à tampon partagé, chacun dans son propre processus (spawn) sur le même fichier.
+    """
+    context = multiprocessing.get_context("spawn")
+    peaks = {}
+    for mode in ("legacy", "shared"):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            peaks[mode] = executor.submit(_peak_rss, mode, audio_path, stand_in).result()
+    import soundfile as sf
+    try:
+        duration = sf.info(audio_path).duration
+    except RuntimeError:
+        duration = None  # format non lu par soundfile (mp3 ancien libsndfile...)
+    return {
+        "audio_path": audio_path,
+        "duration_s": duration,
+        "stand_in": stand_in,
+        "legacy_peak_rss_mb": peaks["legacy"] / 2**20,
+        "shared_peak_rss_mb": peaks["shared"] / 2**20,
+        "saved_mb": (peaks["legacy"] - peaks["shared"]) / 2**20,
+        # Taille d'un décodage (PCM int16 + float32, voir decode_footprint), pour comparaison
+        "decode_mb": duration * SAMPLE_RATE * 6 / 2**20 if duration else None,
+    }
+
+
+def write_synthetic_audio(path, minutes, sr=SAMPLE_RATE):
+    """WAV 16 bits synthétique de la durée demandée, écrit par blocs (mesures sur enregistrements d'une heure)."""
+    import soundfile as sf
+    from utils.bench import synthetic_audio
+    with sf.SoundFile(path, "w", samplerate=sr, channels=1, subtype="PCM_16") as f:
+        remaining, k = minutes * 60, 0
+        while remaining > 0:
+            block = min(SYNTHETIC_BLOCK_S, remaining)
+            f.write(synthetic_audio(block, sr, seed=k))
+            remaining -= block
+            k += 1
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline SawtAI à décodage unique")
+    parser.add_argument("audio_path", nargs="?")
+    parser.add_argument("--report-memory", action="store_true",
+                        help="Mesure le pic RSS de l'ancien flux (2 décodages) et du flux partagé, processus séparés")
+    parser.add_argument("--synthetic-minutes", type=float, default=None,
+                        help="Avec --report-memory : mesure sur un audio synthétique de cette durée (ex. 60)")
+    parser.add_argument("--stand-in", action="store_true", help="Avec --report-memory : Whisper et CNN factices")
+    args = parser.parse_args()
+
+    if args.report_memory:
+        if args.synthetic_minutes:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = write_synthetic_audio(os.path.join(tmp, "synthetic.wav"), args.synthetic_minutes)
+                report = memory_report(path, stand_in=args.stand_in)
+                report["audio_path"] = f"synthetic:{args.synthetic_minutes:g}min"
+        elif args.audio_path:
+            report = memory_report(args.audio_path, stand_in=args.stand_in)
+        else:
+            parser.error("audio_path ou --synthetic-minutes requis")
+        print("🧠 Mémoire (pic RSS mesuré) :")
+        print(json.dumps(report, indent=2))
+        print(f"📊 Pic RSS : deux décodages {report['legacy_peak_rss_mb']:.0f} Mo → tampon partagé "
+              f"{report['shared_peak_rss_mb']:.0f} Mo (écart {report['saved_mb']:+.0f} Mo)")
+        raise SystemExit(0)
+    if not args.audio_path:
+        parser.error("audio_path requis")
+
+    from detect_versets import load_versets
+    result = run_pipeline(args.audio_path, load_versets(QURAN_VERSES_PATH))
+
+    best = result["versets"][0] if result["versets"] else None
+    if best:
+        print(f"📖 Sourate {best['sourate_id']} ({best['sourate_name']}) | Versets {best['start_verse']}-{best['end_verse']} "
+              f"| Score {best['similarity']:.2%}")
+    for imam, score in result["imams"]:
+        print(f"  ➤ {imam:<30} : {score * 100:.2f}%")
+    print("⏱️ " + " | ".join(f"{k} {v:.2f}s" for k, v in result["timings"].items()))
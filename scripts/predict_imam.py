@@ -4,24 +4,195 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 import numpy as np
 import json
 import pickle
-from tensorflow.keras.models import load_model
-from sklearn.preprocessing import LabelEncoder
-from utils.mfcc import extract_mfcc_from_audio
-from whisper.audio import load_audio, SAMPLE_RATE
+import multiprocessing
+from functools import lru_cache, partial
+from concurrent.futures import ProcessPoolExecutor
+from utils.mfcc import extract_mfcc_from_file
+from utils.audio import stream_audio, SAMPLE_RATE
+from utils.mfcc_stream import iter_window_features
+from utils import tracing
 
-def predict_imam(audio_path, model_path, label_path):
-    try:
-        y_audio, sr = load_audio(audio_path), SAMPLE_RATE
-        mfcc = extract_mfcc_from_audio(y=y_audio, sr=sr)
+class TFLiteClassifier:
+    """
+    Modèle .tflite (float16 / int8, voir 11_export_tflite.py) exposant la même méthode
+    predict que Keras. Utilise tflite_runtime (ou ai_edge_litert) si disponible :
+    TensorFlow complet n'est importé qu'en dernier recours.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            try:
+                from ai_edge_litert.interpreter import Interpreter
+            except ImportError:
+                from tensorflow.lite import Interpreter
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads or os.cpu_count())
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch = int(self._input["shape"][0])
+
+    def predict(self, x, batch_size=256, verbose=0):
+        x = np.asarray(x, dtype=np.float32).reshape((-1, *self._input["shape"][1:]))
+        return np.concatenate([self._run(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+
+    def _run(self, x):
+        if len(x) != self._batch:
+            self.interpreter.resize_tensor_input(self._input["index"], [len(x), *self._input["shape"][1:]])
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch = len(x)
+        scale, zero_point = self._input["quantization"]
+        if self._input["dtype"] != np.float32 and scale:
+            x = np.clip(np.round(x / scale + zero_point), -128, 127)
+        self.interpreter.set_tensor(self._input["index"], x.astype(self._input["dtype"]))
+        self.interpreter.invoke()
+        out = self.interpreter.get_tensor(self._output["index"])
+        scale, zero_point = self._output["quantization"]
+        if self._output["dtype"] != np.float32 and scale:
+            out = (out.astype(np.float32) - zero_point) * scale
+        return out
+
+@lru_cache(maxsize=4)
+def load_imam_model(model_path):
+    """
+    Charge le CNN une seule fois par processus : .tflite → runtime léger, sinon Keras
+    (TensorFlow n'est importé que dans ce cas).
+    """
+    if model_path.endswith(".tflite"):
+        return TFLiteClassifier(model_path)
+    from tensorflow.keras.models import load_model
+    return load_model(model_path)
+
+class JsonLabelEncoder:
+    """Équivalent minimal du LabelEncoder sklearn, lu depuis dataset/labels.json (id → imam)."""
+
+    def __init__(self, label_path):
+        with open(label_path, "r", encoding="utf-8") as f:
+            labels = json.load(f)
+        self.classes_ = np.array([labels[str(i)] for i in range(len(labels))])
+
+    def inverse_transform(self, indices):
+        return self.classes_[np.asarray(indices, dtype=np.int64)]
+
+@lru_cache(maxsize=4)
+def load_label_encoder(label_path):
+    """.json → encodeur minimal (sans sklearn), sinon le LabelEncoder picklé."""
+    if label_path.endswith(".json"):
+        return JsonLabelEncoder(label_path)
+    with open(label_path, "rb") as f:
+        return pickle.load(f)
 
-        model = load_model(model_path)
+def predict_imam(audio_path, model_path, label_path, y=None, model=None, label_encoder=None, use_cache=True):
+    """
+    Top 3 des imams. Si y (tampon float32 16 kHz déjà décodé) est fourni,
+    le fichier n'est pas décodé une seconde fois.
+    Un modèle / encodeur déjà chargé peut être passé via model / label_encoder (benchmarks).
+    Le vecteur MFCC passe par le cache de features (mêmes entrées que 01_index_audio.py).
+    """
+    try:
+        _, mfcc, error = extract_mfcc_from_file(audio_path, use_cache, y=y)
+        if error is not None:
+            raise RuntimeError(error)
 
-        with open(label_path, "rb") as f:
-            label_encoder = pickle.load(f)
+        model = model or load_imam_model(model_path)
+        label_encoder = label_encoder or load_label_encoder(label_path)
 
-        preds = model.predict(np.array([mfcc]))[0]
+        with tracing.span("cnn", batch=1):
+            preds = model.predict(np.array([mfcc]), verbose=0)[0]
         top_indices = preds.argsort()[-3:][::-1]
         return [(label_encoder.inverse_transform([idx])[0], preds[idx]) for idx in top_indices]
     except Exception as e:
         print(f"⚠️ Erreur prédiction imam : {e}")
         return []
+
+def predict_imam_batch(audio_paths, model_path, label_path, top_k=3, workers=None, batch_size=256, use_cache=True):
+    """
+    Prédiction par lots : les MFCC sont lus dans le cache de features ou extraits dans des
+    processus (spawn, sans TensorFlow), empilés puis envoyés au CNN par batchs de batch_size.
+    Génère un dict par fichier, dans l'ordre d'entrée : {"file_path", "top": [(imam, score), ...], "error"}.
+    """
+    model = load_imam_model(model_path)
+    label_encoder = load_label_encoder(label_path)
+
+    def flush(batch):
+        # Les fichiers en erreur restent à leur place dans le lot : sortie dans l'ordre d'entrée
+        ok = [mfcc for _, mfcc, error in batch if error is None]
+        if ok:
+            with tracing.span("cnn", batch=len(ok)):
+                preds = iter(model.predict(np.array(ok), batch_size=batch_size, verbose=0))
+            tracing.count("cnn_samples", len(ok))
+        for path, _, error in batch:
+            if error is not None:
+                yield {"file_path": path, "top": [], "error": error}
+                continue
+            row = next(preds)
+            top_indices = row.argsort()[-top_k:][::-1]
+            labels = label_encoder.inverse_transform(top_indices)
+            yield {"file_path": path, "top": [(label, float(row[idx])) for label, idx in zip(labels, top_indices)], "error": None}
+
+    batch, n_ok = [], 0
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        extract = partial(extract_mfcc_from_file, use_cache=use_cache)
+        for path, mfcc, error in executor.map(extract, audio_paths, chunksize=4):
+            batch.append((path, mfcc, error))
+            n_ok += error is None
+            if n_ok >= batch_size:
+                yield from flush(batch)
+                batch, n_ok = [], 0
+        if batch:
+            yield from flush(batch)
+
+def predict_imam_timeline(audio_path, model_path, label_path, window_s=10.0, hop_s=5.0, batch_size=64, top_k=3):
+    """
+    Attribution par fenêtres glissantes pour les longs enregistrements (plusieurs récitants) :
+    l'audio est lu en flux, chaque fenêtre donne un vecteur 26-dim, les fenêtres passent
+    par lots dans le CNN. La mémoire reste constante quelle que soit la durée.
+    Retourne {"timeline": [...], "segments": [...], "top": [(imam, score), ...]}.
+    """
+    model = load_imam_model(model_path)
+    label_encoder = load_label_encoder(label_path)
+    labels = label_encoder.classes_
+
+    timeline, segments = [], []
+    prob_sum, n_windows = None, 0
+
+    def flush(batch):
+        nonlocal prob_sum, n_windows
+        with tracing.span("cnn", batch=len(batch)):
+            preds = model.predict(np.array([f for _, _, f in batch]), batch_size=batch_size, verbose=0)
+        tracing.count("windows_classified", len(batch))
+        prob_sum = preds.sum(axis=0) if prob_sum is None else prob_sum + preds.sum(axis=0)
+        n_windows += len(batch)
+        for (start, end, _), row in zip(batch, preds):
+            idx = int(row.argmax())
+            timeline.append({"start": start, "end": end, "imam": labels[idx], "score": float(row[idx])})
+            # 🧩 Fusion des fenêtres consécutives attribuées au même imam
+            if segments and segments[-1]["imam"] == labels[idx]:
+                segments[-1]["end"] = end
+                segments[-1]["windows"] += 1
+            else:
+                segments.append({"start": start, "end": end, "imam": labels[idx], "windows": 1})
+
+    batch = []
+    windows = iter_window_features(stream_audio(audio_path), SAMPLE_RATE, window_s=window_s, hop_s=hop_s)
+    for window in windows:
+        batch.append(window)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    if not n_windows:
+        return {"timeline": [], "segments": [], "top": []}
+    mean_probs = prob_sum / n_windows
+    top_indices = mean_probs.argsort()[-top_k:][::-1]
+    return {
+        "timeline": timeline,
+        "segments": segments,
+        "top": [(labels[idx], float(mean_probs[idx])) for idx in top_indices],
+    }
@@ -0,0 +1,264 @@
+############### SAWT : CLI UNIFIÉE ###############
+# Les dépendances lourdes (Whisper, TensorFlow, sklearn...) ne sont importées que par
+# les sous-commandes qui en ont besoin : une requête "detect" ne paie que l'index des versets.
+
+from time import perf_counter
+T0 = perf_counter()
+
+import os
+import sys
+import json
+import argparse
+import importlib
+import subprocess
+
+QURAN_VERSES_PATH = "quran_versets.json"
+MODEL_PATH = "models/model_cnn_imam_v4.keras"
+LABEL_ENCODER_PATH = "dataset/label_encoder_imam.pkl"
+WHISPER_SIZE = "medium"
+STARTUP_BASELINE_PATH = "output/startup_baseline.json"
+STARTUP_RUNS = 3
+REGRESSION_RATIO = 1.25   # +25 % d'import par rapport à la référence = régression
+
+# 📦 Modules importés par chaque sous-commande (mesurés par "sawt.py startup")
+COMMAND_IMPORTS = {
+    "transcribe": ["transcribe_audio", "whisper"],
+    "detect": ["detect_versets"],
+    "predict-imam": ["predict_imam"],
+    "align": ["detect_versets", "utils.align"],
+    "run": ["transcribe_audio", "whisper", "detect_versets", "predict_imam", "pipeline"],
+}
+
+IMPORT_TIMES = {}
+
+
+def lazy(name):
+    """Import chronométré (le premier import seulement est compté)."""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES[name] = perf_counter() - start
+    return module
+
+
+def print_json(obj):
+    print(json.dumps(obj, ensure_ascii=False, indent=2, default=lambda o: o.item() if hasattr(o, "item") else str(o)))
+
+
+# 🎧 Sous-commandes
+def cmd_transcribe(args):
+    if args.long:
+        segments, _ = lazy("utils.longform").transcribe_long(args.audio_path, model_size=args.whisper, workers=args.workers)
+    else:
+        segments = lazy("transcribe_audio").transcribe_audio(args.audio_path, model_size=args.whisper)
+    if args.json:
+        print_json(segments)
+    else:
+        print(" ".join(s["text"].strip() for s in segments))
+
+
+def cmd_detect(args):
+    detect_versets = lazy("detect_versets")
+    if args.segments:
+        with open(args.segments, "r", encoding="utf-8") as f:
+            segments = json.load(f)
+    else:
+        segments = [{"text": args.text}]
+    corpus = detect_versets.load_versets(QURAN_VERSES_PATH)
+    matches = detect_versets.detect_top_versets(segments, corpus, top_k=args.top_k, scorer=args.scorer)
+    if args.json:
+        print_json(matches)
+        return
+    for m in matches:
+        print(f"📖 Sourate {m['sourate_id']} ({m['sourate_name']}) | Versets {m['start_verse']}-{m['end_verse']} "
+              f"| Score {m['similarity']:.2%}")
+
+
+def cmd_predict_imam(args):
+    predict_imam = lazy("predict_imam")
+    model = None
+    if args.cascade:
+        # 🪜 Modèle léger d'abord : le CNN (et TensorFlow) n'est chargé que si la prédiction est incertaine
+        model = lazy("utils.cascade").load_cascade(args.model, args.labels, min_confidence=args.min_confidence,
+                                                   min_margin=args.min_margin, ensemble=args.ensemble)
+    top = predict_imam.predict_imam(args.audio_path, args.model, args.labels, model=model)
+    if args.json:
+        print_json([{"imam": imam, "score": float(score)} for imam, score in top])
+        return
+    for imam, score in top:
+        print(f"  ➤ {imam:<30} : {score * 100:.2f}%")
+
+
+def cmd_align(args):
+    if args.segments:
+        with open(args.segments, "r", encoding="utf-8") as f:
+            segments = json.load(f)
+    else:
+        segments = lazy("transcribe_audio").transcribe_audio(args.audio_path, model_size=args.whisper)
+    corpus = lazy("detect_versets").load_versets(QURAN_VERSES_PATH)
+    s_idx = args.sourate - 1 if args.sourate else None
+    result = lazy("utils.align").align_transcript(segments, corpus, s_idx=s_idx)
+    if args.json or result is None:
+        print_json(result)
+        return
+    print(f"📖 Sourate {result['sourate_id']} ({result['sourate_name']}) | {len(result['verses'])} versets alignés")
+    for v in result["verses"]:
+        print(f"  ➤ Verset {v['verse']:>3} : {v['start']:8.2f}s → {v['end']:8.2f}s "
+              f"| couverture {v['coverage']:.0%} | similarité {v['similarity']:.2f}")
+
+
+def cmd_run(args):
+    pipeline = lazy("pipeline")
+    corpus = lazy("detect_versets").load_versets(QURAN_VERSES_PATH)
+    whisper_model = lazy("transcribe_audio").load_whisper_model(args.whisper)
+    result = pipeline.run_pipeline(args.audio_path, corpus, args.model, args.labels,
+                                   whisper_model=whisper_model, top_k=args.top_k)
+    if args.json:
+        print_json({k: v for k, v in result.items() if k != "decode_bytes"})
+        return
+    best = result["versets"][0] if result["versets"] else None
+    if best:
+        print(f"📖 Sourate {best['sourate_id']} ({best['sourate_name']}) | Versets {best['start_verse']}-{best['end_verse']} "
+              f"| Score {best['similarity']:.2%}")
+    for imam, score in result["imams"]:
+        print(f"  ➤ {imam:<30} : {score * 100:.2f}%")
+
+
+# ⏱️ Temps de démarrage par sous-commande (processus neufs), comparé à une référence
+def cmd_startup(args):
+    results = {}
+    for command in COMMAND_IMPORTS:
+        runs = []
+        for _ in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--import-only", command],
+                capture_output=True, text=True,
+            )
+            if out.returncode != 0:
+                runs = None
+                print(f"⚠️ {command} : import impossible ({out.stderr.strip().splitlines()[-1:]})")
+                break
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        if runs:
+            results[command] = min(runs, key=lambda r: r["total_s"])
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    regressions = []
+    print("⏱️ Démarrage par sous-commande (meilleur de %d) :" % args.runs)
+    for command, r in results.items():
+        ref = baseline.get(command, {}).get("total_s")
+        delta = f"  (référence {ref:.3f}s)" if ref else ""
+        if ref and r["total_s"] > ref * REGRESSION_RATIO:
+            regressions.append(command)
+            delta += " ❌ régression"
+        print(f"  ➤ {command:<13} {r['total_s']:.3f}s{delta}")
+        for module, seconds in sorted(r["imports"].items(), key=lambda t: -t[1]):
+            print(f"      {module:<20} {seconds:.3f}s")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Référence enregistrée : {args.baseline}")
+    if regressions:
+        sys.exit(1)
+
+
+COMMANDS = {
+    "transcribe": cmd_transcribe,
+    "detect": cmd_detect,
+    "predict-imam": cmd_predict_imam,
+    "align": cmd_align,
+    "run": cmd_run,
+    "startup": cmd_startup,
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="sawt", description="SawtAI : transcription, versets, imam")
+    parser.add_argument("--timings", action="store_true", help="Affiche les temps d'import et de démarrage (stderr)")
+    parser.add_argument("--trace", action="store_true",
+                        help="Active l'instrumentation (trace JSONL + métriques Prometheus, voir utils/tracing.py)")
+    parser.add_argument("--import-only", metavar="COMMANDE", choices=list(COMMAND_IMPORTS), help=argparse.SUPPRESS)
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("transcribe", help="Transcription Whisper")
+    p.add_argument("audio_path")
+    p.add_argument("--whisper", default=WHISPER_SIZE)
+    p.add_argument("--long", action="store_true", help="Longs enregistrements : silences retirés, morceaux en parallèle")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--json", action="store_true")
+
+    p = sub.add_parser("detect", help="Versets les plus proches d'un texte ou de segments")
+    source = p.add_mutually_exclusive_group(required=True)
+    source.add_argument("--text")
+    source.add_argument("--segments", help="Fichier JSON de segments Whisper")
+    p.add_argument("--top-k", type=int, default=5)
+    p.add_argument("--scorer", default=None, help="rapidfuzz (défaut) ou difflib")
+    p.add_argument("--json", action="store_true")
+
+    p = sub.add_parser("predict-imam", help="Top imams d'un fichier audio")
+    p.add_argument("audio_path")
+    p.add_argument("--model", default=MODEL_PATH, help="Modèle .keras ou .tflite")
+    p.add_argument("--labels", default=LABEL_ENCODER_PATH, help="Label encoder .pkl ou labels.json")
+    p.add_argument("--cascade", action="store_true",
+                   help="Plus proche centroïde d'abord, CNN seulement si incertain (models/imam_centroids.npz)")
+    p.add_argument("--min-confidence", type=float, default=0.6)
+    p.add_argument("--min-margin", type=float, default=0.2)
+    p.add_argument("--ensemble", action="store_true", help="Mélange modèle léger / CNN quand le CNN est consulté")
+    p.add_argument("--json", action="store_true")
+
+    p = sub.add_parser("align", help="Horodatage verset par verset d'une récitation (sourate entière)")
+    source = p.add_mutually_exclusive_group(required=True)
+    source.add_argument("audio_path", nargs="?")
+    source.add_argument("--segments", help="Fichier JSON de segments Whisper (avec words)")
+    p.add_argument("--sourate", type=int, default=None, help="Numéro de sourate (sinon localisée automatiquement)")
+    p.add_argument("--whisper", default=WHISPER_SIZE)
+    p.add_argument("--json", action="store_true")
+
+    p = sub.add_parser("run", help="Pipeline complet à décodage unique")
+    p.add_argument("audio_path")
+    p.add_argument("--model", default=MODEL_PATH)
+    p.add_argument("--labels", default=LABEL_ENCODER_PATH)
+    p.add_argument("--whisper", default=WHISPER_SIZE)
+    p.add_argument("--top-k", type=int, default=5)
+    p.add_argument("--json", action="store_true")
+
+    p = sub.add_parser("startup", help="Mesure les temps d'import de chaque sous-commande")
+    p.add_argument("--runs", type=int, default=STARTUP_RUNS)
+    p.add_argument("--baseline", default=STARTUP_BASELINE_PATH)
+    p.add_argument("--save", action="store_true", help="Enregistre les mesures comme nouvelle référence")
+    return parser
+
+
+def main(argv=None):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    args = build_parser().parse_args(argv)
+
+    if args.import_only:
+        for name in COMMAND_IMPORTS[args.import_only]:
+            lazy(name)
+        print(json.dumps({"total_s": perf_counter() - T0, "imports": IMPORT_TIMES}))
+        return
+    if not args.command:
+        build_parser().print_help()
+        return
+
+    if args.trace:
+        lazy("utils.tracing").enable()
+    ready = perf_counter() - T0
+    start = perf_counter()
+    COMMANDS[args.command](args)
+    if args.timings:
+        imports = " | ".join(f"{k} {v:.2f}s" for k, v in IMPORT_TIMES.items())
+        print(f"⏱️ CLI prête {ready * 1000:.0f} ms | commande {perf_counter() - start:.2f}s"
+              + (f" | imports : {imports}" if imports else ""), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
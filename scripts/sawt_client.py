@@ -0,0 +1,82 @@
+import json
+import socket
+import argparse
+import http.client
+from urllib.parse import urlparse
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class SawtClient:
+    """
+    Client local du serveur d'inférence (HTTP ou socket Unix via « unix:///chemin »).
+    """
+
+    def __init__(self, url=DEFAULT_URL, timeout=600):
+        self.url = urlparse(url)
+        self.timeout = timeout
+
+    def _connection(self):
+        if self.url.scheme == "unix":
+            return UnixHTTPConnection(self.url.path, timeout=self.timeout)
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+
+    def _request(self, method, path, payload=None):
+        conn = self._connection()
+        try:
+            body = json.dumps(payload).encode("utf-8") if payload is not None else None
+            headers = {"Content-Type": "application/json"} if body else {}
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = json.loads(response.read() or b"{}")
+        finally:
+            conn.close()
+        if response.status != 200:
+            raise RuntimeError(f"{response.status} : {data.get('error')}")
+        return data
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def transcribe(self, audio_path):
+        return self._request("POST", "/transcribe", {"audio_path": audio_path})
+
+    def detect(self, text=None, segments=None, top_k=5):
+        return self._request("POST", "/detect", {"text": text, "segments": segments, "top_k": top_k})
+
+    def predict_imam(self, audio_path):
+        return self._request("POST", "/predict-imam", {"audio_path": audio_path})
+
+    def run(self, audio_path, top_k=5):
+        return self._request("POST", "/run", {"audio_path": audio_path, "top_k": top_k})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Client du serveur d'inférence SawtAI")
+    parser.add_argument("task", choices=["health", "transcribe", "detect", "predict-imam", "run"])
+    parser.add_argument("target", nargs="?", help="Chemin audio (ou texte pour detect)")
+    parser.add_argument("--url", default=DEFAULT_URL, help="http://hôte:port ou unix:///chemin/socket")
+    args = parser.parse_args()
+
+    client = SawtClient(args.url)
+    if args.task == "health":
+        response = client.health()
+    elif args.task == "detect":
+        response = client.detect(text=args.target)
+    else:
+        response = getattr(client, args.task.replace("-", "_"))(args.target)
+
+    print(json.dumps(response, ensure_ascii=False, indent=2))
+    if "elapsed" in response:
+        print(f"⏱️ Temps serveur : {response['elapsed']:.2f}s")
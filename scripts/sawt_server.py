@@ -0,0 +1,242 @@
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+import json
+import argparse
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+# 📍 Config
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_WORKERS = 2
+MAX_QUEUE = 16
+REQUEST_TIMEOUT = 600
+WHISPER_SIZE = "medium"
+QURAN_VERSES_PATH = "quran_versets.json"
+MODEL_PATH = "models/model_cnn_imam_v4.keras"
+LABEL_ENCODER_PATH = "dataset/label_encoder_imam.pkl"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class UnknownTask(Exception):
+    pass
+
+
+class InvalidRequest(Exception):
+    pass
+
+
+class InferenceService:
+    """
+    Garde Whisper, le CNN, le label encoder et l'index des versets en mémoire.
+    Les requêtes passent par un pool borné de workers ; au-delà de
+    max_workers + max_queue requêtes en vol, les nouvelles sont refusées.
+    """
+
+    def __init__(self, whisper_size=WHISPER_SIZE, model_path=MODEL_PATH, label_path=LABEL_ENCODER_PATH,
+                 versets_path=QURAN_VERSES_PATH, max_workers=MAX_WORKERS, max_queue=MAX_QUEUE):
+        from transcribe_audio import load_whisper_model
+        from detect_versets import load_versets
+        from predict_imam import load_imam_model, load_label_encoder
+        from utils.verse_index import get_verse_index
+
+        self.whisper_size = whisper_size
+        self.model_path = model_path
+        self.label_path = label_path
+        self.load_times = {}
+
+        # 🧠 Chargement unique des modèles
+        for name, loader in (
+            ("whisper", lambda: load_whisper_model(whisper_size)),
+            ("cnn", lambda: load_imam_model(model_path)),
+            ("label_encoder", lambda: load_label_encoder(label_path)),
+            ("corpus", lambda: load_versets(versets_path)),
+        ):
+            start = perf_counter()
+            value = loader()
+            self.load_times[name] = perf_counter() - start
+            if name == "whisper":
+                self.whisper = value
+            elif name == "corpus":
+                self.corpus = value
+
+        start = perf_counter()
+        get_verse_index(self.corpus)
+        self.load_times["verse_index"] = perf_counter() - start
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        # Whisper installe des hooks sur le modèle pendant le décodage : un seul appel à la fois
+        self._whisper_lock = threading.Lock()
+
+    def submit(self, task, payload, timeout=REQUEST_TIMEOUT):
+        handler = getattr(self, f"_task_{task.replace('-', '_')}", None)
+        if handler is None:
+            raise UnknownTask(task)
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull()
+        try:
+            future = self._executor.submit(self._timed, handler, payload)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=timeout)
+
+    def _timed(self, handler, payload):
+        from utils import tracing
+        start = perf_counter()
+        with tracing.span("request", task=handler.__name__.replace("_task_", "")):
+            result = handler(payload)
+        return {"result": result, "elapsed": perf_counter() - start}
+
+    # 🎧 Tâches
+    def _task_transcribe(self, payload):
+        from transcribe_audio import transcribe_audio
+        with self._whisper_lock:
+            return transcribe_audio(payload["audio_path"], model=self.whisper)
+
+    def _task_detect(self, payload):
+        from detect_versets import detect_top_versets
+        segments = payload.get("segments")
+        if not segments:
+            if not isinstance(payload.get("text"), str):
+                raise InvalidRequest("segments (liste non vide) ou text (chaîne) requis")
+            segments = [{"text": payload["text"]}]
+        elif not isinstance(segments, list):
+            raise InvalidRequest("segments doit être une liste")
+        return detect_top_versets(segments, self.corpus, top_k=payload.get("top_k", 5))
+
+    def _task_predict_imam(self, payload, y=None):
+        from predict_imam import predict_imam
+        top = predict_imam(payload["audio_path"], self.model_path, self.label_path, y=y)
+        return [{"imam": imam, "score": float(score)} for imam, score in top]
+
+    def _task_run(self, payload):
+        from transcribe_audio import transcribe_audio
+        from utils.audio import load_audio_buffer
+
+        # 🔊 Décodage unique partagé par la transcription et les MFCC
+        y = load_audio_buffer(payload["audio_path"])
+        with self._whisper_lock:
+            segments = transcribe_audio(y, model=self.whisper)
+        return {
+            "segments": segments,
+            # Transcription vide (silence) : aucun verset, pas une requête invalide
+            "versets": self._task_detect({"segments": segments, "top_k": payload.get("top_k", 5)}) if segments else [],
+            "imams": self._task_predict_imam(payload, y=y),
+        }
+
+    def health(self):
+        return {"status": "ok", "load_times": self.load_times}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def _to_json(obj):
+    return obj.item() if hasattr(obj, "item") else str(obj)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False, default=_to_json).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, service.health())
+            elif self.path == "/metrics":
+                from utils import tracing
+                data = tracing.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self._send(404, {"error": "route inconnue"})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                self._send(200, service.submit(self.path.strip("/"), payload))
+            except UnknownTask as e:
+                self._send(404, {"error": f"tâche inconnue : {e}"})
+            except KeyError as e:
+                self._send(400, {"error": f"champ manquant : {e}"})
+            except InvalidRequest as e:
+                self._send(400, {"error": str(e)})
+            except QueueFull:
+                self._send(503, {"error": "file d'attente pleine"})
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+        def log_message(self, fmt, *args):
+            print(f"🌐 {self.command} {self.path} → {args[1] if len(args) > 1 else ''}")
+
+    return Handler
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+def serve(host=HOST, port=PORT, socket_path=None, **service_kwargs):
+    print("🧠 Chargement des modèles...")
+    service = InferenceService(**service_kwargs)
+    for name, seconds in service.load_times.items():
+        print(f"  ➤ {name:<15} : {seconds:.2f}s")
+
+    handler = make_handler(service)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, handler)
+        print(f"🚀 Serveur prêt sur unix://{socket_path}")
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        print(f"🚀 Serveur prêt sur http://{host}:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Arrêt du serveur.")
+    finally:
+        server.server_close()
+        service.close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur d'inférence SawtAI (modèles résidents)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--socket", dest="socket_path", help="Chemin d'un socket Unix (remplace host/port)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--queue", type=int, default=MAX_QUEUE)
+    parser.add_argument("--whisper", default=WHISPER_SIZE)
+    args = parser.parse_args()
+
+    serve(
+        host=args.host, port=args.port, socket_path=args.socket_path,
+        whisper_size=args.whisper, max_workers=args.workers, max_queue=args.queue,
+    )
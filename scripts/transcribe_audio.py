@@ -1,20 +1,40 @@
-import whisper
 import contextlib
 import io
+from functools import lru_cache
+from utils import tracing
 
-def transcribe_audio(AUDIO_PATH: str, model_size="medium"):
+@lru_cache(maxsize=2)
+def load_whisper_model(model_size="medium"):
+    """
+    Charge le modèle Whisper une seule fois par processus.
+    Whisper (et torch) ne sont importés qu'ici, au premier chargement.
+    Le modèle est marqué de l'identité de son checkpoint (clé du cache de transcriptions).
+    """
+    with tracing.span("whisper_load", model_size=model_size):
+        import whisper
+        from utils.transcript_cache import checkpoint_tag
+        model = whisper.load_model(model_size)
+        model.sawt_tag = checkpoint_tag(model_size)
+        return model
+
+def transcribe_audio(AUDIO_PATH, model_size="medium", model=None, use_cache=True, language="ar", **options):
     """
     Transcrit le fichier audio complet avec Whisper.
+    AUDIO_PATH peut être un chemin ou le tampon float32 16 kHz déjà décodé
+    (utils.audio.load_audio_buffer), qui est alors utilisé sans re-décodage.
     Utilise word_timestamps pour affichage progressif.
+    Un modèle déjà chargé peut être passé via model (serveur, pipeline).
+    Les segments sont mis en cache (utils/transcript_cache.py) par contenu audio, modèle,
+    langue et options de décodage : une seconde analyse du même audio saute Whisper.
     """
-    model = whisper.load_model(model_size)
+    model = model or load_whisper_model(model_size)
+    options = {"word_timestamps": True, **options}
 
-    with contextlib.redirect_stdout(io.StringIO()):
-        result = model.transcribe(
-            AUDIO_PATH,
-            language="ar",
-            verbose=False,
-            word_timestamps=True
-        )
+    def run():
+        with tracing.span("transcribe", model_size=model_size), contextlib.redirect_stdout(io.StringIO()):
+            return model.transcribe(AUDIO_PATH, language=language, verbose=False, **options)["segments"]
 
-    return result["segments"]
+    from utils.transcript_cache import get_transcript_cache, transcript_key, model_tag
+    if not use_cache or model_tag(model) is None:
+        return run()
+    return get_transcript_cache().get_or_compute(transcript_key(AUDIO_PATH, model, language, options), run)
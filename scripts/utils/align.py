@@ -0,0 +1,278 @@
+# 🧭 Alignement mot à mot d'une transcription horodatée sur une sourate complète
+# Une fois la sourate localisée, la suite des mots Whisper (word_timestamps) est alignée
+# sur la suite des mots de la sourate par programmation dynamique en bande :
+# coût O(n × bande) au lieu d'un produit sur toutes les tailles de fenêtres, mémoire linéaire.
+import numpy as np
+from collections import Counter
+from utils.normalize_arabic import normalize_arabic
+
+BAND = 48              # demi-largeur de bande (mots de la sourate de part et d'autre de la diagonale)
+MAX_BAND = 768         # élargissement maximal si le chemin touche le bord de la bande
+GAP_COST = 0.7         # mot ajouté par Whisper ou mot de la sourate manqué
+ANCHOR_NGRAM = 3       # n-grammes de mots uniques servant d'ancres pour centrer la bande
+LOCATE_CHUNK = 30      # mots par requête pour localiser la sourate
+MIN_SIMILARITY = 0.5   # en dessous, une substitution ne compte pas comme mot reconnu
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# ⬅️ Pointeurs de retour : 0 = diagonale (match / substitution), 1 = haut (mot transcrit en trop),
+# 2 = gauche (mot de la sourate manqué)
+DIAG, UP, LEFT = 0, 1, 2
+
+
+def transcript_words(segments):
+    """
+    Mots normalisés horodatés [(mot, début, fin), ...] depuis des segments Whisper.
+    Sans word_timestamps, les mots d'un segment se partagent sa durée à parts égales.
+    """
+    words = []
+    for segment in segments:
+        if segment.get("words"):
+            for w in segment["words"]:
+                for token in normalize_arabic(w["word"]).split():
+                    words.append((token, float(w["start"]), float(w["end"])))
+            continue
+        tokens = normalize_arabic(segment["text"]).split()
+        step = (segment["end"] - segment["start"]) / max(len(tokens), 1)
+        words.extend((t, segment["start"] + k * step, segment["start"] + (k + 1) * step) for k, t in enumerate(tokens))
+    return words
+
+
+def sura_words(corpus, s_idx):
+    """Mots normalisés de la sourate et id global de verset de chaque mot."""
+    first, count = corpus.sourate_verses(s_idx)
+    words, vids = [], []
+    for vid in range(first, first + count):
+        tokens = corpus.verse_text(vid).split()
+        words.extend(tokens)
+        vids.extend([vid] * len(tokens))
+    return words, np.array(vids, dtype=np.int32)
+
+
+def locate_sura(words, corpus, scorer=None, chunk=LOCATE_CHUNK):
+    """
+    Sourate récitée : chaque tranche de chunk mots vote pour la sourate de son meilleur
+    match (index n-gramme), pondéré par la similarité.
+    """
+    from detect_versets import detect_top_versets
+
+    votes = Counter()
+    for start in range(0, len(words), chunk):
+        text = " ".join(w for w, _, _ in words[start:start + chunk])
+        best = detect_top_versets([{"text": text}], corpus, top_k=1, scorer=scorer)
+        if best:
+            first = corpus.sourate_verses(best[0]["sourate_id"] - 1)[0]
+            votes[corpus.sourate_of(first)] += best[0]["similarity"]
+    return votes.most_common(1)[0][0] if votes else None
+
+
+def _letter_masks(words):
+    """Signature 64 bits des lettres de chaque mot (similarité de Jaccard approchée, vectorisée)."""
+    masks = np.zeros(len(words), dtype=np.uint64)
+    for i, w in enumerate(words):
+        m = 0
+        for ch in w:
+            m |= 1 << (ord(ch) % 64)
+        masks[i] = m
+    return masks
+
+
+def _popcount(x):
+    return _POPCOUNT[x.view(np.uint8)].reshape(len(x), 8).sum(axis=1)
+
+
+def _anchors(hyp_ids, ref_ids, n=ANCHOR_NGRAM):
+    """
+    Paires (i, j) de n-grammes de mots présents une seule fois de chaque côté,
+    réduites à la plus longue chaîne croissante (ancres monotones).
+    """
+    def unique_grams(ids):
+        grams = Counter(tuple(ids[k:k + n]) for k in range(len(ids) - n + 1))
+        return {tuple(ids[k:k + n]): k for k in range(len(ids) - n + 1) if grams[tuple(ids[k:k + n])] == 1}
+
+    ref_grams = unique_grams(ref_ids)
+    pairs = sorted((i, ref_grams[g]) for g, i in unique_grams(hyp_ids).items() if g in ref_grams)
+
+    # 📈 Plus longue sous-suite croissante en j (patience sorting)
+    tails, tails_idx, prev = [], [], [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = int(np.searchsorted(tails, j))
+        if pos > 0:
+            prev[k] = tails_idx[pos - 1]
+        if pos == len(tails):
+            tails.append(j)
+            tails_idx.append(k)
+        else:
+            tails[pos], tails_idx[pos] = j, k
+    chain, k = [], tails_idx[-1] if tails_idx else -1
+    while k >= 0:
+        chain.append(pairs[k])
+        k = prev[k]
+    return chain[::-1]
+
+
+def _band_centers(n, m, anchors, band=BAND):
+    """
+    Colonne centrale de la bande pour chaque mot transcrit (interpolation entre ancres).
+    Entre deux ancres dont l'écart dépasse band (verset sauté, passage répété), pas
+    d'interpolation : pente 1 depuis chaque ancre, et le centre saute au milieu des deux.
+    """
+    if not anchors:
+        return np.linspace(0, m - 1, n) if n > 1 else np.zeros(n)
+    ai = np.array([a for a, _ in anchors], dtype=np.float64)
+    aj = np.array([b for _, b in anchors], dtype=np.float64)
+    rows = np.arange(n, dtype=np.float64)
+    centers = np.interp(rows, ai, aj)
+    centers[rows < ai[0]] = aj[0] - (ai[0] - rows[rows < ai[0]])    # pente 1 avant la 1re ancre
+    centers[rows > ai[-1]] = aj[-1] + (rows[rows > ai[-1]] - ai[-1])  # et après la dernière
+    for k in np.flatnonzero(np.abs(np.diff(aj) - np.diff(ai)) > band):
+        i0, i1 = int(ai[k]), int(ai[k + 1])
+        mid = (i0 + i1) // 2
+        centers[i0 + 1:mid + 1] = aj[k] + (rows[i0 + 1:mid + 1] - i0)
+        centers[mid + 1:i1] = aj[k + 1] - (i1 - rows[mid + 1:i1])
+    return centers
+
+
+def _row_at(row, row_lo, cols_abs):
+    """Coûts d'une ligne de la bande aux colonnes absolues cols_abs (inf hors bande)."""
+    k = cols_abs - row_lo
+    ok = (k >= 0) & (k < len(row))
+    out = np.full(len(cols_abs), np.inf)
+    out[ok] = row[k[ok]]
+    return out
+
+
+def banded_align(hyp, ref, band=BAND, gap=GAP_COST):
+    """
+    Alignement semi-global de hyp (mots transcrits) sur ref (mots de la sourate) :
+    les mots de la sourate avant / après la récitation ne coûtent rien.
+    Retourne ([(i, j, similarité), ...] pour les paires alignées, touche_le_bord).
+    Mémoire : une ligne de coûts + les pointeurs de la bande (n × (2·band + 1) octets).
+    """
+    n, m = len(hyp), len(ref)
+    vocab = {w: k for k, w in enumerate(dict.fromkeys(ref + hyp))}
+    hyp_ids = np.array([vocab[w] for w in hyp], dtype=np.int64)
+    ref_ids = np.array([vocab[w] for w in ref], dtype=np.int64)
+    hyp_masks, ref_masks = _letter_masks(hyp), _letter_masks(ref)
+
+    centers = _band_centers(n, m, _anchors(hyp_ids.tolist(), ref_ids.tolist()), band)
+    width = 2 * band + 1
+    lo = np.clip(np.round(centers).astype(np.int64) - band, 0, max(m - width, 0))
+
+    # ✂️ La bande saute de plus de band colonnes (verset sauté) : les deux lignes n'ont plus de
+    # colonnes communes, l'alignement repart de zéro (semi-global) à partir de cette ligne
+    bounds = [0, *(np.flatnonzero(np.abs(np.diff(lo)) > band) + 1).tolist(), n]
+    pairs, touched = [], False
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        block, block_touched = _align_block(hyp_ids[a:b], hyp_masks[a:b], ref_ids, ref_masks, lo[a:b],
+                                            min(width, m), gap)
+        pairs.extend((a + i, j, sim) for i, j, sim in block)
+        touched |= block_touched
+    return pairs, touched
+
+
+def _align_block(hyp_ids, hyp_masks, ref_ids, ref_masks, lo, cols, gap):
+    """DP en bande sur des lignes consécutives dont la bande se décale d'au plus band colonnes."""
+    n, m = len(hyp_ids), len(ref_ids)
+    back = np.zeros((n, cols), dtype=np.uint8)
+    sims = np.zeros((n, cols), dtype=np.float32)
+    offsets = np.arange(cols) * gap
+
+    prev_lo, prev = lo[0], None
+    for i in range(n):
+        j = lo[i] + np.arange(cols)
+        inter = _popcount(ref_masks[j] & hyp_masks[i])
+        union = np.maximum(_popcount(ref_masks[j] | hyp_masks[i]), 1)
+        sim = np.where(ref_ids[j] == hyp_ids[i], 1.0, inter / union)
+        sims[i] = sim
+
+        if i == 0:
+            diag = 1 - sim  # début libre : n'importe quel mot de la sourate peut ouvrir la récitation
+            up = np.full(cols, gap)
+        else:
+            diag = _row_at(prev, prev_lo, j - 1) + (1 - sim)
+            up = _row_at(prev, prev_lo, j) + gap
+        base = np.minimum(diag, up)
+        ptr = np.where(diag <= up, DIAG, UP).astype(np.uint8)
+
+        # ⬅️ Dépendance gauche résolue d'un coup : D[j] = min_k≤j (base[k] + (j - k)·gap)
+        left = np.minimum.accumulate(base - offsets) + offsets
+        ptr[left < base - 1e-12] = LEFT
+        back[i] = ptr
+        prev, prev_lo = np.minimum(base, left), lo[i]
+
+    # Fin libre : meilleure colonne de la dernière ligne ; une ligne entièrement infinie
+    # (bande sans recouvrement avec la précédente) invalide le bloc
+    if not np.isfinite(prev).any():
+        return [], False
+    k = int(np.argmin(prev))
+    touched = k in (0, cols - 1) and 0 < lo[n - 1] + k < m - 1
+    pairs, i = [], n - 1
+    while i >= 0 and 0 <= k < cols:
+        p = back[i, k]
+        if k in (0, cols - 1) and 0 < lo[i] + k < m - 1:
+            touched = True
+        if p == DIAG:
+            pairs.append((i, int(lo[i] + k), float(sims[i, k])))
+            i -= 1
+            k = k - 1 + (lo[i + 1] - lo[i]) if i >= 0 else -1
+        elif p == UP:
+            i -= 1
+            k = k + (lo[i + 1] - lo[i]) if i >= 0 else -1
+        else:
+            k -= 1
+    return pairs[::-1], touched
+
+
+def align_transcript(segments, corpus, s_idx=None, scorer=None, band=BAND):
+    """
+    Carte verset → horodatage pour une récitation d'une sourate, de longueur quelconque.
+    La bande est doublée tant que le chemin optimal en touche le bord (dérive importante).
+    Retourne {"sourate_id", "sourate_name", "verses": [{"verse", "start", "end", "words",
+    "coverage", "similarity"}, ...], "band"}.
+    """
+    words = transcript_words(segments)
+    if not words:
+        return None
+    if s_idx is None:
+        s_idx = locate_sura(words, corpus, scorer=scorer)
+        if s_idx is None:
+            return None
+    ref, ref_vids = sura_words(corpus, s_idx)
+    hyp = [w for w, _, _ in words]
+
+    while True:
+        pairs, touched = banded_align(hyp, ref, band=band)
+        if not touched or band >= MAX_BAND or 2 * band + 1 >= len(ref):
+            break
+        band *= 2
+
+    # 📍 Regroupement par verset : premier / dernier mot transcrit aligné sur le verset
+    per_verse = {}
+    for i, j, sim in pairs:
+        if sim < MIN_SIMILARITY:
+            continue
+        vid = int(ref_vids[j])
+        v = per_verse.setdefault(vid, {"start": words[i][1], "end": words[i][2], "refs": set(), "sims": []})
+        v["start"], v["end"] = min(v["start"], words[i][1]), max(v["end"], words[i][2])
+        v["refs"].add(j)
+        v["sims"].append(sim)
+
+    verse_sizes = np.bincount(ref_vids - ref_vids[0])
+    verses = []
+    for vid in sorted(per_verse):
+        v = per_verse[vid]
+        verses.append({
+            "verse": corpus.verse_id(vid),
+            "start": v["start"],
+            "end": v["end"],
+            "words": len(v["sims"]),
+            "coverage": len(v["refs"]) / int(verse_sizes[vid - ref_vids[0]]),
+            "similarity": float(np.mean(v["sims"])),
+        })
+    return {
+        "sourate_id": corpus.sourate_id(s_idx),
+        "sourate_name": corpus.sourate_name(s_idx),
+        "verses": verses,
+        "band": band,
+    }
@@ -0,0 +1,71 @@
+# 🔊 Décodage audio unique (float32 mono 16 kHz) partagé par tout le pipeline
+import subprocess
+import numpy as np
+from utils import tracing
+
+SAMPLE_RATE = 16000  # fréquence attendue par Whisper
+
+
+def load_audio_buffer(path, sr=SAMPLE_RATE):
+    """
+    Décode un fichier audio une seule fois via ffmpeg (même conversion que
+    whisper.audio.load_audio) et retourne un tableau float32 contigu.
+    Ce même tableau est ensuite passé tel quel à Whisper, aux MFCC, etc.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr), "-"
+    ]
+    with tracing.span("decode") as s:
+        try:
+            raw = subprocess.run(cmd, capture_output=True, check=True).stdout
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Échec du décodage audio : {e.stderr.decode(errors='ignore')}") from e
+
+        y = np.frombuffer(raw, np.int16).astype(np.float32)
+        y *= 1 / 32768.0  # en place : pas de copie supplémentaire
+        s.set(seconds=len(y) / sr)
+        tracing.high_water("decode_bytes", decode_footprint(y))
+    return y
+
+
+def decode_footprint(y):
+    """
+    Mémoire transitoire d'un décodage (PCM int16 + float32), en octets.
+    C'est ce que coûte chaque décodage évité sur le même fichier.
+    """
+    return y.size * (np.dtype(np.int16).itemsize + np.dtype(np.float32).itemsize)
+
+
+def stream_audio(path, sr=SAMPLE_RATE, block_seconds=5.0):
+    """
+    Décode un fichier en flux via ffmpeg et génère des blocs float32 de block_seconds.
+    La mémoire reste constante quelle que soit la durée du fichier.
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr), "-"
+    ]
+    block_bytes = int(block_seconds * sr) * 2
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        pending = b""
+        while True:
+            chunk = process.stdout.read(block_bytes - len(pending))
+            if not chunk:
+                break
+            pending += chunk
+            if len(pending) == block_bytes:
+                yield np.frombuffer(pending, np.int16).astype(np.float32) / 32768.0
+                pending = b""
+        if len(pending) >= 2:
+            yield np.frombuffer(pending[:len(pending) // 2 * 2], np.int16).astype(np.float32) / 32768.0
+        if process.wait() != 0:
+            raise RuntimeError(f"Échec du décodage audio : {process.stderr.read().decode(errors='ignore')}")
+    finally:
+        # Arrêt anticipé du consommateur : on coupe ffmpeg au lieu d'attendre la fin du fichier
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
@@ -0,0 +1,267 @@
+# 🎛️ Moteur d'augmentations pour la génération du dataset MFCC
+import os
+import sys
+import zlib
+from functools import lru_cache
+from time import perf_counter
+import numpy as np
+import librosa
+import scipy.signal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.mfcc import (
+    extract_mfcc_from_audio, normalize_and_emphasize, rms_scalar, mel_filterbank,
+    mfcc_stats_from_mel, N_FFT, HOP_LENGTH
+)
+
+TARGET_DB = -20
+PRE_EMPHASIS = 0.97
+REVERB_SECONDS = 0.3
+
+# 🔧 Filtre passe-bas : conçu une seule fois (coefficients normalisés, indépendants de sr)
+LOW_PASS_BA = scipy.signal.butter(6, 0.1, btype='low', analog=False)
+
+
+# 📜 Augmentations historiques (référence pour la parité et le benchmark)
+def legacy_pitch_shift(y, sr): return librosa.effects.pitch_shift(y=y, sr=sr, n_steps=2)
+def legacy_time_stretch(y, sr): return librosa.effects.time_stretch(y, rate=1.1)
+def legacy_white_noise(y, sr): return y + 0.005 * np.random.randn(len(y))
+def legacy_low_pass_filter(y, sr):
+    b, a = scipy.signal.butter(6, 0.1, btype='low', analog=False)
+    return scipy.signal.lfilter(b, a, y)
+def legacy_random_gain(y, sr): return y * np.random.uniform(0.7, 1.3)
+def legacy_background_noise(y, sr): return y + np.random.normal(0, 0.003, len(y))
+def legacy_reverb(y, sr):
+    impulse = np.zeros_like(y)
+    impulse[0] = 1.0
+    impulse[5000:] += 0.5 * np.random.randn(len(y) - 5000)
+    return scipy.signal.fftconvolve(y, impulse, mode='full')[:len(y)]
+
+LEGACY_AUGMENTATIONS = {
+    "original": lambda y, sr: y,
+    "pitch_shift": legacy_pitch_shift,
+    "time_stretch": legacy_time_stretch,
+    "white_noise": legacy_white_noise,
+    "reverb": legacy_reverb,
+    "low_pass_filter": legacy_low_pass_filter,
+    "random_gain": legacy_random_gain,
+    "background_noise": legacy_background_noise,
+}
+
+
+@lru_cache(maxsize=8)
+def reverb_impulse(sr, seconds=REVERB_SECONDS, seed=0):
+    """
+    Réponse impulsionnelle courte (bruit à décroissance exponentielle), mise en cache par sr.
+    Remplace l'impulsion aléatoire aussi longue que le signal de l'ancien apply_reverb.
+    """
+    rng = np.random.default_rng(seed)
+    n = max(1, int(seconds * sr))
+    decay = np.exp(-6.9 * np.arange(n) / n)  # -60 dB en fin d'impulsion
+    impulse = 0.5 * rng.standard_normal(n) * decay
+    impulse[0] = 1.0
+    return (impulse / np.sqrt(np.sum(impulse ** 2))).astype(np.float32)
+
+
+# ⏱️ Augmentations temporelles (nécessitent leur propre STFT)
+TIME_DOMAIN = {
+    "pitch_shift": legacy_pitch_shift,
+    "time_stretch": legacy_time_stretch,
+    "low_pass_filter": lambda y, sr: scipy.signal.lfilter(LOW_PASS_BA[0], LOW_PASS_BA[1], y),
+    "reverb": lambda y, sr: scipy.signal.oaconvolve(y, reverb_impulse(sr), mode='full')[:len(y)],
+}
+
+# 🌈 Augmentations exprimées sur le spectre (réutilisent le STFT/mel du signal original)
+SPECTRAL = ("original", "random_gain", "white_noise", "background_noise", "freq_mask", "time_mask")
+NOISE_STD = {"white_noise": 0.005, "background_noise": 0.003}
+
+DEFAULT_AUGMENTATIONS = tuple(LEGACY_AUGMENTATIONS)
+
+
+def augmentation_rng(seed, name):
+    """Générateur propre à (graine, augmentation) : ses tirages ne dépendent pas des autres augmentations calculées."""
+    return np.random.default_rng([seed, zlib.crc32(name.encode("utf-8"))])
+
+
+class AugmentationEngine:
+    """
+    Calcule les features 26-dim de plusieurs augmentations d'un même fichier :
+    - un seul STFT + mel pour toutes les augmentations spectrales (gain, bruit, masques) ;
+    - filtres et réponses impulsionnelles précalculés pour les augmentations temporelles.
+    Le bruit additif est modélisé par sa puissance attendue après pre-emphasis
+    (σ²·|1 - c·e^{-jω}|²·Σw²) avec une fluctuation Gamma par bande mel.
+    """
+
+    def __init__(self, target_dB=TARGET_DB, coef=PRE_EMPHASIS, n_mfcc=13, n_fft=N_FFT, hop_length=HOP_LENGTH):
+        self.target_dB = target_dB
+        self.coef = coef
+        self.n_mfcc = n_mfcc
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+
+    def features(self, y, sr, names=DEFAULT_AUGMENTATIONS, rng=None, seed=None):
+        """
+        Retourne {nom: vecteur 26-dim (np.ndarray)} pour les augmentations demandées.
+        Avec seed, chaque augmentation tire de augmentation_rng(seed, nom) : résultat
+        reproductible quel que soit le sous-ensemble demandé (rng est alors ignoré).
+        """
+        rng = rng or np.random.default_rng()
+        out = {}
+        spectral = [name for name in names if name in SPECTRAL]
+        if spectral:
+            base = self._base(y, sr)
+            for name in spectral:
+                out[name] = self._spectral(name, base, rng if seed is None else augmentation_rng(seed, name))
+        for name in names:
+            if name in TIME_DOMAIN:
+                out[name] = self._from_signal(TIME_DOMAIN[name](y, sr), sr)
+            elif name not in SPECTRAL:
+                raise KeyError(f"Augmentation inconnue : {name}")
+        return out
+
+    # 🔊 Chemin temporel : même calcul que extract_mfcc_from_audio
+    def _from_signal(self, y, sr):
+        mel = self._mel_power(normalize_and_emphasize(y, self.target_dB, self.coef), sr)
+        return mfcc_stats_from_mel(mel, n_mfcc=self.n_mfcc)
+
+    def _mel_power(self, y, sr):
+        S = np.abs(librosa.stft(y, n_fft=self.n_fft, hop_length=self.hop_length)) ** 2
+        return mel_filterbank(sr, self.n_fft) @ S
+
+    # 🌈 Chemin spectral
+    def _base(self, y, sr):
+        y = np.asarray(y, dtype=np.float32)
+        emphasized = normalize_and_emphasize(y, self.target_dB, self.coef) / rms_scalar(y, self.target_dB)
+        mel = self._mel_power(emphasized, sr)
+        basis = mel_filterbank(sr, self.n_fft)
+
+        # Puissance attendue d'un bruit blanc de variance 1 après pre-emphasis, par bande mel
+        omega = np.linspace(0, np.pi, self.n_fft // 2 + 1)
+        window_energy = np.sum(librosa.filters.get_window("hann", self.n_fft, fftbins=True) ** 2)
+        unit_noise = basis @ ((1 + self.coef ** 2 - 2 * self.coef * np.cos(omega)) * window_energy)
+        # Nombre effectif de bins par bande (forme de la loi Gamma des fluctuations)
+        dof = np.maximum(basis.sum(axis=1) ** 2 / np.maximum((basis ** 2).sum(axis=1), 1e-12), 1.0)
+
+        return {"mel": mel, "r2": float(np.dot(y, y) / max(len(y), 1)),
+                "unit_noise": unit_noise[:, None], "dof": dof[:, None]}
+
+    def _scale(self, r2):
+        return (10 ** (self.target_dB / 20) / (np.sqrt(r2) + 1e-6)) ** 2
+
+    def _spectral(self, name, base, rng):
+        mel, r2 = base["mel"], base["r2"]
+
+        if name == "original":
+            return mfcc_stats_from_mel(mel * self._scale(r2), n_mfcc=self.n_mfcc)
+
+        if name == "random_gain":
+            g2 = rng.uniform(0.7, 1.3) ** 2
+            return mfcc_stats_from_mel(mel * g2 * self._scale(r2 * g2), n_mfcc=self.n_mfcc)
+
+        if name in NOISE_STD:
+            var = NOISE_STD[name] ** 2
+            dof = base["dof"]
+            noise = base["unit_noise"] * var * rng.gamma(dof, 1 / dof, size=(dof.shape[0], mel.shape[1]))
+            return mfcc_stats_from_mel((mel + noise) * self._scale(r2 + var), n_mfcc=self.n_mfcc)
+
+        # 🎭 Masques façon SpecAugment
+        masked = mel * self._scale(r2)
+        if name == "freq_mask":
+            width = rng.integers(1, 16)
+            start = rng.integers(0, max(1, masked.shape[0] - width))
+            masked = masked.copy()
+            masked[start:start + width] = 0.0
+        elif name == "time_mask":
+            width = rng.integers(1, max(2, masked.shape[1] // 10))
+            start = rng.integers(0, max(1, masked.shape[1] - width))
+            masked = masked.copy()
+            masked[:, start:start + width] = 0.0
+        return mfcc_stats_from_mel(masked, n_mfcc=self.n_mfcc)
+
+
+# 💾 Chaîne d'extraction du dataset d'entraînement (librosa, fréquence d'origine) : entrées de
+# cache distinctes de celles de l'inférence (ffmpeg 16 kHz), voir utils/feature_cache.py
+DATASET_DECODER = "librosa_native"
+DATASET_SEEDING = "digest+augmentation"   # graine de chaque augmentation : contenu du fichier + nom
+
+
+def dataset_features(file_path, aug_names, engine):
+    """
+    Features du dataset (02, réparations de 99) pour les augmentations demandées :
+    cache disque d'abord, décodage seulement si une augmentation manque.
+    Retourne ({augmentation: vecteur 26-dim}, None) ou (None, message d'erreur).
+    """
+    from utils.feature_cache import get_feature_cache, feature_key, file_digest
+
+    cache = get_feature_cache()
+    try:
+        digest = file_digest(file_path)
+    except OSError as e:
+        return None, f"❌ Erreur lecture : {file_path} → {e}"
+
+    keys = {
+        aug: feature_key(digest, DATASET_DECODER, aug, engine.n_mfcc, engine.target_dB, engine.coef,
+                         seeding=DATASET_SEEDING)
+        for aug in aug_names
+    }
+    features = {aug: cache.get(key) for aug, key in keys.items()}
+    missing = [aug for aug, value in features.items() if value is None]
+
+    if missing:
+        try:
+            y, sr = librosa.load(file_path, sr=None)
+        except Exception as e:
+            return None, f"❌ Erreur chargement : {file_path} → {e}"
+        try:
+            # Graine dérivée du contenu et du nom de l'augmentation : une valeur en cache ne dépend
+            # pas des autres augmentations manquantes lors de ce calcul
+            computed = engine.features(y, sr, missing, seed=int(digest[:16], 16))
+        except Exception as e:
+            return None, f"❌ Erreur augmentation : {file_path} → {e}"
+        for aug, value in computed.items():
+            cache.put(keys[aug], value)
+            features[aug] = value
+    return features, None
+
+
+def benchmark(y, sr, names=DEFAULT_AUGMENTATIONS, repeats=3):
+    """
+    Compare l'ancien chemin (une augmentation puis un extract_mfcc_from_audio complet chacune)
+    au moteur. Retourne le débit en échantillons augmentés par seconde et l'écart de features
+    pour les augmentations déterministes.
+    """
+    engine = AugmentationEngine()
+    start = perf_counter()
+    for _ in range(repeats):
+        legacy = {name: np.asarray(extract_mfcc_from_audio(LEGACY_AUGMENTATIONS[name](y, sr), sr)) for name in names}
+    legacy_time = perf_counter() - start
+
+    start = perf_counter()
+    for _ in range(repeats):
+        new = engine.features(y, sr, names)
+    engine_time = perf_counter() - start
+
+    n_samples = repeats * len(names)
+    return {
+        "legacy_samples_per_s": n_samples / legacy_time,
+        "engine_samples_per_s": n_samples / engine_time,
+        "speedup": legacy_time / engine_time,
+        "max_abs_diff": {
+            name: float(np.max(np.abs(legacy[name] - new[name])))
+            for name in ("original", "low_pass_filter", "random_gain") if name in names
+        },
+    }
+
+
+if __name__ == "__main__":
+    sr = 22050
+    t = np.arange(30 * sr) / sr
+    y = (0.1 * np.sin(2 * np.pi * 220 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+    y += 0.01 * np.random.default_rng(0).standard_normal(len(y)).astype(np.float32)
+
+    report = benchmark(y, sr)
+    print(f"📊 Ancien chemin : {report['legacy_samples_per_s']:.2f} échantillons augmentés/s")
+    print(f"📊 Moteur        : {report['engine_samples_per_s']:.2f} échantillons augmentés/s")
+    print(f"🚀 Gain          : x{report['speedup']:.2f}")
+    for name, diff in report["max_abs_diff"].items():
+        print(f"  ➤ écart max {name:<16} : {diff:.4f}")
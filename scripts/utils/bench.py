@@ -0,0 +1,148 @@
+# ⏱️ Outils de benchmark hors ligne : audio synthétique, modèles factices, mesures
+import gc
+import resource
+import tracemalloc
+from time import perf_counter
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME = 400          # 25 ms à 16 kHz (fenêtre d'analyse du Whisper factice)
+HIDDEN = 64
+
+
+def synthetic_audio(seconds, sr=SAMPLE_RATE, seed=0):
+    """
+    Récitation synthétique reproductible : fondamentale avec vibrato, harmoniques décroissantes,
+    enveloppe syllabique, pauses et bruit de fond. float32 mono, même format que load_audio_buffer.
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr), dtype=np.float64) / sr
+    f0 = rng.uniform(110, 180) * (1 + 0.02 * np.sin(2 * np.pi * 5.5 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    syllables = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3, 5) * t)) ** 2
+    pauses = (np.sin(2 * np.pi * t / rng.uniform(6, 9)) > -0.8).astype(np.float64)
+    y = 0.1 * voice * syllables * pauses + 0.003 * rng.standard_normal(len(t))
+    return y.astype(np.float32)
+
+
+class TinyWhisper:
+    """
+    Remplaçant de Whisper à poids aléatoires : même interface transcribe(), un coût de calcul
+    proportionnel à la durée (projection des trames) et des segments dont le texte est une
+    transcription bruitée tirée du corpus (voir utils.synthetic.sample_transcriptions).
+    """
+
+    def __init__(self, texts, seed=0, segment_s=5.0):
+        rng = np.random.default_rng(seed)
+        self.weights = rng.standard_normal((FRAME, HIDDEN)).astype(np.float32) / np.sqrt(FRAME)
+        self.texts = texts
+        self.segment_s = segment_s
+        self.calls = 0
+
+    def transcribe(self, audio, language="ar", verbose=False, word_timestamps=True, **_):
+        n_frames = len(audio) // FRAME
+        frames = np.asarray(audio[:n_frames * FRAME], dtype=np.float32).reshape(n_frames, FRAME)
+        np.tanh(frames @ self.weights).sum()
+
+        words = self.texts[self.calls % len(self.texts)].split()
+        self.calls += 1
+        duration = len(audio) / SAMPLE_RATE
+        n_segments = max(1, int(np.ceil(duration / self.segment_s)))
+        step = duration / max(len(words), 1)
+        segments = []
+        for i, chunk in enumerate(np.array_split(np.arange(len(words)), n_segments)):
+            if not len(chunk):
+                continue
+            segments.append({
+                "id": i,
+                "start": float(chunk[0] * step),
+                "end": float((chunk[-1] + 1) * step),
+                "text": " ".join(words[j] for j in chunk),
+                "words": [{"word": words[j], "start": float(j * step), "end": float((j + 1) * step)} for j in chunk],
+            })
+        return {"text": " ".join(words), "segments": segments, "language": language}
+
+
+class TinyCNN:
+    """Remplaçant du CNN imam à poids aléatoires (26 → 64 → n classes), interface predict() Keras."""
+
+    def __init__(self, n_classes=20, dim=26, seed=0):
+        rng = np.random.default_rng(seed)
+        self.w1 = rng.standard_normal((dim, HIDDEN)).astype(np.float32) / np.sqrt(dim)
+        self.w2 = rng.standard_normal((HIDDEN, n_classes)).astype(np.float32) / np.sqrt(HIDDEN)
+        self.classes_ = np.array([f"imam_{i:02d}" for i in range(n_classes)])
+
+    def predict(self, x, batch_size=256, verbose=0):
+        x = np.asarray(x, dtype=np.float32).reshape(len(x), -1)
+        logits = np.maximum(x @ self.w1, 0) @ self.w2
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    def inverse_transform(self, indices):
+        return self.classes_[np.asarray(indices, dtype=np.int64)]
+
+
+def percentiles_ms(times):
+    times = np.asarray(times) * 1000
+    return {
+        "p50_ms": float(np.percentile(times, 50)),
+        "p90_ms": float(np.percentile(times, 90)),
+        "p99_ms": float(np.percentile(times, 99)),
+        "mean_ms": float(times.mean()),
+    }
+
+
+def measure(fn, inputs, repeats=1, warmup=1, units=None):
+    """
+    Latence par appel (percentiles), débit et pic mémoire de fn(x) pour x dans inputs.
+    Le pic mémoire (tracemalloc, allocations Python + numpy) est mesuré sur un passage séparé
+    pour ne pas fausser les latences. units(x) donne la quantité traitée par appel
+    (secondes d'audio...) pour le débit ; par défaut 1 appel = 1 unité.
+    """
+    inputs = list(inputs)
+    for x in inputs[:warmup]:
+        fn(x)
+
+    times = []
+    for _ in range(repeats):
+        for x in inputs:
+            start = perf_counter()
+            fn(x)
+            times.append(perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    for x in inputs:
+        fn(x)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_units = sum(units(x) for x in inputs) * repeats if units else len(times)
+    return {
+        "calls": len(times),
+        **percentiles_ms(times),
+        "throughput_per_s": float(total_units / max(sum(times), 1e-12)),
+        "peak_mb": peak / 2**20,
+    }
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Ko (Linux)
+
+
+def compare(results, baseline, ratio, min_delta_ms=0.5, min_delta_mb=1.0):
+    """
+    Régressions par étape : p50 ou pic mémoire au-delà de ratio × la référence
+    (avec un écart absolu minimal pour ignorer le bruit des étapes très courtes).
+    """
+    regressions = []
+    for stage, r in results.items():
+        ref = baseline.get(stage)
+        if not ref:
+            continue
+        for key, floor in (("p50_ms", min_delta_ms), ("peak_mb", min_delta_mb)):
+            if r[key] > ref[key] * ratio and r[key] - ref[key] > floor:
+                regressions.append({"stage": stage, "metric": key, "value": r[key], "baseline": ref[key]})
+    return regressions
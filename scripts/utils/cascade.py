@@ -0,0 +1,221 @@
+# 🪜 Prédiction imam en cascade : modèle léger (numpy) d'abord, CNN seulement si incertain
+import os
+import pickle
+import numpy as np
+from utils.splits import test_mask, is_test
+from utils import tracing
+
+CENTROIDS_PATH = "models/imam_centroids.npz"
+KNN_MODEL_PATH = "models/imam_knn_model.pkl"
+SCALER_PATH = "models/scaler.pkl"
+PROTOTYPES = 8                # centroïdes k-means par imam
+MAX_ROWS_PER_CLASS = 20000    # exemples d'entraînement tirés par imam
+MIN_CONFIDENCE = 0.6          # probabilité top-1 minimale pour répondre sans le CNN
+MIN_MARGIN = 0.2              # écart top-1 / top-2 minimal
+ENSEMBLE_WEIGHT = 0.3         # poids du modèle léger dans l'ensemble (escalades seulement)
+TEMPERATURES = np.geomspace(0.01, 100, 61)
+CALIBRATION_RATIO = 0.15      # fichiers d'entraînement réservés à la calibration de la température
+CALIBRATION_SEED = 7          # distinct de SPLIT_SEED : découpage indépendant du split train / test
+
+# 🗂️ imam_centroids.npz :
+# - mean, scale         : standardisation (split d'entraînement)
+# - prototypes          : centroïdes standardisés (P × dim), triés par classe
+# - proto_labels        : classe de chaque centroïde ; classes : noms des imams
+# - temperature         : softmax(-d² / T) calibrée (log-vraisemblance sur des fichiers
+#                         d'entraînement tenus à l'écart des k-means)
+
+
+class NearestCentroidModel:
+    """
+    Plus proche centroïde multi-prototypes, en numpy pur : la distance d'un exemple à une classe
+    est la distance à son prototype le plus proche ; probabilités = softmax(-d² / T).
+    """
+
+    def __init__(self, path=CENTROIDS_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            self.mean = data["mean"]
+            self.scale = data["scale"]
+            self.prototypes = data["prototypes"]
+            self.proto_labels = data["proto_labels"]
+            self.classes_ = data["classes"]
+            self.temperature = float(data["temperature"])
+        self._starts = np.flatnonzero(np.r_[True, np.diff(self.proto_labels) != 0])
+        self._norms = np.einsum("ij,ij->i", self.prototypes, self.prototypes)
+
+    def class_distances(self, x):
+        z = (np.asarray(x, dtype=np.float32).reshape(len(x), -1) - self.mean) / self.scale
+        d2 = np.einsum("ij,ij->i", z, z)[:, None] + self._norms[None, :] - 2 * z @ self.prototypes.T
+        return np.minimum.reduceat(np.maximum(d2, 0), self._starts, axis=1)
+
+    def predict_proba(self, x):
+        return _softmax(-self.class_distances(x) / self.temperature)
+
+    def predict(self, x, batch_size=None, verbose=0):
+        """Même interface que Keras : (n, classes) probabilités."""
+        return self.predict_proba(x)
+
+
+class SklearnKnnModel:
+    """KNN sklearn historique (models/imam_knn_model.pkl + scaler.pkl), si sklearn est installé."""
+
+    def __init__(self, knn_path=KNN_MODEL_PATH, scaler_path=SCALER_PATH):
+        with open(knn_path, "rb") as f:
+            self.knn = pickle.load(f)
+        with open(scaler_path, "rb") as f:
+            self.scaler = pickle.load(f)
+        self.classes_ = np.asarray(self.knn.classes_).astype(str)
+
+    def predict_proba(self, x):
+        x = np.asarray(x, dtype=np.float32).reshape(len(x), -1)
+        return self.knn.predict_proba(self.scaler.transform(x))
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    p = np.exp(logits)
+    return p / p.sum(axis=1, keepdims=True)
+
+
+def build_centroid_model(store, path=CENTROIDS_PATH, prototypes=PROTOTYPES, max_rows_per_class=MAX_ROWS_PER_CLASS,
+                         exclude_augmentations=(), seed=0):
+    """
+    Entraîne le modèle léger sur le split d'entraînement du feature store (split par fichier) :
+    standardisation et k-means par imam sur une partie des fichiers, puis calibration de la
+    température sur les autres (des prototypes évalués sur leurs propres exemples donneraient
+    des distances trop faibles, donc une température trop basse et une cascade trop sûre d'elle).
+    """
+    from utils.vector_index import _kmeans
+
+    rng = np.random.default_rng(seed)
+    meta = np.asarray(store.meta())
+    keep = ~test_mask(store)
+    for name in exclude_augmentations:
+        if name in store.dictionaries["augmentation"]:
+            keep &= meta[:, 3] != store.code("augmentation", name)
+    per_file = np.array([is_test(path, CALIBRATION_RATIO, CALIBRATION_SEED)
+                         for path in store.dictionaries["file_path"]], dtype=bool)
+    calibration = per_file[meta[:, 2]] if len(per_file) else np.zeros(len(meta), dtype=bool)
+    imams = store.dictionaries["imam"]
+    class_ids = sorted(set(meta[keep, 0].tolist()), key=lambda i: imams[i])
+
+    def sample_rows(mask):
+        rows_per_class = []
+        for imam_id in class_ids:
+            rows = np.flatnonzero(mask & (meta[:, 0] == imam_id))
+            if len(rows) > max_rows_per_class:
+                rows = np.sort(rng.choice(rows, size=max_rows_per_class, replace=False))
+            rows_per_class.append(rows)
+        y = np.repeat(np.arange(len(class_ids)), [len(r) for r in rows_per_class])
+        return np.concatenate(rows_per_class), y
+
+    rows, y = sample_rows(keep & ~calibration)
+    features = store.features()
+    x = np.asarray(features[rows], dtype=np.float64)
+    mean, scale = x.mean(axis=0), x.std(axis=0) + 1e-8
+    z = ((x - mean) / scale).astype(np.float32)
+
+    protos, labels = [], []
+    for c in range(len(class_ids)):
+        if not (y == c).any():
+            continue  # imam présent uniquement dans les fichiers de calibration
+        centroids = _kmeans(z[y == c], prototypes, seed=seed)
+        protos.append(centroids)
+        labels.extend([c] * len(centroids))
+    present = sorted(set(labels))
+
+    data = {
+        "mean": mean.astype(np.float32), "scale": scale.astype(np.float32),
+        "prototypes": np.concatenate(protos), "proto_labels": np.searchsorted(present, labels).astype(np.int32),
+        "classes": np.array([imams[class_ids[c]] for c in present]), "temperature": np.float32(1.0),
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez(path, **data)
+
+    # 🌡️ Température : maximum de vraisemblance sur les fichiers de calibration
+    calib_rows, calib_y = sample_rows(keep & calibration)
+    known = np.isin(calib_y, present)
+    calib_rows, calib_y = calib_rows[known], np.searchsorted(present, calib_y[known])
+    if len(calib_rows) == 0:
+        print("⚠️ Aucun fichier de calibration : température calibrée sur les exemples des k-means (surconfiance)")
+        calib_rows, calib_y = rows, np.searchsorted(present, y)
+    sample = rng.choice(len(calib_rows), size=min(len(calib_rows), 50000), replace=False)
+    model = NearestCentroidModel(path)
+    d2 = model.class_distances(np.asarray(features[calib_rows[sample]], dtype=np.float64))
+    targets = calib_y[sample]
+    nll = [-np.log(_softmax(-d2 / t)[np.arange(len(sample)), targets] + 1e-12).mean() for t in TEMPERATURES]
+    best = int(np.argmin(nll))
+    if best in (0, len(TEMPERATURES) - 1):
+        print(f"⚠️ Température {TEMPERATURES[best]:.3g} en bord de grille [{TEMPERATURES[0]:.3g}, "
+              f"{TEMPERATURES[-1]:.3g}] : calibration probablement inexacte, élargir TEMPERATURES")
+    data["temperature"] = np.float32(TEMPERATURES[best])
+    np.savez(path, **data)
+    return {"classes": len(present), "prototypes": len(labels), "train_rows": int(len(rows)),
+            "calibration_rows": int(len(sample)), "temperature": float(data["temperature"]),
+            "temperature_at_edge": best in (0, len(TEMPERATURES) - 1)}
+
+
+class CascadeClassifier:
+    """
+    Interface predict() compatible Keras (utilisable par predict_imam, predict_imam_batch...).
+    Le modèle léger répond seul quand il est sûr (confiance ≥ min_confidence et marge ≥ min_margin) ;
+    sinon l'exemple est envoyé au CNN, chargé au premier besoin seulement.
+    ensemble=True : pour les exemples escaladés, moyenne pondérée des deux modèles.
+    Les probabilités sont rendues dans l'ordre des classes de l'encodeur du CNN.
+    """
+
+    def __init__(self, cheap, classes, load_cnn, min_confidence=MIN_CONFIDENCE, min_margin=MIN_MARGIN,
+                 ensemble=False, weight=ENSEMBLE_WEIGHT):
+        self.cheap = cheap
+        self.classes_ = np.asarray(classes)
+        self.load_cnn = load_cnn
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self.ensemble = ensemble
+        self.weight = weight
+        position = {name: k for k, name in enumerate(np.asarray(cheap.classes_).astype(str))}
+        self._columns = np.array([position.get(str(name), -1) for name in self.classes_])
+        self._cnn = None
+        self.samples = 0
+        self.escalated = 0
+
+    def uncertain(self, probs):
+        top2 = np.sort(probs, axis=1)[:, -2:] if probs.shape[1] > 1 else np.c_[np.zeros(len(probs)), probs]
+        return (top2[:, 1] < self.min_confidence) | (top2[:, 1] - top2[:, 0] < self.min_margin)
+
+    def predict(self, x, batch_size=256, verbose=0):
+        x = np.asarray(x, dtype=np.float32)
+        flat = x.reshape(len(x), -1)
+        cheap = self.cheap.predict_proba(flat)
+        probs = np.zeros((len(x), len(self.classes_)), dtype=np.float32)
+        known = self._columns >= 0
+        probs[:, known] = cheap[:, self._columns[known]]
+        probs /= np.maximum(probs.sum(axis=1, keepdims=True), 1e-12)
+
+        unsure = self.uncertain(probs)
+        n_unsure = int(unsure.sum())
+        if n_unsure:
+            if self._cnn is None:
+                self._cnn = self.load_cnn()
+            with tracing.span("cascade_cnn", batch=n_unsure):
+                deep = self._cnn.predict(flat[unsure].reshape(n_unsure, -1, 1), batch_size=batch_size, verbose=0)
+            probs[unsure] = self.weight * probs[unsure] + (1 - self.weight) * deep if self.ensemble else deep
+        self.samples += len(x)
+        self.escalated += n_unsure
+        tracing.count("cascade_samples", len(x))
+        tracing.count("cascade_escalations", n_unsure)
+        return probs
+
+    @property
+    def escalation_rate(self):
+        return self.escalated / max(self.samples, 1)
+
+
+def load_cheap_model(kind="centroid"):
+    return NearestCentroidModel() if kind == "centroid" else SklearnKnnModel()
+
+
+def load_cascade(model_path, label_path, cheap="centroid", **kwargs):
+    """Cascade prête à l'emploi : modèle léger + CNN (chargé paresseusement) + classes de l'encodeur."""
+    from predict_imam import load_imam_model, load_label_encoder
+    classes = load_label_encoder(label_path).classes_
+    return CascadeClassifier(load_cheap_model(cheap), classes, lambda: load_imam_model(model_path), **kwargs)
@@ -1,65 +1,254 @@
 ############### CHECK DOUBLONS ###############
 
+import os
+import sys
 import json
-from collections import Counter
+import shutil
+import argparse
+import numpy as np
+from collections import defaultdict
 
-mfcc_path = "mfcc_data/mfcc_data.jsonl"
-counter = Counter()
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.feature_store import FeatureStore
+from utils.splits import test_mask
 
-with open(mfcc_path, "r", encoding="utf-8") as f:
-    for line in f:
-        try:
-            data = json.loads(line.strip())
-            counter[data["imam"]] += 1
-        except json.JSONDecodeError:
-            print("⚠️ Erreur de lecture JSON – ligne ignorée")
+STORE_PATH = "mfcc_data/mfcc_store"
+OUTPUT_PATH = "mfcc_data/mfcc_store_cleaned"
+REPORT_PATH = "output/doublons_report.json"
+CHUNK = 262144          # lignes lues par bloc depuis le memmap
+NEAR_DIST = 0.25        # distance max (features standardisées) pour un quasi-doublon
+LSH_TABLES = 8          # tables LSH (un passage sur le store par table)
+LSH_PROJECTIONS = 8     # projections concaténées par table
+LSH_WIDTH = 2.0         # largeur des cases de projection
+MAX_PAIRWISE = 64       # au-delà, un bucket est vérifié contre son premier membre seulement
+FNV_PRIME = np.uint64(1099511628211)
+FNV_OFFSET = np.uint64(14695981039346656037)
 
-print("📊 Nombre de fichiers par imam :")
-for imam, count in sorted(counter.items(), key=lambda x: x[0]):
-    print(f"  ➤ {imam:<25} : {count}")
+# 🧠 Mémoire bornée : aucune ligne n'est gardée en Python. Par ligne, on ne conserve que
+# quelques entiers (hash 64 bits du passage en cours, parent union-find, représentant exact).
 
-print(f"\n🎯 Total : {sum(counter.values())} fichiers")
 
+def hash_rows(words):
+    """Hash FNV-1a 64 bits vectorisé de chaque ligne d'une matrice d'entiers."""
+    h = np.full(len(words), FNV_OFFSET, dtype=np.uint64)
+    for column in words.T.astype(np.uint64):
+        h ^= column
+        h *= FNV_PRIME
+    return h
 
-import json
-import hashlib
-from collections import defaultdict
 
-input_path = "mfcc_data/mfcc_data.jsonl"
-output_path = "mfcc_data/mfcc_data_cleaned.jsonl"
-
-seen = set()
-unique_entries = []
-hash_counter = defaultdict(int)
-
-with open(input_path, "r", encoding="utf-8") as f:
-    for line in f:
-        try:
-            data = json.loads(line.strip())
-            key = (
-                data["imam"],
-                data["sourate"],
-                hashlib.sha1(json.dumps(data["mfcc"]).encode()).hexdigest()  # hash MFCC
-            )
-            if key not in seen:
-                seen.add(key)
-                unique_entries.append(data)
+def group_equal(hashes):
+    """Groupes (tableaux d'indices triés) de lignes partageant le même hash."""
+    order = np.argsort(hashes, kind="stable")
+    sorted_h = hashes[order]
+    bounds = np.flatnonzero(sorted_h[1:] != sorted_h[:-1]) + 1
+    for group in np.split(order, bounds):
+        if len(group) > 1:
+            yield np.sort(group)
+
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = np.arange(n, dtype=np.int64)
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def roots(self):
+        parent = self.parent
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                return parent
+            parent[:] = grand
+
+
+def scaler_stats(features):
+    n, dim = features.shape
+    total, total_sq = np.zeros(dim), np.zeros(dim)
+    for start in range(0, n, CHUNK):
+        x = np.asarray(features[start:start + CHUNK], dtype=np.float64)
+        total += x.sum(axis=0)
+        total_sq += (x ** 2).sum(axis=0)
+    mean = total / max(n, 1)
+    return mean, np.sqrt(np.maximum(total_sq / max(n, 1) - mean ** 2, 0)) + 1e-8
+
+
+def find_exact(features):
+    """Représentant (première occurrence) de chaque ligne parmi les lignes strictement identiques."""
+    n = len(features)
+    hashes = np.empty(n, dtype=np.uint64)
+    for start in range(0, n, CHUNK):
+        hashes[start:start + CHUNK] = hash_rows(np.asarray(features[start:start + CHUNK]).view(np.uint32))
+    rep = np.arange(n, dtype=np.int64)
+    for group in group_equal(hashes):
+        rows = np.asarray(features[group])
+        same = np.all(rows == rows[0], axis=1)  # protège des collisions de hash
+        rep[group[same]] = group[0]
+    return rep
+
+
+def find_near(features, mean, std, uf, seed=0):
+    """
+    Quasi-doublons par LSH euclidien (projections aléatoires quantifiées) : deux vecteurs
+    proches partagent un bucket dans au moins une table avec forte probabilité.
+    Chaque paire candidate est vérifiée sur la distance réelle avant l'union.
+    """
+    rng = np.random.default_rng(seed)
+    n, dim = features.shape
+    links = 0
+    for _ in range(LSH_TABLES):
+        proj = rng.standard_normal((dim, LSH_PROJECTIONS)).astype(np.float32)
+        offset = rng.uniform(0, LSH_WIDTH, LSH_PROJECTIONS).astype(np.float32)
+        hashes = np.empty(n, dtype=np.uint64)
+        for start in range(0, n, CHUNK):
+            x = ((np.asarray(features[start:start + CHUNK], dtype=np.float64) - mean) / std).astype(np.float32)
+            cells = np.floor((x @ proj + offset) / LSH_WIDTH).astype(np.int64)
+            hashes[start:start + CHUNK] = hash_rows(cells.view(np.uint64))
+
+        for group in group_equal(hashes):
+            x = ((np.asarray(features[group], dtype=np.float64) - mean) / std).astype(np.float32)
+            if len(group) <= MAX_PAIRWISE:
+                sq = np.einsum("ij,ij->i", x, x)
+                d2 = sq[:, None] + sq[None, :] - 2 * x @ x.T
+                pairs = np.argwhere(np.triu(d2 <= NEAR_DIST ** 2, k=1))
             else:
-                hash_counter[(data["imam"], data["sourate"])] += 1
-        except json.JSONDecodeError:
-            print("⚠️ Ligne JSON invalide ignorée.")
-
-# Sauvegarde du nouveau fichier propre
-with open(output_path, "w", encoding="utf-8") as f:
-    for entry in unique_entries:
-        f.write(json.dumps(entry) + "\n")
-
-print(f"✅ Nettoyage terminé : {len(unique_entries)} lignes uniques sauvegardées.")
-print(f"🧼 Fichier nettoyé : {output_path}")
-print(f"🗑️ Doublons supprimés : {len(seen)} → {len(seen) + sum(hash_counter.values()) - len(unique_entries)} doublons")
-
-# Optionnel : afficher un résumé par imam/sourate
-if hash_counter:
-    print("\n📌 Doublons détectés :")
-    for (imam, sourate), count in sorted(hash_counter.items()):
-        print(f"  ➤ {imam} - Sourate {sourate} : {count} doublon(s)")
+                d2 = np.sum((x - x[0]) ** 2, axis=1)
+                pairs = np.stack([np.zeros(int((d2[1:] <= NEAR_DIST ** 2).sum()), dtype=np.int64),
+                                  np.flatnonzero(d2[1:] <= NEAR_DIST ** 2) + 1], axis=1)
+            for a, b in pairs:
+                uf.union(int(group[a]), int(group[b]))
+                links += 1
+    return links
+
+
+def analyse(store, seed=0):
+    features, meta = store.features(), np.asarray(store.meta())
+    n = len(meta)
+    exact_rep = find_exact(features)
+    mean, std = scaler_stats(features)
+    uf = UnionFind(n)
+    for i in np.flatnonzero(exact_rep != np.arange(n)):
+        uf.union(int(exact_rep[i]), int(i))
+    find_near(features, mean, std, uf, seed=seed)
+    roots = uf.roots()
+
+    same_label = lambda rep: (meta[rep, 0] == meta[:, 0]) & (meta[rep, 1] == meta[:, 1])
+    exact_dup = (exact_rep != np.arange(n)) & same_label(exact_rep)
+    near_dup = (roots != np.arange(n)) & ~exact_dup
+    droppable_near = near_dup & same_label(roots)
+    cluster_size = np.bincount(roots, minlength=n)
+
+    # 🏷️ Clusters mélangeant plusieurs imams : conflit d'étiquette
+    imam_min = np.full(n, np.iinfo(np.int32).max)
+    imam_max = np.full(n, -1)
+    np.minimum.at(imam_min, roots, meta[:, 0])
+    np.maximum.at(imam_max, roots, meta[:, 0])
+    conflict = (imam_min[roots] != imam_max[roots])
+
+    # 🚰 Fuite train → test : ligne de test dont le cluster contient une ligne d'entraînement
+    def leakage(test):
+        has_train = np.zeros(n, dtype=bool)
+        has_train[roots[~test]] = True
+        return test & has_train[roots] & (cluster_size[roots] > 1)
+
+    group_test = test_mask(store)
+    random_test = np.random.default_rng(42).random(n) < 0.2  # ancien split aléatoire par ligne
+    leak_group, leak_random = leakage(group_test), leakage(random_test)
+
+    return {
+        "exact_rep": exact_rep, "roots": roots, "exact_dup": exact_dup, "near_dup": near_dup,
+        "droppable_near": droppable_near, "conflict": conflict, "leak_group": leak_group, "leak_random": leak_random,
+        "group_test": group_test, "random_test": random_test,
+    }
+
+
+def build_report(store, result):
+    meta = np.asarray(store.meta())
+    imams = store.dictionaries["imam"]
+    per_key = defaultdict(lambda: defaultdict(int))
+    for column in ("exact_dup", "near_dup", "conflict", "leak_group"):
+        for imam_id, sourate in meta[result[column]][:, :2].tolist():
+            per_key[(imams[imam_id], sourate)][column] += 1
+    return {
+        "rows": int(len(meta)),
+        "exact_duplicates": int(result["exact_dup"].sum()),
+        "near_duplicates": int(result["near_dup"].sum()),
+        "label_conflicts": int(result["conflict"].sum()),
+        "test_leakage_file_split": float(result["leak_group"].sum() / max(result["group_test"].sum(), 1)),
+        "test_leakage_random_split": float(result["leak_random"].sum() / max(result["random_test"].sum(), 1)),
+        "per_imam_sourate": [
+            {"imam": imam, "sourate": sourate, **counts}
+            for (imam, sourate), counts in sorted(per_key.items())
+        ],
+    }
+
+
+def write_cleaned(store, keep, output_path):
+    if os.path.exists(output_path):
+        shutil.rmtree(output_path)  # produit dérivé : recréé à chaque exécution
+    cleaned = FeatureStore(output_path, dim=store.dim)
+    features, meta = store.features(), store.meta()
+    for start in range(0, len(keep), CHUNK):
+        rows = np.flatnonzero(keep[start:start + CHUNK]) + start
+        if len(rows):
+            feats = np.asarray(features[rows])
+            cleaned.append([
+                {**store.decode_meta(m), "mfcc": f} for m, f in zip(np.asarray(meta[rows]).tolist(), feats)
+            ])
+    return len(cleaned)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Doublons exacts et quasi-doublons du feature store")
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH, help="Store nettoyé (vide = pas d'écriture)")
+    parser.add_argument("--drop-near", action="store_true", help="Retirer aussi les quasi-doublons (même imam/sourate)")
+    args = parser.parse_args()
+
+    store = FeatureStore(args.store, create=False)
+    meta = store.meta()
+    imams = store.dictionaries["imam"]
+
+    counts = np.bincount(meta[:, 0], minlength=len(imams))
+    print("📊 Nombre de fichiers par imam :")
+    for idx in np.argsort(imams):
+        print(f"  ➤ {imams[idx]:<25} : {counts[idx]}")
+    print(f"\n🎯 Total : {len(meta)} fichiers")
+
+    result = analyse(store)
+    report = build_report(store, result)
+
+    print(f"\n🗑️ Doublons exacts       : {report['exact_duplicates']}")
+    print(f"🔁 Quasi-doublons        : {report['near_duplicates']}")
+    print(f"🏷️ Conflits d'étiquette  : {report['label_conflicts']} lignes")
+    print(f"🚰 Fuite test (split par fichier)   : {report['test_leakage_file_split'] * 100:.2f}%")
+    print(f"🚰 Fuite test (split aléatoire)     : {report['test_leakage_random_split'] * 100:.2f}%")
+    if report["per_imam_sourate"]:
+        print("\n📌 Détail par imam / sourate :")
+        for row in report["per_imam_sourate"]:
+            print(f"  ➤ {row['imam']} - Sourate {row['sourate']} : {row.get('exact_dup', 0)} exact(s), "
+                  f"{row.get('near_dup', 0)} proche(s), {row.get('leak_group', 0)} fuite(s)")
+
+    os.makedirs(os.path.dirname(REPORT_PATH), exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Rapport : {REPORT_PATH}")
+
+    if args.output:
+        drop = result["exact_dup"] | (result["droppable_near"] if args.drop_near else False)
+        n_kept = write_cleaned(store, ~drop, args.output)
+        print(f"✅ Nettoyage terminé : {n_kept} lignes sauvegardées dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# 💾 Cache disque des features, adressé par contenu
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+from utils import tracing
+
+CACHE_DIR = os.environ.get("SAWT_FEATURE_CACHE", "cache/features")
+MAX_BYTES = int(os.environ.get("SAWT_FEATURE_CACHE_BYTES", 2 * 1024 ** 3))
+EVICT_RATIO = 0.9          # après éviction, le cache redescend à 90 % de MAX_BYTES
+FEATURE_VERSION = 1        # à incrémenter si la chaîne de calcul change sans changer ses paramètres
+HASH_CHUNK = 1 << 20
+
+# 🗂️ Organisation : <CACHE_DIR>/<2 premiers caractères>/<clé sha256>.npy
+# La clé combine l'empreinte du contenu audio et tous les paramètres qui influent sur
+# les features (n_mfcc, pre-emphasis, RMS cible, décodage, augmentation...).
+# L'ancienneté d'une entrée est sa date de modification, rafraîchie à chaque lecture (LRU).
+# Le décodage fait partie de la clé : le cache est propre à chaque chaîne d'extraction.
+# - "librosa_native" : dataset d'entraînement (02, réparations de 99), fréquence d'origine du fichier
+# - "ffmpeg_16000"   : inférence (01, predict_imam, predict_imam_batch / 08, cascade comprise),
+#                      tampon float32 16 kHz ; les fenêtres de predict_imam_timeline ne sont pas cachées
+# Les deux donnent des MFCC différents pour un même fichier : ils ne partagent jamais d'entrée.
+
+_digests = {}
+
+
+def file_digest(path):
+    """sha256 du contenu d'un fichier, mémorisé par (chemin, taille, date de modification)."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    digest = _digests.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = _digests[memo_key] = h.hexdigest()
+    return digest
+
+
+def buffer_digest(y, sr):
+    """sha256 d'un signal déjà décodé (float32) et de sa fréquence d'échantillonnage."""
+    h = hashlib.sha256(np.ascontiguousarray(y, dtype=np.float32).tobytes())
+    h.update(str(sr).encode())
+    return h.hexdigest()
+
+
+class FeatureCache:
+    """
+    Cache de vecteurs numpy sur disque : écritures atomiques (fichier temporaire + rename),
+    éviction des entrées les moins récemment utilisées au-delà de max_bytes.
+    Partageable entre processus : chaque écriture est indépendante.
+    Les sous-classes changent le format d'une entrée via SUFFIX, _read et _write.
+    """
+    SUFFIX = ".npy"
+    METRIC = "feature_cache"
+
+    def __init__(self, path=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def key(content_digest, **params):
+        """Clé stable : empreinte du contenu + paramètres (ordre indifférent)."""
+        payload = json.dumps({"content": content_digest, "version": FEATURE_VERSION, **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            value = self._read(path)
+        except (FileNotFoundError, ValueError, OSError, EOFError):
+            self.misses += 1
+            tracing.count(f"{self.METRIC}_misses")
+            return None
+        try:
+            os.utime(path)  # 🕒 rafraîchit l'entrée pour le LRU
+        except OSError:
+            pass
+        self.hits += 1
+        tracing.count(f"{self.METRIC}_hits")
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self._write(f, value)
+            size = os.path.getsize(tmp_path)
+            try:
+                replaced = os.path.getsize(path)  # entrée existante écrasée : sa taille ne compte plus
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._size += size - replaced
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = np.asarray(compute())
+            self.put(key, value)
+        return value
+
+    def evict(self, target_bytes=None):
+        """Supprime les entrées les plus anciennes jusqu'à target_bytes. Retourne le nombre supprimé."""
+        target = int(self.max_bytes * EVICT_RATIO) if target_bytes is None else target_bytes
+        entries = sorted(self._entries(), key=lambda e: e[1])  # taille réelle, tous processus confondus
+        total = sum(size for _, _, size in entries)
+        removed = 0
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._size = total
+        return removed
+
+    def stats(self):
+        return {"entries": sum(1 for _ in self._entries()), "bytes": self._size,
+                "hits": self.hits, "misses": self.misses}
+
+    # 🔧 Interne
+    def _read(self, path):
+        return np.load(path, allow_pickle=False)
+
+    def _write(self, f, value):
+        np.save(f, np.asarray(value), allow_pickle=False)
+
+    def _path(self, key):
+        return os.path.join(self.path, key[:2], f"{key}{self.SUFFIX}")
+
+    def _entries(self):
+        """(chemin, date de dernière utilisation, taille) de chaque entrée."""
+        for shard in os.scandir(self.path):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(self.SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, stat.st_mtime_ns, stat.st_size
+
+
+def feature_key(content_digest, decoder, augmentation="original", n_mfcc=13, target_dB=-20, coef=0.97, **extra):
+    """
+    Clé d'un vecteur MFCC 26-dim : contenu + décodage + augmentation + paramètres d'extraction.
+    extra : paramètres supplémentaires du producteur (ex. schéma de graine des augmentations).
+    """
+    from utils.mfcc import N_FFT, HOP_LENGTH, N_MELS, TOP_DB
+    return FeatureCache.key(
+        content_digest, kind="mfcc_stats", decoder=decoder, augmentation=augmentation,
+        n_mfcc=n_mfcc, target_dB=target_dB, coef=coef,
+        n_fft=N_FFT, hop_length=HOP_LENGTH, n_mels=N_MELS, top_db=TOP_DB, **extra,
+    )
+
+
+_caches = {}
+
+
+def get_feature_cache(path=CACHE_DIR, max_bytes=MAX_BYTES):
+    """Une instance par processus et par dossier (workers du pool compris)."""
+    cache = _caches.get(path)
+    if cache is None:
+        cache = _caches[path] = FeatureCache(path, max_bytes)
+    return cache
@@ -0,0 +1,287 @@
+# 🗄️ Stockage colonnaire des MFCC (float32 memmap + métadonnées encodées)
+import os
+import json
+import numpy as np
+
+STORE_PATH = "mfcc_data/mfcc_store"
+STORE_VERSION = 1
+DEFAULT_DIM = 26
+META_COLUMNS = ("imam", "sourate", "file_path", "augmentation")
+STRING_COLUMNS = ("imam", "file_path", "augmentation")  # encodées par dictionnaire
+
+# 🗂️ Contenu du dossier :
+# - store.json            : version + dimension des vecteurs
+# - features.f32          : matrice float32 (N × dim), contiguë, lue en memmap
+# - meta.i32              : matrice int32 (N × 4) : imam_id, sourate, file_id, augmentation_id
+# - dict_<colonne>.txt    : une chaîne par ligne, l'id est le numéro de ligne (ajout seul)
+# - sort.json           : présent seulement pendant l'échange des fichiers triés (sort_by_key)
+# Les dictionnaires sont écrits avant les lignes : un id est toujours résolvable.
+# Une ligne partiellement écrite (crash) est ignorée à l'ouverture.
+# Un tri interrompu après l'écriture de sort.json est terminé à l'ouverture suivante ;
+# interrompu avant, les fichiers d'origine sont intacts (les .tmp sont réécrits au tri suivant).
+
+
+class FeatureStore:
+    """
+    Remplace les fichiers mfcc_data/*.jsonl : les features sont une matrice float32
+    memory-mappée, les métadonnées un petit tableau d'entiers.
+    """
+
+    def __init__(self, path=STORE_PATH, dim=None, create=True):
+        self.path = path
+        config_path = os.path.join(path, "store.json")
+
+        if os.path.exists(config_path):
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            if config.get("version") != STORE_VERSION:
+                raise ValueError(f"Version de store incompatible : {config.get('version')}")
+            if dim is not None and dim != config["dim"]:
+                raise ValueError(f"Dimension {dim} ≠ dimension du store ({config['dim']})")
+            self.dim = config["dim"]
+        elif create:
+            os.makedirs(path, exist_ok=True)
+            self.dim = dim or DEFAULT_DIM
+            with open(config_path, "w", encoding="utf-8") as f:
+                json.dump({"version": STORE_VERSION, "dim": self.dim}, f)
+        else:
+            raise FileNotFoundError(f"Store introuvable : {path}")
+
+        self._features_path = os.path.join(path, "features.f32")
+        self._meta_path = os.path.join(path, "meta.i32")
+        self._sort_marker = os.path.join(path, "sort.json")
+        self._recover_sort()
+        self.dictionaries = {col: self._load_dictionary(col) for col in STRING_COLUMNS}
+        self._codes = {col: {s: i for i, s in enumerate(values)} for col, values in self.dictionaries.items()}
+        self._unsaved = {}
+
+    # 📏 Taille
+    def __len__(self):
+        feat_rows = _file_size(self._features_path) // (4 * self.dim)
+        meta_rows = _file_size(self._meta_path) // (4 * len(META_COLUMNS))
+        return min(feat_rows, meta_rows)
+
+    # 📥 Lecture (memmap, aucune copie)
+    def features(self):
+        n = len(self)
+        if n == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self._features_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+
+    def meta(self):
+        n = len(self)
+        if n == 0:
+            return np.zeros((0, len(META_COLUMNS)), dtype=np.int32)
+        return np.memmap(self._meta_path, dtype=np.int32, mode="r", shape=(n, len(META_COLUMNS)))
+
+    def column(self, name):
+        """Colonne de métadonnées décodée (tableau numpy de chaînes ou d'entiers)."""
+        values = self.meta()[:, META_COLUMNS.index(name)]
+        if name in STRING_COLUMNS:
+            return np.array(self.dictionaries[name], dtype=object)[values]
+        return np.asarray(values)
+
+    def rows(self, chunk_size=65536):
+        """Itère sur les entrées au format historique (dict), par blocs memmap."""
+        features, meta = self.features(), self.meta()
+        for start in range(0, len(meta), chunk_size):
+            feats = np.asarray(features[start:start + chunk_size])
+            for row_meta, row_feat in zip(meta[start:start + chunk_size].tolist(), feats):
+                yield {**self.decode_meta(row_meta), "mfcc": row_feat}
+
+    def decode_meta(self, row_meta):
+        imam_id, sourate, file_id, aug_id = row_meta
+        return {
+            "imam": self.dictionaries["imam"][imam_id],
+            "sourate": sourate,
+            "file_path": self.dictionaries["file_path"][file_id],
+            "augmentation": self.dictionaries["augmentation"][aug_id],
+        }
+
+    def code(self, column, value):
+        """Id d'une chaîne dans le dictionnaire de la colonne (-1 si absente)."""
+        return self._codes[column].get(value, -1)
+
+    # 🔑 Index des clés (dédoublonnage / reprise)
+    def encode_key(self, imam, sourate, file_path, augmentation, add=False):
+        """Clé entière (imam_id, sourate, file_id, aug_id) ; None si une chaîne est inconnue."""
+        codes = []
+        for col, value in (("imam", imam), ("file_path", file_path), ("augmentation", augmentation)):
+            code = self._codes[col].get(value)
+            if code is None:
+                if not add:
+                    return None
+                code = self._add_string(col, value)
+            codes.append(code)
+        return (codes[0], int(sourate), codes[1], codes[2])
+
+    def key_set(self):
+        return set(map(tuple, self.meta().tolist()))
+
+    def has_key(self, keys, imam, sourate, file_path, augmentation):
+        key = self.encode_key(imam, sourate, file_path, augmentation)
+        return key is not None and key in keys
+
+    # 📤 Ajout
+    def append(self, entries):
+        """
+        Ajoute des entrées {"imam", "sourate", "file_path", "augmentation", "mfcc"}.
+        Retourne les clés entières ajoutées.
+        """
+        if not entries:
+            return []
+        keys = [
+            self.encode_key(e["imam"], e["sourate"], e["file_path"], e.get("augmentation", "original"), add=True)
+            for e in entries
+        ]
+        feats = np.asarray([e["mfcc"] for e in entries], dtype=np.float32)
+        if feats.ndim != 2 or feats.shape[1] != self.dim:
+            raise ValueError(f"MFCC de dimension {feats.shape[-1]} ≠ {self.dim}")
+
+        self._flush_dictionaries()
+        self._truncate_partial_rows()
+        with open(self._meta_path, "ab") as f:
+            f.write(np.asarray(keys, dtype=np.int32).tobytes())
+        with open(self._features_path, "ab") as f:
+            f.write(feats.tobytes())
+        return keys
+
+    # 🔃 Tri sans charger les features en RAM
+    def sort_by_key(self, chunk_size=65536):
+        """
+        Trie le store par (imam, sourate, augmentation) : tri sur les seules métadonnées,
+        puis réécriture des features par blocs depuis le memmap. Stable.
+        Retourne False si le store était déjà trié.
+        """
+        meta = np.asarray(self.meta())
+        if len(meta) == 0:
+            return False
+        imam_rank = _string_ranks(self.dictionaries["imam"])
+        aug_rank = _string_ranks(self.dictionaries["augmentation"])
+        order = np.lexsort((aug_rank[meta[:, 3]], meta[:, 1], imam_rank[meta[:, 0]]))
+        if np.all(order[1:] > order[:-1]):
+            return False
+
+        features = self.features()
+        tmp_features, tmp_meta = self._features_path + ".tmp", self._meta_path + ".tmp"
+        with open(tmp_features, "wb") as f:
+            for start in range(0, len(order), chunk_size):
+                chunk = order[start:start + chunk_size]
+                sorted_pos = np.argsort(chunk)
+                rows = np.empty((len(chunk), self.dim), dtype=np.float32)
+                rows[sorted_pos] = features[chunk[sorted_pos]]  # lecture dans l'ordre du fichier
+                f.write(rows.tobytes())
+            _sync(f)
+        with open(tmp_meta, "wb") as f:
+            f.write(meta[order].astype(np.int32).tobytes())
+            _sync(f)
+        del features
+
+        # 🔁 Les deux fichiers sont complets : sort.json marque le point de non-retour,
+        # un crash pendant l'échange est repris par _recover_sort (features et meta jamais dépareillés)
+        marker_tmp = self._sort_marker + ".tmp"
+        with open(marker_tmp, "w", encoding="utf-8") as f:
+            json.dump({"rows": int(len(order))}, f)
+            _sync(f)
+        os.replace(marker_tmp, self._sort_marker)
+        self._recover_sort()
+        return True
+
+    # 🔧 Interne
+    def _recover_sort(self):
+        """Termine un échange de fichiers triés commencé (sort.json présent). Idempotent."""
+        if not os.path.exists(self._sort_marker):
+            return
+        for target in (self._features_path, self._meta_path):
+            try:
+                os.replace(target + ".tmp", target)
+            except FileNotFoundError:
+                pass  # déjà échangé avant l'interruption
+        try:
+            os.remove(self._sort_marker)
+        except FileNotFoundError:
+            pass
+
+    def _load_dictionary(self, col):
+        path = os.path.join(self.path, f"dict_{col}.txt")
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().split("\n")[:-1]
+
+    def _add_string(self, col, value):
+        if "\n" in value:
+            raise ValueError(f"Retour à la ligne interdit dans {col} : {value!r}")
+        code = len(self.dictionaries[col])
+        self.dictionaries[col].append(value)
+        self._codes[col][value] = code
+        self._unsaved.setdefault(col, []).append(value)
+        return code
+
+    def _flush_dictionaries(self):
+        for col, values in self._unsaved.items():
+            with open(os.path.join(self.path, f"dict_{col}.txt"), "a", encoding="utf-8") as f:
+                f.write("".join(v + "\n" for v in values))
+        self._unsaved = {}
+
+    def _truncate_partial_rows(self):
+        n = len(self)
+        for path, row_bytes in ((self._features_path, 4 * self.dim), (self._meta_path, 4 * len(META_COLUMNS))):
+            if _file_size(path) != n * row_bytes:
+                with open(path, "r+b") as f:
+                    f.truncate(n * row_bytes)
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _string_ranks(values):
+    """Rang alphabétique de chaque id de dictionnaire."""
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[np.argsort(np.array(values, dtype=object), kind="stable")] = np.arange(len(values))
+    return ranks
+
+
+def jsonl_to_store(jsonl_path, store_path=STORE_PATH, dim=DEFAULT_DIM, batch_size=10000, skip_existing=True):
+    """
+    Convertit un ancien fichier mfcc_data/*.jsonl en feature store.
+    Les entrées d'une autre dimension (ex. anciens MFCC à 13 valeurs) sont ignorées et comptées.
+    """
+    store = FeatureStore(store_path, dim=dim)
+    keys = store.key_set() if skip_existing else set()
+    stats = {"added": 0, "skipped_dim": 0, "skipped_existing": 0, "invalid": 0}
+    batch = []
+
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                stats["invalid"] += 1
+                continue
+            if len(data["mfcc"]) != dim:
+                stats["skipped_dim"] += 1
+                continue
+            data.setdefault("augmentation", "original")
+            data.setdefault("sourate", -1)
+            if skip_existing:
+                key = store.encode_key(data["imam"], data["sourate"], data["file_path"], data["augmentation"], add=True)
+                if key in keys:
+                    stats["skipped_existing"] += 1
+                    continue
+                keys.add(key)
+            batch.append(data)
+            if len(batch) >= batch_size:
+                store.append(batch)
+                stats["added"] += len(batch)
+                batch = []
+    if batch:
+        store.append(batch)
+        stats["added"] += len(batch)
+    return stats
@@ -0,0 +1,200 @@
+# 🕰️ Transcription des longs enregistrements : silences retirés, découpage aux pauses,
+# morceaux transcrits en parallèle puis recousus (timestamps recalés, recouvrements dédoublonnés)
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils.audio import SAMPLE_RATE
+from utils.normalize_arabic import normalize_arabic
+from utils import tracing
+
+FRAME_S = 0.03
+SILENCE_DB = 12.0        # trame silencieuse : moins de SILENCE_DB au-dessus du plancher de bruit
+MIN_SILENCE_S = 0.6      # pause minimale pour couper / retirer
+PAD_S = 0.3              # audio gardé de part et d'autre de chaque zone de parole
+CHUNK_S = 90.0           # durée visée d'un morceau (plusieurs fenêtres Whisper de 30 s)
+MAX_CHUNK_S = 120.0      # au-delà, coupure forcée dans la parole, avec recouvrement
+OVERLAP_S = 2.0
+MAX_GAP_S = 2.0          # une pause plus longue n'est jamais incluse dans un morceau
+# Mémoire résidente approximative d'un processus Whisper (Go), pour dimensionner le pool
+MODEL_MEMORY_GB = {"tiny": 0.5, "base": 0.7, "small": 1.3, "medium": 3.0, "large": 5.5}
+
+_worker_model = None
+
+
+def frame_energies(y, sr=SAMPLE_RATE, frame_s=FRAME_S):
+    frame = int(sr * frame_s)
+    n = len(y) // frame
+    frames = y[:n * frame].reshape(n, frame).astype(np.float64)
+    return 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+
+def speech_regions(y, sr=SAMPLE_RATE, frame_s=FRAME_S, silence_db=SILENCE_DB, min_silence_s=MIN_SILENCE_S, pad_s=PAD_S):
+    """
+    Zones de parole [(début, fin), ...] en échantillons : les pauses de moins de
+    min_silence_s sont ignorées, chaque zone est élargie de pad_s.
+    Le plancher de bruit est le 10e percentile de l'énergie des trames.
+    """
+    energies = frame_energies(y, sr, frame_s)
+    if not len(energies):
+        return []
+    floor = np.percentile(energies, 10)
+    speech = energies > floor + silence_db
+    frame, pad = int(sr * frame_s), int(sr * pad_s)
+    min_gap = int(round(min_silence_s / frame_s))
+
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], speech.astype(np.int8), [0]])))
+    regions = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if regions and start - regions[-1][1] < min_gap:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+    return [(max(0, s * frame - pad), min(len(y), e * frame + pad)) for s, e in regions]
+
+
+def plan_chunks(y, sr=SAMPLE_RATE, chunk_s=CHUNK_S, max_chunk_s=MAX_CHUNK_S, overlap_s=OVERLAP_S,
+                max_gap_s=MAX_GAP_S, **vad_kwargs):
+    """
+    Morceaux [(début, fin), ...] en échantillons : zones de parole regroupées jusqu'à chunk_s
+    (coupure dans une pause), zones plus longues que max_chunk_s découpées avec overlap_s
+    de recouvrement. Les pauses de plus de max_gap_s ne sont jamais transcrites.
+    """
+    chunk, max_chunk, overlap = int(chunk_s * sr), int(max_chunk_s * sr), int(overlap_s * sr)
+    max_gap = int(max_gap_s * sr)
+    pieces = []
+    for start, end in speech_regions(y, sr, **vad_kwargs):
+        while end - start > max_chunk:
+            pieces.append((start, start + chunk))
+            start += chunk - overlap
+        pieces.append((start, end))
+
+    chunks = []
+    for start, end in pieces:
+        # 🧩 Regroupe les zones proches tant que le morceau reste sous chunk_s
+        if chunks and end - chunks[-1][0] <= chunk and 0 <= start - chunks[-1][1] <= max_gap:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
+
+
+def pool_size(model_size, workers=None):
+    """Processus : cœurs disponibles, bornés par la mémoire libre / mémoire d'un modèle."""
+    if workers:
+        return workers
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open("/proc/meminfo") as f:
+            meminfo = {line.split(":")[0]: int(line.split()[1]) for line in f}
+        available_gb = meminfo["MemAvailable"] / 1024 ** 2
+    except (OSError, KeyError, ValueError):
+        available_gb = float("inf")
+    per_model = MODEL_MEMORY_GB.get(model_size.split(".")[0].split("-")[0], MODEL_MEMORY_GB["medium"])
+    return max(1, min(cpus, int(available_gb // per_model)))
+
+
+def _init_worker(model_size, threads):
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)  # pas de sur-souscription : threads × processus ≈ cœurs
+    except ImportError:
+        pass
+    from transcribe_audio import load_whisper_model
+    _worker_model = load_whisper_model(model_size)
+
+
+def _transcribe_chunk(task):
+    from transcribe_audio import transcribe_audio
+    k, offset, audio, options = task
+    return k, shift_segments(transcribe_audio(audio, model=_worker_model, **options), offset)
+
+
+def shift_segments(segments, offset):
+    out = []
+    for s in segments:
+        s = {**s, "start": s["start"] + offset, "end": s["end"] + offset}
+        if s.get("words"):
+            s["words"] = [{**w, "start": w["start"] + offset, "end": w["end"] + offset} for w in s["words"]]
+        out.append(s)
+    return out
+
+
+def stitch(chunk_results):
+    """
+    Recoud [(début_s, fin_s, segments recalés), ...] triés : dans un recouvrement, chaque mot
+    (ou segment sans mots) est gardé par le morceau dont il est le plus proche du centre,
+    c.-à-d. de part et d'autre du milieu de la zone commune.
+    """
+    stitched = []
+    for k, (start, end, segments) in enumerate(chunk_results):
+        lo = (start + chunk_results[k - 1][1]) / 2 if k > 0 and chunk_results[k - 1][1] > start else float("-inf")
+        hi = (chunk_results[k + 1][0] + end) / 2 if k + 1 < len(chunk_results) and chunk_results[k + 1][0] < end else float("inf")
+        for s in segments:
+            if s.get("words"):
+                words = [w for w in s["words"] if lo <= (w["start"] + w["end"]) / 2 < hi]
+                if not words:
+                    continue
+                s = {**s, "words": words, "start": words[0]["start"], "end": words[-1]["end"],
+                     "text": "".join(w["word"] for w in words)}
+            elif not lo <= (s["start"] + s["end"]) / 2 < hi:
+                continue
+            stitched.append({**s, "id": len(stitched)})
+    return stitched
+
+
+def transcribe_long(audio, model_size="medium", workers=None, chunk_s=CHUNK_S, overlap_s=OVERLAP_S, **options):
+    """
+    Mode long : audio (chemin ou tampon 16 kHz) → segments Whisper de tout l'enregistrement,
+    horodatés dans le temps du fichier d'origine. Retourne (segments, stats).
+    """
+    from utils.audio import load_audio_buffer
+    y = load_audio_buffer(audio) if isinstance(audio, str) else audio
+    sr = SAMPLE_RATE
+    with tracing.span("longform_plan"):
+        chunks = plan_chunks(y, sr, chunk_s=chunk_s, overlap_s=overlap_s)
+    n_workers = min(pool_size(model_size, workers), max(len(chunks), 1))
+    threads = max(1, (os.cpu_count() or 1) // n_workers)
+    tasks = [(k, start / sr, y[start:end], options) for k, (start, end) in enumerate(chunks)]
+
+    results = {}
+    with tracing.span("longform_transcribe", chunks=len(chunks), workers=n_workers):
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(n_workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(model_size, threads)) as executor:
+            # Les plus longs d'abord : meilleur équilibrage de la charge
+            order = sorted(range(len(tasks)), key=lambda k: -len(tasks[k][2]))
+            for k, segments in executor.map(_transcribe_chunk, [tasks[k] for k in order]):
+                results[k] = segments
+
+    segments = stitch([(start / sr, end / sr, results[k]) for k, (start, end) in enumerate(chunks)])
+    speech = sum(end - start for start, end in chunks)
+    stats = {
+        "duration_s": len(y) / sr,
+        "transcribed_s": speech / sr,
+        "silence_dropped": 1 - speech / max(len(y), 1),
+        "chunks": len(chunks),
+        "workers": n_workers,
+        "threads_per_worker": threads,
+    }
+    return segments, stats
+
+
+def word_error_rate(reference, hypothesis):
+    """WER (mots normalisés) : distance d'édition / nombre de mots de la référence."""
+    ref = normalize_arabic(reference).split()
+    hyp = normalize_arabic(hypothesis).split()
+    if not ref:
+        return float(bool(hyp))
+    vocab = {w: k for k, w in enumerate(dict.fromkeys(ref + hyp))}
+    ref_ids = np.array([vocab[w] for w in ref])
+    cols = np.arange(len(ref) + 1, dtype=np.float64)
+    prev = cols.copy()
+    for w in hyp:
+        # D[i][j] = min(haut + 1, diagonale + coût, gauche + 1) ; la gauche par minimum cumulé
+        base = np.empty_like(prev)
+        base[0] = prev[0] + 1
+        base[1:] = np.minimum(prev[1:] + 1, prev[:-1] + (ref_ids != vocab[w]))
+        prev = np.minimum.accumulate(base - cols) + cols
+    return float(prev[-1] / len(ref))
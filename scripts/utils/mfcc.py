@@ -1,13 +1,27 @@
 import librosa
 import numpy as np
+import scipy.fft
+from functools import lru_cache
+from utils.tracing import traced
+
+# Paramètres par défaut de librosa.feature.mfcc
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+TOP_DB = 80.0
+
+def rms_scalar(y, target_dB=-20):
+    """
+    Facteur à appliquer au signal pour atteindre le niveau RMS cible (en dB).
+    """
+    rms = np.sqrt(np.dot(y, y) / max(len(y), 1))
+    return 10 ** (target_dB / 20) / (rms + 1e-6)
 
 def normalize_rms(y, target_dB=-20):
     """
     Normalise le signal audio à un niveau RMS cible (en dB).
     """
-    rms = np.sqrt(np.mean(y**2))
-    scalar = 10 ** (target_dB / 20) / (rms + 1e-6)
-    return y * scalar
+    return y * rms_scalar(y, target_dB)
 
 def apply_pre_emphasis(y, coef=0.97):
     """
@@ -15,13 +29,25 @@ def apply_pre_emphasis(y, coef=0.97):
     """
     return np.append(y[0], y[1:] - coef * y[:-1])
 
-def extract_mfcc_from_audio(y, sr, n_mfcc=13):
+def normalize_and_emphasize(y, target_dB=-20, coef=0.97):
+    """
+    Normalisation RMS + pre-emphasis en un seul tampon de sortie.
+    Le signal d'entrée (tampon partagé du pipeline) n'est jamais modifié.
+    """
+    out = np.empty(len(y), dtype=np.float32)
+    if len(y) == 0:
+        return out
+    out[0] = y[0]
+    np.multiply(y[:-1], -coef, out=out[1:])
+    out[1:] += y[1:]
+    out *= rms_scalar(y, target_dB)  # la pre-emphasis est linéaire : l'ordre n'importe pas
+    return out
 
-    # 🔊 Étape 1 : normalisation RMS
-    y = normalize_rms(y)
+@traced("mfcc")
+def extract_mfcc_from_audio(y, sr, n_mfcc=13, target_dB=-20, coef=0.97):
 
-    # 🔊 Étape 2 : pre-emphasis
-    y = apply_pre_emphasis(y)
+    # 🔊 Étapes 1 + 2 : normalisation RMS et pre-emphasis (une seule copie)
+    y = normalize_and_emphasize(y, target_dB, coef)
 
     # 🔊 Étape 3 : extraction des MFCCs
     mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc)
@@ -32,3 +58,43 @@ def extract_mfcc_from_audio(y, sr, n_mfcc=13):
     mfccs_combined = np.concatenate([mfccs_mean, mfccs_std])
 
     return mfccs_combined.tolist()
+
+@lru_cache(maxsize=8)
+def mel_filterbank(sr, n_fft=N_FFT, n_mels=N_MELS):
+    """
+    Banc de filtres mel (float32), calculé une fois par configuration.
+    """
+    return librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels).astype(np.float32)
+
+def mfcc_stats_from_mel(mel_power, n_mfcc=13, top_db=TOP_DB):
+    """
+    Même fin de chaîne que librosa.feature.mfcc (dB, DCT-II ortho) à partir d'un
+    spectrogramme mel de puissance (n_mels, n_frames), puis moyenne + écart-type.
+    """
+    S_db = librosa.power_to_db(mel_power, top_db=top_db)
+    mfccs = scipy.fft.dct(S_db, axis=0, type=2, norm="ortho")[:n_mfcc]
+    return np.concatenate([np.mean(mfccs, axis=1), np.std(mfccs, axis=1)])
+
+def extract_mfcc_from_file(file_path, use_cache=False, n_mfcc=13, target_dB=-20, coef=0.97, y=None):
+    """
+    Décode un fichier (float32 16 kHz) et retourne (file_path, mfcc, erreur).
+    y : tampon déjà décodé du fichier (file_path peut alors valoir None), utilisé sans re-décodage.
+    Avec use_cache, le résultat passe par le cache disque adressé par contenu (octets du fichier,
+    sinon du tampon) : un audio déjà traité avec les mêmes paramètres n'est ni décodé ni recalculé.
+    Fonction de module, utilisable directement dans un pool de processus.
+    """
+    from utils.audio import load_audio_buffer, SAMPLE_RATE
+
+    def compute():
+        audio = load_audio_buffer(file_path) if y is None else y
+        return extract_mfcc_from_audio(audio, SAMPLE_RATE, n_mfcc, target_dB, coef)
+
+    try:
+        if not use_cache:
+            return file_path, compute(), None
+        from utils.feature_cache import get_feature_cache, feature_key, file_digest, buffer_digest
+        digest = file_digest(file_path) if file_path is not None else buffer_digest(y, SAMPLE_RATE)
+        key = feature_key(digest, f"ffmpeg_{SAMPLE_RATE}", "original", n_mfcc, target_dB, coef)
+        return file_path, get_feature_cache().get_or_compute(key, compute).tolist(), None
+    except Exception as e:
+        return file_path, None, str(e)
@@ -0,0 +1,106 @@
+# 🎚️ MFCC par fenêtres glissantes, à partir d'un STFT continu (mémoire constante)
+from collections import deque
+from itertools import islice
+import numpy as np
+from utils.mfcc import mel_filterbank, mfcc_stats_from_mel, N_FFT, HOP_LENGTH
+
+
+class WindowedMfccExtractor:
+    """
+    Reçoit l'audio par blocs et produit un vecteur 26-dim (13 moyennes + 13 écarts-types)
+    par fenêtre de window_s secondes, tous les hop_s secondes.
+    - pre-emphasis et STFT sont calculés en continu (les trames ne sont calculées qu'une fois,
+      même quand les fenêtres se chevauchent) ;
+    - la normalisation RMS de extract_mfcc_from_audio est appliquée par fenêtre,
+      analytiquement, en mettant à l'échelle le spectre de puissance (facteur²) ;
+    - seules les trames de la fenêtre courante sont gardées en mémoire.
+    """
+
+    def __init__(self, sr, window_s=10.0, hop_s=5.0, n_mfcc=13, target_dB=-20, coef=0.97,
+                 n_fft=N_FFT, hop_length=HOP_LENGTH, min_window_ratio=0.5):
+        self.sr = sr
+        self.n_mfcc = n_mfcc
+        self.target_dB = target_dB
+        self.coef = coef
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window_frames = max(1, int(round(window_s * sr / hop_length)))
+        self.hop_frames = max(1, int(round(hop_s * sr / hop_length)))
+        self.min_frames = max(1, int(self.window_frames * min_window_ratio))
+
+        self._mel_basis = mel_filterbank(sr, n_fft)
+        self._fft_window = np.hanning(n_fft + 1)[:-1].astype(np.float32)  # Hann périodique (librosa)
+        self._pending = np.zeros(0, dtype=np.float32)   # échantillons pré-accentués pas encore tramés
+        self._pending_raw_sq = np.zeros(0, dtype=np.float64)
+        self._last_sample = None
+        self._mel_frames = deque()   # spectres mel des trames de la fenêtre courante
+        self._frame_energy = deque()  # somme des carrés du signal brut par saut de trame
+        self._first_frame = 0        # index global de la 1re trame gardée
+        self._next_window = 0        # index global de la 1re trame de la prochaine fenêtre
+
+    def push(self, block):
+        """Ajoute un bloc d'audio brut et génère (start_s, end_s, features) pour chaque fenêtre complète."""
+        block = np.asarray(block, dtype=np.float32)
+        if block.size == 0:
+            return
+
+        # 🔊 Pre-emphasis continue (on garde le dernier échantillon du bloc précédent)
+        emphasized = np.empty_like(block)
+        emphasized[0] = block[0] if self._last_sample is None else block[0] - self.coef * self._last_sample
+        emphasized[1:] = block[1:] - self.coef * block[:-1]
+        self._last_sample = float(block[-1])
+
+        self._pending = np.concatenate([self._pending, emphasized])
+        self._pending_raw_sq = np.concatenate([self._pending_raw_sq, block.astype(np.float64) ** 2])
+        self._frame_pending()
+        yield from self._emit_ready()
+
+    def flush(self):
+        """Fin du flux : émet la dernière fenêtre partielle si elle est assez longue."""
+        available = self._first_frame + len(self._mel_frames) - self._next_window
+        if available >= self.min_frames and (self._next_window == 0 or available > self.window_frames - self.hop_frames):
+            yield self._window(self._next_window, available)
+
+    def _frame_pending(self):
+        n = self._pending.size
+        if n < self.n_fft:
+            return
+        n_frames = 1 + (n - self.n_fft) // self.hop_length
+        frames = np.lib.stride_tricks.sliding_window_view(self._pending, self.n_fft)[::self.hop_length][:n_frames]
+        spectrum = np.abs(np.fft.rfft(frames * self._fft_window, axis=1)) ** 2
+        mel = (self._mel_basis @ spectrum.T.astype(np.float32)).T
+
+        consumed = n_frames * self.hop_length
+        energy = self._pending_raw_sq[:consumed].reshape(n_frames, self.hop_length).sum(axis=1)
+        self._mel_frames.extend(mel)
+        self._frame_energy.extend(energy)
+        self._pending = self._pending[consumed:]
+        self._pending_raw_sq = self._pending_raw_sq[consumed:]
+
+    def _emit_ready(self):
+        while self._first_frame + len(self._mel_frames) >= self._next_window + self.window_frames:
+            yield self._window(self._next_window, self.window_frames)
+            self._next_window += self.hop_frames
+            while self._first_frame < self._next_window and self._mel_frames:
+                self._mel_frames.popleft()
+                self._frame_energy.popleft()
+                self._first_frame += 1
+
+    def _window(self, start_frame, n_frames):
+        offset = start_frame - self._first_frame
+        mel = np.array(list(islice(self._mel_frames, offset, offset + n_frames))).T
+        energy = sum(islice(self._frame_energy, offset, offset + n_frames))
+        rms = np.sqrt(energy / (n_frames * self.hop_length))
+        scalar = 10 ** (self.target_dB / 20) / (rms + 1e-6)
+        features = mfcc_stats_from_mel(mel * scalar ** 2, n_mfcc=self.n_mfcc)
+        start_s = start_frame * self.hop_length / self.sr
+        end_s = (start_frame + n_frames) * self.hop_length / self.sr
+        return start_s, end_s, features
+
+
+def iter_window_features(blocks, sr, **kwargs):
+    """Génère (start_s, end_s, features) pour un flux de blocs audio."""
+    extractor = WindowedMfccExtractor(sr, **kwargs)
+    for block in blocks:
+        yield from extractor.push(block)
+    yield from extractor.flush()
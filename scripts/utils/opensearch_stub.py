@@ -0,0 +1,131 @@
+# 🧪 Stand-in OpenSearch en mémoire (développement local, sans cluster)
+import json
+import threading
+import uuid
+from itertools import count
+
+
+class _Serializer:
+    mimetype = "application/json"
+
+    def dumps(self, data):
+        return data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class _Transport:
+    def __init__(self):
+        self.serializer = _Serializer()
+
+
+class _Indices:
+    def __init__(self, store):
+        self._store = store
+
+    def exists(self, index, **kwargs):
+        return index in self._store._docs
+
+    def create(self, index, body=None, **kwargs):
+        self._store._docs.setdefault(index, {})
+        return {"acknowledged": True, "index": index}
+
+    def refresh(self, index=None, **kwargs):
+        return {"_shards": {"total": 1, "successful": 1, "failed": 0}}
+
+
+class InMemoryOpenSearch:
+    """
+    Implémente le sous-ensemble de l'API client utilisé par 01_index_audio.py
+    (info, indices, search/scroll/clear_scroll, bulk, count), au format de réponse
+    d'OpenSearch : helpers.scan et helpers.bulk / parallel_bulk fonctionnent tels quels.
+    Seule la requête match_all est gérée (avec filtrage _source).
+    """
+
+    def __init__(self):
+        self.transport = _Transport()
+        self.indices = _Indices(self)
+        self._docs = {}        # index → {_id: _source}
+        self._scrolls = {}     # scroll_id → (hits restants, taille de page)
+        self._lock = threading.Lock()
+        self._ids = count()
+        self.bulk_calls = 0
+
+    def info(self, **kwargs):
+        return {"name": "in-memory", "version": {"number": "stub", "distribution": "opensearch"}}
+
+    def count(self, index, body=None, **kwargs):
+        return {"count": len(self._docs.get(index, {}))}
+
+    # 🔎 Recherche paginée par scroll
+    def search(self, index=None, body=None, scroll=None, size=10, **kwargs):
+        body = body or {}
+        size = body.get("size", size)
+        fields = body.get("_source")
+        with self._lock:
+            hits = [
+                {"_index": index, "_id": doc_id, "_source": _filter_source(source, fields)}
+                for doc_id, source in self._docs.get(index, {}).items()
+            ]
+        if scroll is None:
+            return self._page(None, hits[:size], len(hits))
+        scroll_id = uuid.uuid4().hex
+        self._scrolls[scroll_id] = (hits[size:], size)
+        return self._page(scroll_id, hits[:size], len(hits))
+
+    def scroll(self, body=None, scroll_id=None, scroll=None, **kwargs):
+        scroll_id = (body or {}).get("scroll_id", scroll_id)
+        remaining, size = self._scrolls.get(scroll_id, ([], 0))
+        self._scrolls[scroll_id] = (remaining[size:], size)
+        return self._page(scroll_id, remaining[:size], None)
+
+    def clear_scroll(self, body=None, scroll_id=None, **kwargs):
+        ids = (body or {}).get("scroll_id", scroll_id)
+        for sid in ([ids] if isinstance(ids, str) else ids or []):
+            self._scrolls.pop(sid, None)
+        return {"succeeded": True}
+
+    # 📦 Indexation en masse (corps NDJSON)
+    def bulk(self, body, index=None, **kwargs):
+        lines = body.decode("utf-8") if isinstance(body, bytes) else body
+        lines = [line for line in lines.split("\n") if line.strip()]
+        items = []
+        with self._lock:
+            self.bulk_calls += 1
+            i = 0
+            while i < len(lines):
+                action = json.loads(lines[i])
+                op, meta = next(iter(action.items()))
+                target = meta.get("_index", index)
+                doc_id = str(meta.get("_id") or next(self._ids))
+                docs = self._docs.setdefault(target, {})
+                if op == "delete":
+                    status = 200 if docs.pop(doc_id, None) is not None else 404
+                    i += 1
+                else:
+                    source = json.loads(lines[i + 1])
+                    if op == "create" and doc_id in docs:
+                        status = 409
+                    else:
+                        status = 200 if doc_id in docs else 201
+                        docs[doc_id] = source.get("doc", source) if op == "update" else source
+                    i += 2
+                items.append({op: {"_index": target, "_id": doc_id, "status": status}})
+        errors = any(item[next(iter(item))]["status"] >= 300 for item in items)
+        return {"took": 0, "errors": errors, "items": items}
+
+    def _page(self, scroll_id, hits, total):
+        page = {
+            "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+            "hits": {"total": {"value": total if total is not None else len(hits)}, "hits": hits},
+        }
+        if scroll_id:
+            page["_scroll_id"] = scroll_id
+        return page
+
+
+def _filter_source(source, fields):
+    if not fields:
+        return dict(source)
+    return {k: v for k, v in source.items() if k in fields}
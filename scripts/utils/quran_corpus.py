@@ -0,0 +1,232 @@
+# 📦 Corpus coranique précompilé (binaire, memory-mappé)
+import os
+import json
+import mmap
+import struct
+from array import array
+from utils.normalize_arabic import normalize_arabic
+
+QURAN_VERSES_PATH = "quran_versets.json"
+CORPUS_PATH = "dataset/quran_corpus.bin"
+MAX_WINDOW = 5
+
+MAGIC = b"SAWTQC01"
+HEADER = struct.Struct("<8s9I")  # magic, n_suras, n_verses, n_windows, max_window, offsets des 5 sections
+SURA_FIELDS = 4    # id, first_vid, n_verses, name_off
+VERSE_FIELDS = 5   # verse_id, norm_start, norm_end, raw_start, raw_end
+WINDOW_FIELDS = 3  # sura_idx, first_vid, last_vid
+
+# 🗂️ Format du fichier :
+# - en-tête fixe (magic + compteurs + offsets des sections)
+# - tables int32 : sourates, versets, fenêtres
+# - texte normalisé UTF-8 : versets d'une sourate séparés par " ", sourates par "\n"
+#   → le texte d'une fenêtre est une simple tranche du blob, sans re-normalisation
+# - texte original UTF-8 (même disposition), puis noms des sourates séparés par "\n"
+
+
+def _align(buf):
+    buf.extend(b"\0" * (-len(buf) % 4))
+
+
+def build_corpus(source_path=QURAN_VERSES_PATH, output_path=CORPUS_PATH, max_window=MAX_WINDOW):
+    """
+    Étape de build unique : parse le JSON, normalise chaque verset une seule fois
+    et écrit le corpus binaire avec les bornes de toutes les fenêtres 1..max_window.
+    """
+    with open(source_path, "r", encoding="utf-8") as f:
+        versets = json.load(f)
+
+    suras, verses, windows = array("i"), array("i"), array("i")
+    norm, raw = bytearray(), bytearray()
+    names = "\n".join(s["name"] for s in versets).encode("utf-8")
+
+    name_off = 0
+    for s_idx, sourate in enumerate(versets):
+        first_vid = len(verses) // VERSE_FIELDS
+        suras.extend([sourate["id"], first_vid, len(sourate["verses"]), name_off])
+        name_off += len(sourate["name"].encode("utf-8")) + 1
+
+        if s_idx:
+            norm += b"\n"
+            raw += b"\n"
+        for i, v in enumerate(sourate["verses"]):
+            if i:
+                norm += b" "
+                raw += b" "
+            n_start, r_start = len(norm), len(raw)
+            norm += normalize_arabic(v["text"]).encode("utf-8")
+            raw += v["text"].encode("utf-8")
+            verses.extend([v["id"], n_start, len(norm), r_start, len(raw)])
+
+        n = len(sourate["verses"])
+        for w in range(1, max_window + 1):
+            for i in range(n - w + 1):
+                windows.extend([s_idx, first_vid + i, first_vid + i + w - 1])
+
+    body = bytearray(HEADER.size)
+    offsets = []
+    for section in (suras.tobytes(), verses.tobytes(), windows.tobytes(), bytes(norm), bytes(raw), names):
+        _align(body)
+        offsets.append(len(body))
+        body += section
+
+    HEADER.pack_into(
+        body, 0, MAGIC,
+        len(versets), len(verses) // VERSE_FIELDS, len(windows) // WINDOW_FIELDS, max_window,
+        offsets[1], offsets[2], offsets[3], offsets[4], offsets[5]
+    )
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(body)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class QuranCorpus:
+    """
+    Vue en lecture seule sur le corpus binaire. Le fichier est memory-mappé :
+    plusieurs workers partagent les mêmes pages, sans parsing JSON ni normalisation.
+    """
+
+    def __init__(self, path=CORPUS_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, self.n_suras, self.n_verses, self.n_windows, self.max_window,
+         verse_off, window_off, norm_off, raw_off, names_off) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Fichier corpus invalide : {path}")
+
+        self._view = view = memoryview(self._mm)
+        self._suras = view[HEADER.size:HEADER.size + self.n_suras * SURA_FIELDS * 4].cast("i")
+        self._verses = view[verse_off:verse_off + self.n_verses * VERSE_FIELDS * 4].cast("i")
+        self._windows = view[window_off:window_off + self.n_windows * WINDOW_FIELDS * 4].cast("i")
+        self._norm_off, self._raw_off, self._names_off = norm_off, raw_off, names_off
+        self.fingerprint = (self.n_suras, self.n_verses, raw_off - norm_off)
+        self._texts_cache = {}
+
+    # 📖 Sourates
+    def sourate_id(self, s_idx):
+        return self._suras[s_idx * SURA_FIELDS]
+
+    def sourate_name(self, s_idx):
+        start = self._names_off + self._suras[s_idx * SURA_FIELDS + 3]
+        end = self._mm.find(b"\n", start)
+        if end == -1:
+            end = len(self._mm)
+        return self._mm[start:end].decode("utf-8")
+
+    def sourate_verses(self, s_idx):
+        """Retourne (first_vid, n_verses) de la sourate."""
+        base = s_idx * SURA_FIELDS
+        return self._suras[base + 1], self._suras[base + 2]
+
+    def sourate_of(self, vid):
+        lo, hi = 0, self.n_suras - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._suras[mid * SURA_FIELDS + 1] <= vid:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    # 📜 Versets et fenêtres
+    def verse_id(self, vid):
+        return self._verses[vid * VERSE_FIELDS]
+
+    def verse_text(self, vid, normalized=True):
+        base = vid * VERSE_FIELDS + (1 if normalized else 3)
+        return self._slice(self._verses[base], self._verses[base + 1], normalized)
+
+    def span_text(self, first_vid, last_vid, normalized=True):
+        """Texte combiné des versets first_vid..last_vid (même sourate), sans copie intermédiaire."""
+        col = 1 if normalized else 3
+        start = self._verses[first_vid * VERSE_FIELDS + col]
+        end = self._verses[last_vid * VERSE_FIELDS + col + 1]
+        return self._slice(start, end, normalized)
+
+    def windows(self, window_sizes=None):
+        """Ids des fenêtres précalculées, filtrées par taille."""
+        if window_sizes is None:
+            return range(self.n_windows)
+        sizes = set(window_sizes)
+        w = self._windows
+        return [
+            wid for wid in range(self.n_windows)
+            if w[wid * WINDOW_FIELDS + 2] - w[wid * WINDOW_FIELDS + 1] + 1 in sizes
+        ]
+
+    def window_span(self, wid):
+        base = wid * WINDOW_FIELDS
+        return self._windows[base + 1], self._windows[base + 2]
+
+    def window_text(self, wid, normalized=True):
+        return self.span_text(*self.window_span(wid), normalized=normalized)
+
+    def window_texts(self, window_sizes=None):
+        """
+        (ids, textes normalisés) des fenêtres, décodés une fois puis mémorisés
+        pour les scorers par lot.
+        """
+        key = tuple(sorted(window_sizes)) if window_sizes else None
+        if key not in self._texts_cache:
+            wids = self.windows(window_sizes)
+            self._texts_cache[key] = (wids, [self.window_text(wid) for wid in wids])
+        return self._texts_cache[key]
+
+    def verse_texts(self):
+        """Textes normalisés de tous les versets (index = id global), mémorisés."""
+        if "verses" not in self._texts_cache:
+            self._texts_cache["verses"] = [self.verse_text(vid) for vid in range(self.n_verses)]
+        return self._texts_cache["verses"]
+
+    def span_match(self, first_vid, last_vid):
+        """
+        Dictionnaire au format historique de detect_top_versets pour une fenêtre.
+        """
+        s_idx = self.sourate_of(first_vid)
+        return {
+            "sourate_id": self.sourate_id(s_idx),
+            "sourate_name": self.sourate_name(s_idx),
+            "start_verse": self.verse_id(first_vid),
+            "end_verse": self.verse_id(last_vid),
+            "verses": [
+                {"id": self.verse_id(vid), "text": self.verse_text(vid, normalized=False)}
+                for vid in range(first_vid, last_vid + 1)
+            ],
+            "text": self.span_text(first_vid, last_vid),
+        }
+
+    def _slice(self, start, end, normalized):
+        base = self._norm_off if normalized else self._raw_off
+        return self._mm[base + start:base + end].decode("utf-8")
+
+    def close(self):
+        for view in (self._suras, self._verses, self._windows, self._view):
+            view.release()
+        self._mm.close()
+
+
+_CORPUS_CACHE = {}
+
+def get_corpus(path=CORPUS_PATH, source_path=QURAN_VERSES_PATH):
+    """
+    Ouvre le corpus binaire (mémorisé par processus). Le reconstruit si le fichier
+    est absent ou plus ancien que la source JSON.
+    """
+    if path in _CORPUS_CACHE:
+        return _CORPUS_CACHE[path]
+
+    stale = not os.path.exists(path) or (
+        os.path.exists(source_path) and os.path.getmtime(source_path) > os.path.getmtime(path)
+    )
+    if stale:
+        build_corpus(source_path, path)
+
+    corpus = QuranCorpus(path)
+    _CORPUS_CACHE[path] = corpus
+    return corpus
@@ -0,0 +1,323 @@
+# 🎙️ Ingestion temps réel : sources PCM, ring buffer, VAD énergétique, session incrémentale
+import sys
+import time
+from time import perf_counter
+import numpy as np
+from utils.audio import SAMPLE_RATE
+from utils.mfcc_stream import WindowedMfccExtractor
+from utils.streaming_matcher import StreamingVerseMatcher
+from utils import tracing
+
+BLOCK_SECONDS = 0.1          # granularité de lecture des sources
+RING_SECONDS = 60.0          # audio conservé (doit couvrir MAX_UTTERANCE_S + OVERLAP_S)
+FRAME_MS = 30
+VAD_THRESHOLD_DB = 10.0      # énergie au-dessus du plancher de bruit pour une trame « parole »
+VAD_MIN_DB = -55.0           # en dessous : toujours du silence
+MIN_SPEECH_MS = 90           # parole continue minimale pour ouvrir un énoncé
+HANGOVER_MS = 400            # silence nécessaire pour fermer un énoncé
+PRE_ROLL_MS = 200            # audio gardé avant le début détecté
+MAX_UTTERANCE_S = 20.0       # au-delà, l'énoncé est coupé (fenêtre forcée)
+OVERLAP_S = 1.0              # recouvrement entre énoncés consécutifs transcrits
+IMAM_WINDOW_S = 10.0
+IMAM_HOP_S = 5.0
+MATCH_WINDOW_WORDS = 120     # mots non encore attribués présentés au matcher (coût borné)
+
+
+# 📥 Sources : blocs (float32 16 kHz, instant d'arrivée perf_counter)
+def pcm_blocks(stream, sr=SAMPLE_RATE, block_seconds=BLOCK_SECONDS):
+    """PCM s16le mono lu depuis un flux binaire (stdin, FIFO) jusqu'à la fin du flux."""
+    block_bytes = int(block_seconds * sr) * 2
+    pending = b""
+    while True:
+        chunk = stream.read(block_bytes - len(pending))
+        if not chunk:
+            break
+        pending += chunk
+        if len(pending) >= block_bytes:
+            yield np.frombuffer(pending, np.int16).astype(np.float32) / 32768.0, perf_counter()
+            pending = b""
+    if len(pending) >= 2:
+        yield np.frombuffer(pending[:len(pending) // 2 * 2], np.int16).astype(np.float32) / 32768.0, perf_counter()
+
+
+def stdin_blocks(sr=SAMPLE_RATE, block_seconds=BLOCK_SECONDS):
+    yield from pcm_blocks(sys.stdin.buffer, sr, block_seconds)
+
+
+def fifo_blocks(path, sr=SAMPLE_RATE, block_seconds=BLOCK_SECONDS):
+    """FIFO nommé (mkfifo) : l'ouverture attend un écrivain, la lecture s'arrête à sa fermeture."""
+    with open(path, "rb") as f:
+        yield from pcm_blocks(f, sr, block_seconds)
+
+
+def follow_blocks(path, sr=SAMPLE_RATE, block_seconds=BLOCK_SECONDS, poll_s=0.05, idle_timeout=5.0):
+    """
+    Fichier en cours d'écriture (PCM s16le ou WAV 16 bits mono) suivi comme tail -f.
+    S'arrête après idle_timeout secondes sans nouvelles données.
+    """
+    block_bytes = int(block_seconds * sr) * 2
+    with open(path, "rb") as f:
+        if f.read(4) == b"RIFF":
+            f.seek(44)  # en-tête WAV canonique
+        else:
+            f.seek(0)
+        pending, last_data = b"", perf_counter()
+        while True:
+            chunk = f.read(block_bytes - len(pending))
+            if chunk:
+                pending += chunk
+                last_data = perf_counter()
+                if len(pending) >= block_bytes:
+                    yield np.frombuffer(pending, np.int16).astype(np.float32) / 32768.0, perf_counter()
+                    pending = b""
+            elif perf_counter() - last_data > idle_timeout:
+                break
+            else:
+                time.sleep(poll_s)
+        if len(pending) >= 2:
+            yield np.frombuffer(pending[:len(pending) // 2 * 2], np.int16).astype(np.float32) / 32768.0, perf_counter()
+
+
+def replay_blocks(path, sr=SAMPLE_RATE, block_seconds=BLOCK_SECONDS, speed=1.0):
+    """
+    Rejoue un WAV comme un flux : chaque bloc est livré à l'instant où il aurait été capté
+    (speed=2 → deux fois plus vite, speed=0 → sans attente). Sert aux mesures de latence.
+    """
+    import soundfile as sf
+    y, file_sr = sf.read(path, dtype="float32", always_2d=True)
+    y = y.mean(axis=1)
+    if file_sr != sr:
+        import librosa
+        y = librosa.resample(y, orig_sr=file_sr, target_sr=sr).astype(np.float32)
+    block = int(block_seconds * sr)
+    t0 = perf_counter()
+    for start in range(0, len(y), block):
+        chunk = y[start:start + block]
+        if speed > 0:
+            due = t0 + (start + len(chunk)) / sr / speed
+            delay = due - perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield chunk, perf_counter()
+
+
+class RingBuffer:
+    """Tampon circulaire float32 adressé en échantillons absolus (depuis le début du flux)."""
+
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.total = 0   # échantillons écrits depuis le début
+
+    def write(self, block):
+        block = np.asarray(block, dtype=np.float32)[-self.capacity:]
+        pos = self.total % self.capacity
+        first = min(len(block), self.capacity - pos)
+        self.data[pos:pos + first] = block[:first]
+        self.data[:len(block) - first] = block[first:]
+        self.total += len(block)
+
+    @property
+    def oldest(self):
+        return max(0, self.total - self.capacity)
+
+    def read(self, start, end):
+        """Copie des échantillons [start, end) ; le début est tronqué s'il a déjà été écrasé."""
+        start, end = max(start, self.oldest), min(end, self.total)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        idx = np.arange(start, end) % self.capacity
+        return self.data[idx]
+
+
+class EnergyVad:
+    """
+    Segmentation en énoncés par énergie : plancher de bruit adaptatif, ouverture après
+    MIN_SPEECH_MS de parole, fermeture après HANGOVER_MS de silence, coupure forcée
+    à MAX_UTTERANCE_S (l'énoncé suivant reprend sans trou à la coupure).
+    Génère (start, end) en échantillons absolus.
+    """
+
+    def __init__(self, sr=SAMPLE_RATE, frame_ms=FRAME_MS, threshold_db=VAD_THRESHOLD_DB, min_db=VAD_MIN_DB,
+                 min_speech_ms=MIN_SPEECH_MS, hangover_ms=HANGOVER_MS, pre_roll_ms=PRE_ROLL_MS,
+                 max_utterance_s=MAX_UTTERANCE_S):
+        self.frame = int(sr * frame_ms / 1000)
+        self.threshold_db = threshold_db
+        self.min_db = min_db
+        self.min_speech = max(1, min_speech_ms // frame_ms)
+        self.hangover = max(1, hangover_ms // frame_ms)
+        self.pre_roll = int(sr * pre_roll_ms / 1000)
+        self.max_samples = int(sr * max_utterance_s)
+        self._rest = np.zeros(0, dtype=np.float32)
+        self._pos = 0             # échantillon absolu de la prochaine trame
+        self._floor = min_db - threshold_db   # plancher initial : silence numérique
+        self._speech_run = 0
+        self._silence_run = 0
+        self.start = None         # début de l'énoncé ouvert
+
+    def push(self, block):
+        x = np.concatenate([self._rest, np.asarray(block, dtype=np.float32)])
+        n_frames = len(x) // self.frame
+        self._rest = x[n_frames * self.frame:]
+        if not n_frames:
+            return
+        frames = x[:n_frames * self.frame].reshape(n_frames, self.frame)
+        energies = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-10)
+        for e in energies:
+            yield from self._step(float(e))
+            self._pos += self.frame
+
+    def flush(self):
+        if self.start is not None:
+            yield self.start, self._pos
+            self.start = None
+
+    def _step(self, energy):
+        speech = energy > max(self._floor + self.threshold_db, self.min_db)
+        if not speech:
+            self._floor = 0.95 * self._floor + 0.05 * energy
+        else:
+            self._floor = min(self._floor + 0.01, energy)  # remonte lentement si le bruit augmente
+
+        end = self._pos + self.frame
+        if self.start is None:
+            self._speech_run = self._speech_run + 1 if speech else 0
+            if self._speech_run >= self.min_speech:
+                first = end - self._speech_run * self.frame
+                self.start = max(0, first - self.pre_roll)
+                self._silence_run = 0
+            return
+
+        self._silence_run = 0 if speech else self._silence_run + 1
+        if self._silence_run >= self.hangover:
+            yield self.start, end - (self._silence_run - 1) * self.frame
+            self.start, self._speech_run = None, 0
+        elif end - self.start >= self.max_samples:
+            yield self.start, end
+            self.start = end  # la session ajoute le recouvrement à la transcription suivante
+
+
+def strip_overlap(previous, words, max_words=8):
+    """Retire du début de words la plus longue suite déjà présente à la fin de previous."""
+    for n in range(min(max_words, len(previous), len(words)), 0, -1):
+        if previous[-n:] == words[:n]:
+            return words[n:]
+    return words
+
+
+class RealtimeSession:
+    """
+    Session d'analyse continue : chaque bloc entre dans le ring buffer, le VAD et l'extracteur
+    MFCC glissant. À la fermeture d'un énoncé, son audio (avec le recouvrement) est transcrit,
+    les mots non encore attribués à un verset sont soumis au StreamingVerseMatcher (remis à zéro
+    à chaque énoncé, fenêtre de MATCH_WINDOW_WORDS mots) ; chaque fenêtre MFCC complète passe
+    dans le CNN et met à jour le classement moyen des imams.
+    feed(block, arrived) génère des événements ; la latence d'un énoncé est mesurée entre
+    l'arrivée de son dernier bloc et la fin de son traitement.
+    """
+
+    def __init__(self, corpus, whisper_model, imam_model=None, label_encoder=None, sr=SAMPLE_RATE,
+                 ring_seconds=RING_SECONDS, overlap_s=OVERLAP_S, scorer=None, vad=None, top_k=3,
+                 match_window=MATCH_WINDOW_WORDS):
+        self.sr = sr
+        self.whisper = whisper_model
+        self.imam_model = imam_model
+        self.label_encoder = label_encoder
+        self.top_k = top_k
+        self.ring = RingBuffer(int(ring_seconds * sr))
+        self.vad = vad or EnergyVad(sr)
+        self.overlap = int(overlap_s * sr)
+        self.matcher = StreamingVerseMatcher(corpus, scorer=scorer)
+        self.extractor = WindowedMfccExtractor(sr, window_s=IMAM_WINDOW_S, hop_s=IMAM_HOP_S) if imam_model else None
+        self.match_window = match_window
+        self.words = []
+        self.pending = []         # mots transcrits depuis le dernier verset émis
+        self.matches = []
+        self.latencies = []
+        self._prob_sum, self._n_windows = None, 0
+        self._last_end = 0
+
+    def feed(self, block, arrived=None):
+        arrived = perf_counter() if arrived is None else arrived
+        self.ring.write(block)
+        if self.extractor is not None:
+            windows = list(self.extractor.push(block))
+            if windows:
+                yield self._classify(windows, arrived)
+        for start, end in self.vad.push(block):
+            yield self._utterance(start, end, arrived)
+
+    def close(self, arrived=None):
+        arrived = perf_counter() if arrived is None else arrived
+        if self.extractor is not None:
+            windows = list(self.extractor.flush())
+            if windows:
+                yield self._classify(windows, arrived)
+        for start, end in self.vad.flush():
+            yield self._utterance(start, end, arrived)
+
+    def _utterance(self, start, end, arrived):
+        from transcribe_audio import transcribe_audio
+
+        with tracing.span("realtime_utterance", seconds=(end - start) / self.sr):
+            # 🔁 Recouvrement avec l'énoncé précédent : les mots coupés sont retranscrits entiers
+            audio = self.ring.read(max(start, self._last_end - self.overlap), end)
+            self._last_end = end
+            segments = transcribe_audio(audio, model=self.whisper, use_cache=False)  # énoncés jamais rejoués
+            words = " ".join(s["text"].strip() for s in segments).split()
+            new_words = strip_overlap(self.words, words)
+            self.words.extend(new_words)
+            match = self._match(new_words) if new_words else None
+
+        latency = perf_counter() - arrived
+        self.latencies.append(latency)
+        tracing.count("realtime_utterances")
+        return {
+            "type": "utterance",
+            "start": start / self.sr,
+            "end": end / self.sr,
+            "text": " ".join(new_words),
+            "match": match,
+            "best": self.matcher.best,
+            "latency_ms": latency * 1000,
+        }
+
+    def _match(self, new_words):
+        """
+        Le matcher n'émet qu'une fois et re-score tout son texte : il est remis à zéro à chaque
+        énoncé et ne reçoit que les mots en attente (bornés), vidés dès qu'un verset est émis.
+        """
+        self.pending.extend(new_words)
+        self.pending = self.pending[-max(self.match_window, len(new_words)):]
+        self.matcher.reset()
+        match = self.matcher.feed(" ".join(self.pending))
+        if match is not None:
+            self.pending = []
+            self.matches.append(match)
+        return match
+
+    def _classify(self, windows, arrived):
+        preds = self.imam_model.predict(np.array([f for _, _, f in windows]), verbose=0)
+        self._prob_sum = preds.sum(axis=0) if self._prob_sum is None else self._prob_sum + preds.sum(axis=0)
+        self._n_windows += len(windows)
+        mean = self._prob_sum / self._n_windows
+        top = mean.argsort()[-self.top_k:][::-1]
+        labels = self.label_encoder.inverse_transform(top)
+        return {
+            "type": "imam",
+            "end": windows[-1][1],
+            "windows": self._n_windows,
+            "top": [(label, float(mean[idx])) for label, idx in zip(labels, top)],
+            "latency_ms": (perf_counter() - arrived) * 1000,
+        }
+
+    def latency_report(self):
+        if not self.latencies:
+            return {}
+        ms = np.asarray(self.latencies) * 1000
+        return {
+            "utterances": len(ms),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p90_ms": float(np.percentile(ms, 90)),
+            "max_ms": float(ms.max()),
+        }
@@ -0,0 +1,90 @@
+# 🧮 Backends de scoring texte (rapidfuzz vectorisé / difflib historique)
+import os
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+
+DEFAULT_BACKEND = os.environ.get("SAWT_SCORER", "rapidfuzz")
+DIFFLIB_SHARD_MIN = 2000  # en dessous, pas de pool de processus
+
+
+def _difflib_ratios(query, choices):
+    return [SequenceMatcher(None, query, c).ratio() for c in choices]
+
+
+class DifflibScorer:
+    """
+    Mode compatibilité : même score que l'ancien code (SequenceMatcher.ratio),
+    réparti par tranches sur un pool de processus pour les gros lots.
+    """
+    name = "difflib"
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+
+    def score(self, query, choices):
+        choices = list(choices)
+        if self.workers <= 1 or len(choices) < DIFFLIB_SHARD_MIN:
+            return _difflib_ratios(query, choices)
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        size = -(-len(choices) // self.workers)
+        shards = [choices[i:i + size] for i in range(0, len(choices), size)]
+        futures = [self._pool.submit(_difflib_ratios, query, shard) for shard in shards]
+        return [s for f in futures for s in f.result()]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class RapidfuzzScorer:
+    """
+    Score une requête contre tous les choix en un seul appel process.cdist
+    (C++, multi-cœur via workers). Score = fuzz.ratio / 100, dans [0, 1].
+    """
+    name = "rapidfuzz"
+
+    def __init__(self, workers=-1):
+        from rapidfuzz import fuzz, process
+        self._fuzz, self._process = fuzz, process
+        self.workers = workers
+
+    def score(self, query, choices):
+        choices = choices if isinstance(choices, list) else list(choices)
+        if not choices:
+            return []
+        scores = self._process.cdist(
+            [query], choices, scorer=self._fuzz.ratio, workers=self.workers
+        )[0]
+        return (scores / 100.0).tolist()
+
+    def close(self):
+        pass
+
+
+SCORERS = {
+    "difflib": DifflibScorer,
+    "rapidfuzz": RapidfuzzScorer,
+}
+
+_SCORER_CACHE = {}
+
+def get_scorer(name=None, workers=None):
+    """
+    Retourne un scorer partagé par processus. Retombe sur difflib si rapidfuzz est absent.
+    """
+    name = name or DEFAULT_BACKEND
+    if name not in SCORERS:
+        raise ValueError(f"Scorer inconnu : {name} (disponibles : {', '.join(SCORERS)})")
+
+    key = (name, workers)
+    if key not in _SCORER_CACHE:
+        try:
+            _SCORER_CACHE[key] = SCORERS[name](workers) if workers is not None else SCORERS[name]()
+        except ImportError:
+            print(f"⚠️ {name} indisponible, utilisation de difflib.")
+            _SCORER_CACHE[key] = get_scorer("difflib", workers)
+    return _SCORER_CACHE[key]
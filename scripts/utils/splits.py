@@ -0,0 +1,29 @@
+# ✂️ Split train / test déterministe par enregistrement
+import hashlib
+import numpy as np
+
+TEST_RATIO = 0.2
+SPLIT_SEED = 42
+
+
+def split_position(file_path, seed=SPLIT_SEED):
+    """Position stable dans [0, 1) dérivée du chemin : ne dépend ni de l'ordre ni de la taille du dataset."""
+    digest = hashlib.sha1(f"{seed}:{file_path}".encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) / 2 ** 32
+
+
+def is_test(file_path, test_ratio=TEST_RATIO, seed=SPLIT_SEED):
+    return split_position(file_path, seed) < test_ratio
+
+
+def test_mask(store, test_ratio=TEST_RATIO, seed=SPLIT_SEED):
+    """
+    Masque booléen (une valeur par ligne du store) : toutes les augmentations d'un
+    même fichier tombent du même côté du split, ce qui évite les fuites train → test.
+    """
+    per_file = np.array(
+        [is_test(path, test_ratio, seed) for path in store.dictionaries["file_path"]], dtype=bool
+    )
+    if len(per_file) == 0:
+        return np.zeros(len(store), dtype=bool)
+    return per_file[store.meta()[:, 2]]
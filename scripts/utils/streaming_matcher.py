@@ -0,0 +1,139 @@
+# 📡 Matching de versets incrémental, segment par segment
+from utils.normalize_arabic import normalize_arabic
+from utils.verse_index import get_verse_index, NGRAM_SIZE
+from utils.scoring import get_scorer
+
+SCORE_HIGH = 0.60
+SCORE_MEDIUM = 0.35
+
+
+class StreamingVerseMatcher:
+    """
+    Reçoit les segments Whisper un par un et garde un petit ensemble d'hypothèses
+    (fenêtres de versets) encore plausibles :
+    - les compteurs n-grammes par verset sont mis à jour avec les seuls nouveaux n-grammes ;
+    - les hypothèses trop loin de la meilleure estimation sont élaguées ;
+    - seules les hypothèses vivantes sont re-scorées par le scorer exact.
+    Un résultat est émis dès que le seuil de confiance est franchi.
+    """
+
+    def __init__(self, corpus, scorer=None, window_sizes=(1, 2, 3, 4, 5),
+                 score_high=SCORE_HIGH, score_medium=SCORE_MEDIUM,
+                 max_hypotheses=40, n_seeds=10, prune_ratio=0.5, min_margin=0.1):
+        self.corpus = corpus
+        self.index = get_verse_index(corpus)
+        self.scorer = get_scorer(scorer) if scorer is None or isinstance(scorer, str) else scorer
+        self.window_sizes = tuple(window_sizes)
+        self.score_high = score_high
+        self.score_medium = score_medium
+        self.max_hypotheses = max_hypotheses
+        self.n_seeds = n_seeds
+        self.prune_ratio = prune_ratio
+        self.min_margin = min_margin
+        self.reset()
+
+    def reset(self):
+        self.text = ""
+        self.hypotheses = {}  # (first_vid, last_vid) → score exact
+        self.best = None
+        self.emitted = None
+        self.n_segments = 0
+        self._grams = set()
+        self._tail = ""
+        self._q_size = 0
+        self._hits = [0] * len(self.index.sizes)
+
+    def feed(self, segment_text):
+        """
+        Ajoute un segment. Retourne le match (dict) au moment où le seuil est franchi,
+        None sinon (y compris après une première émission).
+        """
+        self.n_segments += 1
+        segment = normalize_arabic(segment_text.strip())
+        if not segment:
+            return None
+        self.text = f"{self.text} {segment}".strip()
+
+        touched = self._update_hits(segment)
+        if self._q_size == 0:
+            return None
+
+        # 🌱 Nouvelles hypothèses autour des versets touchés + hypothèses encore vivantes
+        index = self.index
+        spans = set(self.hypotheses)
+        for vid in index.top_seeds(touched, self._hits, self.n_seeds):
+            spans.update(index.spans_around(vid, self.window_sizes))
+        if not spans:
+            return None
+
+        # ✂️ Élagage sur l'estimation n-gramme (aucun alignement ici)
+        estimates = {span: index.estimate(self._hits, self._q_size, span) for span in spans}
+        best_estimate = max(estimates.values())
+        alive = sorted(
+            (span for span, est in estimates.items() if est >= self.prune_ratio * best_estimate),
+            key=lambda span: -estimates[span]
+        )[:self.max_hypotheses]
+
+        # 🎯 Score exact des seules hypothèses vivantes
+        scores = self.scorer.score(self.text, [self.corpus.span_text(*span) for span in alive])
+        self.hypotheses = dict(zip(alive, scores))
+        best_span = max(self.hypotheses, key=self.hypotheses.get)
+        if self.best is None or self.hypotheses[best_span] >= self.best["similarity"]:
+            self.best = {**self.corpus.span_match(*best_span), "similarity": self.hypotheses[best_span]}
+
+        if self.emitted is None and self._is_confident(best_span):
+            self.emitted = {**self.best, "segments": self.n_segments}
+            return self.emitted
+        return None
+
+    def _update_hits(self, segment):
+        """
+        Ajoute les n-grammes jamais vus (y compris à la jonction avec le segment
+        précédent) et retourne les versets dont le compteur a changé.
+        """
+        compact = self._tail + "".join(segment.split())
+        self._tail = compact[-(NGRAM_SIZE - 1):]
+        postings = self.index.postings
+        touched = set()
+        for i in range(len(compact) - NGRAM_SIZE + 1):
+            g = compact[i:i + NGRAM_SIZE]
+            if g in self._grams:
+                continue
+            self._grams.add(g)
+            vids = postings.get(g)
+            if vids is None:
+                continue
+            self._q_size += 1
+            for vid in vids:
+                self._hits[vid] += 1
+            touched.update(vids)
+        return touched
+
+    def _margin(self, span):
+        """Écart entre la meilleure hypothèse et la meilleure hypothèse qui ne la chevauche pas."""
+        first_vid, last_vid = span
+        rivals = [
+            score for (a, b), score in self.hypotheses.items()
+            if b < first_vid or a > last_vid
+        ]
+        return self.hypotheses[span] - max(rivals, default=0.0)
+
+    def _is_confident(self, span):
+        """
+        Même règle que l'ancien early stop : score global ≥ score_high, ou deux versets
+        consécutifs de la fenêtre chacun ≥ score_medium. On exige en plus une marge
+        minimale sur les hypothèses concurrentes pour ne pas émettre sur un texte ambigu.
+        """
+        if self._margin(span) < self.min_margin:
+            return False
+        if self.hypotheses[span] >= self.score_high:
+            return True
+        first_vid, last_vid = span
+        if first_vid == last_vid:
+            return False
+        verse_scores = self.scorer.score(
+            self.text, [self.corpus.verse_text(vid) for vid in range(first_vid, last_vid + 1)]
+        )
+        if any(s >= self.score_high for s in verse_scores):
+            return True
+        return any(a >= self.score_medium and b >= self.score_medium for a, b in zip(verse_scores, verse_scores[1:]))
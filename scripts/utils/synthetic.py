@@ -0,0 +1,40 @@
+# 🧪 Données synthétiques (transcriptions bruitées tirées du corpus)
+import random
+
+# Lettres fréquentes pour les substitutions (erreurs typiques de transcription)
+ARABIC_LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+
+
+def perturb_text(text, error_rate, rng):
+    """
+    Simule une transcription Whisper : alef wasla → alef, puis suppressions,
+    substitutions et insertions de lettres avec une probabilité error_rate.
+    """
+    out = []
+    for ch in text.replace("ٱ", "ا"):
+        r = rng.random()
+        if ch == " " or r >= error_rate:
+            out.append(ch)
+        elif r < error_rate / 3:
+            continue
+        elif r < 2 * error_rate / 3:
+            out.append(rng.choice(ARABIC_LETTERS))
+        else:
+            out.append(ch + rng.choice(ARABIC_LETTERS))
+    return "".join(out)
+
+
+def sample_transcriptions(corpus, n, seed=42, error_rate=0.08, max_window=3):
+    """
+    Tire n fenêtres aléatoires du corpus et retourne [(texte bruité, (first_vid, last_vid)), ...].
+    """
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(n):
+        s_idx = rng.randrange(corpus.n_suras)
+        first, count = corpus.sourate_verses(s_idx)
+        w = rng.randint(1, min(max_window, count))
+        start = first + rng.randrange(count - w + 1)
+        span = (start, start + w - 1)
+        samples.append((perturb_text(corpus.span_text(*span), error_rate, rng), span))
+    return samples
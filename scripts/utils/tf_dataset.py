@@ -0,0 +1,128 @@
+# 🚚 Pipeline d'entraînement hors mémoire : shards binaires + tf.data
+import os
+import json
+import numpy as np
+from utils.splits import test_mask, TEST_RATIO, SPLIT_SEED
+
+SHARDS_PATH = "mfcc_data/shards"
+SHARDS_VERSION = 1
+MAX_DIM = 26
+HEADER_FIELDS = 4                                  # dim, label, file_id, augmentation_id (int32)
+RECORD_BYTES = 4 * HEADER_FIELDS + 4 * MAX_DIM     # 120 octets par exemple
+SHARD_ROWS = 262144
+
+# 🗂️ Contenu du dossier :
+# - shards.json              : labels, augmentations, effectifs, empreinte du store exporté
+# - train-00000.bin, ...     : enregistrements de taille fixe (RECORD_BYTES), ordre aléatoire
+# - test-00000.bin, ...      : idem pour le split de test (split déterministe par file_path)
+# Les vecteurs de dimension < MAX_DIM (anciens MFCC à 13 valeurs) sont complétés par des zéros ;
+# le champ dim permet de les écarter à la lecture.
+
+
+def store_fingerprint(store):
+    return {"rows": len(store), "dim": store.dim,
+            "mtime": os.path.getmtime(os.path.join(store.path, "meta.i32")) if len(store) else 0}
+
+
+def shards_are_fresh(store, path=SHARDS_PATH):
+    try:
+        with open(os.path.join(path, "shards.json"), "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    return config.get("version") == SHARDS_VERSION and config.get("store") == store_fingerprint(store)
+
+
+def export_shards(store, path=SHARDS_PATH, shard_rows=SHARD_ROWS, test_ratio=TEST_RATIO, seed=SPLIT_SEED):
+    """
+    Exporte le feature store en shards FixedLengthRecord, split train / test par fichier.
+    Chaque shard est un échantillon aléatoire du split, écrit dans un ordre aléatoire :
+    l'entrelacement de quelques shards + un shuffle buffer suffisent à mélanger les classes.
+    Mémoire : une permutation d'entiers + un shard à la fois.
+    """
+    if store.dim > MAX_DIM:
+        raise ValueError(f"Dimension {store.dim} > {MAX_DIM}")
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".bin"):
+            os.remove(os.path.join(path, name))
+
+    features, meta = store.features(), np.asarray(store.meta())
+    imams = store.dictionaries["imam"]
+    labels = sorted(set(imams[i] for i in np.unique(meta[:, 0]))) if len(meta) else []
+    label_of = np.array([labels.index(name) if name in labels else -1 for name in imams], dtype=np.int32)
+    is_test = test_mask(store, test_ratio, seed)
+    rng = np.random.default_rng(seed)
+
+    counts = {}
+    for split, rows in (("train", np.flatnonzero(~is_test)), ("test", np.flatnonzero(is_test))):
+        perm = rng.permutation(rows)
+        n_shards = max(1, -(-len(perm) // shard_rows))
+        for s in range(n_shards):
+            chunk = perm[s::n_shards]
+            records = np.zeros((len(chunk), HEADER_FIELDS + MAX_DIM), dtype=np.int32)
+            order = np.argsort(chunk)
+            feats = np.zeros((len(chunk), MAX_DIM), dtype=np.float32)
+            feats[order, :store.dim] = features[chunk[order]]  # lecture dans l'ordre du fichier
+            records[:, 0] = store.dim
+            records[:, 1] = label_of[meta[chunk, 0]]
+            records[:, 2] = meta[chunk, 2]
+            records[:, 3] = meta[chunk, 3]
+            records[:, HEADER_FIELDS:] = feats.view(np.int32)
+            records.tofile(os.path.join(path, f"{split}-{s:05d}.bin"))
+        counts[split] = {
+            "rows": int(len(rows)),
+            "per_label": np.bincount(label_of[meta[rows, 0]], minlength=len(labels)).tolist() if len(rows) else [],
+        }
+
+    config = {
+        "version": SHARDS_VERSION, "store": store_fingerprint(store), "record_bytes": RECORD_BYTES,
+        "labels": labels, "augmentations": store.dictionaries["augmentation"],
+        "test_ratio": test_ratio, "seed": seed, "splits": counts,
+    }
+    with open(os.path.join(path, "shards.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    return config
+
+
+def load_shards_config(path=SHARDS_PATH):
+    with open(os.path.join(path, "shards.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def make_dataset(split, path=SHARDS_PATH, batch_size=64, dim=MAX_DIM, exclude_augmentations=(),
+                 shuffle_buffer=65536, cycle_length=4, seed=SPLIT_SEED, training=None):
+    """
+    tf.data.Dataset de (x (batch, dim, 1), label) lu en streaming depuis les shards :
+    interleave parallèle des fichiers → décodage → filtre (dim, augmentations)
+    → shuffle (entraînement) → batch → prefetch. Rien n'est chargé en RAM au-delà des buffers.
+    """
+    import tensorflow as tf
+
+    training = split == "train" if training is None else training
+    config = load_shards_config(path)
+    excluded = [i for i, name in enumerate(config["augmentations"]) if name in set(exclude_augmentations)]
+    files = tf.data.Dataset.list_files(os.path.join(path, f"{split}-*.bin"), shuffle=training, seed=seed)
+
+    def parse(record):
+        header = tf.io.decode_raw(tf.strings.substr(record, 0, 4 * HEADER_FIELDS), tf.int32)
+        x = tf.io.decode_raw(tf.strings.substr(record, 4 * HEADER_FIELDS, 4 * MAX_DIM), tf.float32)
+        return header, x
+
+    def keep(header, x):
+        ok = tf.equal(header[0], dim)
+        for aug_id in excluded:
+            ok = tf.logical_and(ok, tf.not_equal(header[3], aug_id))
+        return ok
+
+    ds = files.interleave(
+        lambda f: tf.data.FixedLengthRecordDataset(f, RECORD_BYTES, buffer_size=1 << 20),
+        cycle_length=cycle_length,
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=not training,
+    )
+    ds = ds.map(parse, num_parallel_calls=tf.data.AUTOTUNE).filter(keep)
+    if training:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.map(lambda header, x: (tf.expand_dims(x[:dim], -1), header[1]), num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
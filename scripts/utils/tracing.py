@@ -0,0 +1,223 @@
+# 🔬 Instrumentation légère : spans imbriqués, compteurs, pics mémoire
+# Activée par SAWT_TRACE=1 (ou enable()). Désactivée, chaque span est un objet no-op partagé
+# et chaque compteur un simple test de booléen : coût négligeable en production.
+import os
+import json
+import atexit
+import resource
+import threading
+import functools
+from time import perf_counter, time
+
+TRACE_PATH = os.environ.get("SAWT_TRACE_PATH", "logs/trace.jsonl")
+METRICS_PATH = os.environ.get("SAWT_METRICS_PATH", "logs/metrics.prom")
+PREFIX = "sawt"
+
+# 🗂️ Sorties :
+# - trace.jsonl   : un événement JSON par span terminé
+#                   {"ts", "pid", "thread", "span", "parent", "depth", "duration_s", "rss_max_mb", "attrs"}
+# - metrics.prom  : instantané texte au format Prometheus (compteurs, somme/nombre/max des spans, pics)
+
+
+class _State:
+    def __init__(self):
+        self.enabled = False
+        self.trace_path = TRACE_PATH
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.file = None
+        self.counters = {}
+        self.spans = {}        # nom → [nombre, somme, max]
+        self.high_water = {}   # nom → valeur max observée
+
+
+_state = _State()
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+def rss_max_bytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Ko → octets (Linux)
+
+
+class Span:
+    """Span chronométré ; les attributs ajoutés via set() sont écrits avec l'événement."""
+
+    __slots__ = ("name", "attrs", "parent", "depth", "start")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1].name if stack else None
+        self.depth = len(stack)
+        stack.append(self)
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = perf_counter() - self.start
+        _stack().pop()
+        rss = rss_max_bytes()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        event = {
+            "ts": time(), "pid": os.getpid(), "thread": threading.current_thread().name,
+            "span": self.name, "parent": self.parent, "depth": self.depth,
+            "duration_s": duration, "rss_max_mb": rss / 2**20, "attrs": self.attrs,
+        }
+        with _state.lock:
+            stats = _state.spans.setdefault(self.name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+            _state.high_water["rss_bytes"] = max(_state.high_water.get("rss_bytes", 0), rss)
+            if _state.file is not None:
+                _state.file.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+def _stack():
+    stack = getattr(_state.local, "stack", None)
+    if stack is None:
+        stack = _state.local.stack = []
+    return stack
+
+
+def enabled():
+    return _state.enabled
+
+
+def enable(trace_path=None):
+    """Active l'instrumentation ; trace_path="" désactive l'écriture JSONL (métriques seules)."""
+    with _state.lock:
+        _state.trace_path = TRACE_PATH if trace_path is None else trace_path
+        if _state.file is None and _state.trace_path:
+            os.makedirs(os.path.dirname(_state.trace_path) or ".", exist_ok=True)
+            _state.file = open(_state.trace_path, "a", encoding="utf-8", buffering=1)
+        _state.enabled = True
+
+
+def disable():
+    with _state.lock:
+        _state.enabled = False
+        if _state.file is not None:
+            _state.file.close()
+            _state.file = None
+
+
+def reset():
+    with _state.lock:
+        _state.counters.clear()
+        _state.spans.clear()
+        _state.high_water.clear()
+
+
+def span(name, **attrs):
+    """with span("detect", top_k=5) as s: ... — no-op partagé si l'instrumentation est désactivée."""
+    if not _state.enabled:
+        return NO_SPAN
+    return Span(name, attrs)
+
+
+def traced(name=None):
+    """Décorateur : exécute la fonction dans un span (nom par défaut : module.fonction)."""
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return fn(*args, **kwargs)
+            with Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    """Incrémente un compteur (fenêtres scorées, candidats écartés, hits de cache...)."""
+    if _state.enabled:
+        with _state.lock:
+            _state.counters[name] = _state.counters.get(name, 0) + n
+
+
+def high_water(name, value):
+    """Conserve la valeur maximale observée (octets alloués, taille de lot...)."""
+    if _state.enabled:
+        with _state.lock:
+            if value > _state.high_water.get(name, float("-inf")):
+                _state.high_water[name] = value
+
+
+def snapshot():
+    with _state.lock:
+        return {
+            "counters": dict(_state.counters),
+            "spans": {k: {"count": c, "sum_s": s, "max_s": m} for k, (c, s, m) in _state.spans.items()},
+            "high_water": dict(_state.high_water),
+        }
+
+
+def _metric(name):
+    return PREFIX + "_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def prometheus_text():
+    """Instantané au format d'exposition texte Prometheus."""
+    snap = snapshot()
+    lines = []
+    for name, value in sorted(snap["counters"].items()):
+        metric = _metric(name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    if snap["spans"]:
+        lines.append(f"# TYPE {PREFIX}_span_seconds summary")
+        for name, s in sorted(snap["spans"].items()):
+            lines.append(f'{PREFIX}_span_seconds_sum{{span="{name}"}} {s["sum_s"]:.6f}')
+            lines.append(f'{PREFIX}_span_seconds_count{{span="{name}"}} {s["count"]}')
+        lines.append(f"# TYPE {PREFIX}_span_seconds_max gauge")
+        for name, s in sorted(snap["spans"].items()):
+            lines.append(f'{PREFIX}_span_seconds_max{{span="{name}"}} {s["max_s"]:.6f}')
+    for name, value in sorted(snap["high_water"].items()):
+        metric = _metric(name) + "_max"
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path=METRICS_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+    return path
+
+
+@atexit.register
+def _flush():
+    if _state.enabled and (_state.spans or _state.counters):
+        write_metrics()
+    disable()
+
+
+if os.environ.get("SAWT_TRACE", "").lower() not in ("", "0", "false", "no"):
+    enable()
@@ -0,0 +1,112 @@
+# 💾 Cache disque des transcriptions Whisper, adressé par contenu audio + réglages
+import os
+import gzip
+import json
+import fcntl
+from utils.feature_cache import FeatureCache, file_digest, buffer_digest
+from utils.audio import SAMPLE_RATE
+
+CACHE_DIR = os.environ.get("SAWT_TRANSCRIPT_CACHE", "cache/transcripts")
+MAX_BYTES = int(os.environ.get("SAWT_TRANSCRIPT_CACHE_BYTES", 256 * 1024 ** 2))
+TRANSCRIPT_VERSION = 1
+DROPPED_FIELDS = ("tokens",)   # ids de tokens : volumineux et inutilisés en aval
+
+# 🗂️ Même organisation et même LRU que le cache de features (utils/feature_cache.py) :
+# <CACHE_DIR>/<2 premiers caractères>/<clé sha256>.json.gz
+# Une entrée = les segments Whisper (texte, bornes, mots horodatés) en JSON compressé.
+# Un verrou par clé (<clé>.lock, flock) évite que deux processus transcrivent le même audio.
+
+
+class TranscriptCache(FeatureCache):
+    SUFFIX = ".json.gz"
+    METRIC = "transcript_cache"
+
+    def _read(self, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, f, value):
+        with gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+            gz.write(json.dumps(value, ensure_ascii=False, separators=(",", ":"),
+                                default=lambda o: o.item() if hasattr(o, "item") else str(o)).encode("utf-8"))
+
+    def get_or_compute(self, key, compute):
+        """Comme FeatureCache.get_or_compute, sous verrou exclusif par clé (calcul unique)."""
+        segments = self.get(key)
+        if segments is not None:
+            return segments
+        lock_path = self._path(key)[:-len(self.SUFFIX)] + ".lock"
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                segments = self.get(key)  # un autre processus a pu finir pendant l'attente
+                if segments is None:
+                    segments = compact_segments(compute())
+                    self.put(key, segments)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        # Au pire, un processus qui attendait sur l'ancien verrou recalcule : l'écriture
+        # atomique garantit qu'aucune entrée n'est jamais lue à moitié écrite.
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+        return segments
+
+
+def compact_segments(segments):
+    """Segments tels que stockés (et donc renvoyés, premier calcul compris)."""
+    return [{k: v for k, v in s.items() if k not in DROPPED_FIELDS} for s in segments]
+
+
+def checkpoint_tag(model_size):
+    """
+    Identité du checkpoint chargé par whisper.load_model(model_size) : sha256 publié dans l'URL
+    officielle pour un nom connu (les alias comme "large" suivent la version de whisper),
+    sha256 du fichier pour un checkpoint local (fine-tuning). None si inconnue.
+    """
+    import whisper
+    url = getattr(whisper, "_MODELS", {}).get(model_size)
+    if url is not None:
+        return f"{model_size}:{url.split('/')[-2]}"
+    if os.path.isfile(model_size):
+        return f"file:{file_digest(model_size)}"
+    return None
+
+
+def model_tag(model):
+    """
+    Identifiant du checkpoint posé au chargement (transcribe_audio.load_whisper_model).
+    None pour un modèle sans identité connue (modèle factice, chargé ailleurs) : pas de cache,
+    des checkpoints de mêmes dimensions (large-v1 / large-v2, fine-tunings) étant indiscernables.
+    """
+    return getattr(model, "sawt_tag", None)
+
+
+def audio_digest(audio):
+    """Empreinte du contenu : fichier (octets) ou tampon float32 16 kHz déjà décodé."""
+    return file_digest(audio) if isinstance(audio, str) else buffer_digest(audio, SAMPLE_RATE)
+
+
+def transcript_key(audio, model, language, options):
+    try:
+        import whisper
+        version = getattr(whisper, "__version__", None)
+    except ImportError:
+        version = None
+    return TranscriptCache.key(
+        audio_digest(audio), kind="whisper_segments", schema=TRANSCRIPT_VERSION,
+        model=model_tag(model), whisper=version, language=language, options=options,
+    )
+
+
+_caches = {}
+
+
+def get_transcript_cache(path=CACHE_DIR, max_bytes=MAX_BYTES):
+    """Une instance par processus et par dossier."""
+    cache = _caches.get(path)
+    if cache is None:
+        cache = _caches[path] = TranscriptCache(path, max_bytes)
+    return cache
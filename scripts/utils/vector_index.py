@@ -0,0 +1,264 @@
+# 🧭 Index vectoriel local (IVF / IVF-PQ / exact) sur les MFCC 26-dim
+import os
+import json
+from collections import defaultdict
+import numpy as np
+
+INDEX_PATH = "models/vector_index"
+INDEX_VERSION = 1
+CHUNK = 262144          # lignes traitées par bloc (memmap → RAM)
+TRAIN_SAMPLE = 200000   # vecteurs tirés pour entraîner k-means / PQ
+KMEANS_ITER = 20
+NPROBE = 16             # listes IVF parcourues par requête
+PQ_KSUB = 256           # centroïdes par sous-espace PQ (codes uint8)
+
+# 🗂️ Contenu du dossier :
+# - index.json     : version, dimension, nombre de vecteurs, nlist, pq_m, mean / scale du scaler
+# - vectors.f32    : vecteurs standardisés (N × dim), rangés liste IVF par liste IVF (memmap)
+# - labels.i32     : (imam_id, sourate, ligne d'origine dans le store) par vecteur
+# - dict_imam.txt  : noms des imams (id = numéro de ligne)
+# - centroids.f32  : centroïdes IVF (nlist × dim) ; offsets.i64 : début de chaque liste (nlist + 1)
+# - pq_codebooks.f32 / codes.u8 : product quantization des résidus (option pq_m > 0)
+
+
+def _kmeans(x, k, n_iter=KMEANS_ITER, seed=0):
+    """k-means (Lloyd) en numpy ; initialisation sur k points distincts de l'échantillon."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = _nearest(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.stack([np.bincount(assign, weights=x[:, d], minlength=k) for d in range(x.shape[1])], axis=1)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Listes vides : ré-ensemencées sur des points aléatoires
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), size=int(empty.sum()), replace=False)]
+    return centroids.astype(np.float32)
+
+
+def _nearest(x, centroids, chunk=8192):
+    """Indice du centroïde le plus proche de chaque ligne (distance euclidienne)."""
+    c_norms = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(x), dtype=np.int64)
+    for start in range(0, len(x), chunk):
+        block = x[start:start + chunk]
+        out[start:start + chunk] = np.argmin(c_norms - 2 * block @ centroids.T, axis=1)
+    return out
+
+
+def _sq_dists(query, vectors):
+    diff = vectors - query
+    return np.einsum("ij,ij->i", diff, diff)
+
+
+def _top_k(dists, k):
+    k = min(k, len(dists))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    part = np.argpartition(dists, k - 1)[:k]
+    return part[np.argsort(dists[part], kind="stable")]
+
+
+class VectorIndex:
+    """
+    Recherche des plus proches voisins sur les features MFCC standardisées :
+    - exact : parcours du memmap par blocs (référence, repli) ;
+    - IVF   : seules les nprobe listes les plus proches sont parcourues ;
+    - IVF-PQ: distances approchées sur les codes PQ (tables ADC), puis re-classement exact.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        if config.get("version") != INDEX_VERSION:
+            raise ValueError(f"Version d'index incompatible : {config.get('version')}")
+        self.dim, self.n, self.nlist, self.pq_m = config["dim"], config["n"], config["nlist"], config["pq_m"]
+        self.mean = np.asarray(config["mean"], dtype=np.float32)
+        self.scale = np.asarray(config["scale"], dtype=np.float32)
+
+        self.vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(self.n, self.dim))
+        self.labels = np.memmap(self._file("labels.i32"), dtype=np.int32, mode="r", shape=(self.n, 3))
+        with open(self._file("dict_imam.txt"), "r", encoding="utf-8") as f:
+            self.imams = f.read().split("\n")[:-1]
+        self.centroids = np.fromfile(self._file("centroids.f32"), dtype=np.float32).reshape(self.nlist, self.dim)
+        self.offsets = np.fromfile(self._file("offsets.i64"), dtype=np.int64)
+        self._c_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        if self.pq_m:
+            self.dsub = self.dim // self.pq_m
+            self.codebooks = np.fromfile(self._file("pq_codebooks.f32"), dtype=np.float32).reshape(
+                self.pq_m, PQ_KSUB, self.dsub)
+            self.codes = np.memmap(self._file("codes.u8"), dtype=np.uint8, mode="r", shape=(self.n, self.pq_m))
+
+    def transform(self, features):
+        return (np.asarray(features, dtype=np.float32) - self.mean) / self.scale
+
+    # 🔎 Recherche
+    def search(self, features, k=10, nprobe=NPROBE, mode="ivf", rerank=4):
+        """
+        Retourne (ids, distances²) des k plus proches voisins d'un vecteur 26-dim brut.
+        mode : "ivf" (défaut), "pq" ou "exact". En 26 dimensions, lire les vecteurs float32
+        d'une liste coûte peu : "pq" ne sert que si vectors.f32 ne tient pas en page cache
+        (13 octets par vecteur au lieu de 104).
+        """
+        q = self.transform(features)
+        if mode == "exact" or self.nlist <= 1:
+            return self._search_exact(q, k)
+
+        lists = _top_k(self._c_norms - 2 * self.centroids @ q, nprobe)
+        if mode == "pq":
+            if not self.pq_m:
+                raise ValueError("Index construit sans PQ (pq_m = 0)")
+            return self._search_pq(q, lists, k, rerank)
+        return self._search_ivf(q, lists, k)
+
+    def _search_exact(self, q, k):
+        best_ids, best_d = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        for start in range(0, self.n, CHUNK):
+            d = _sq_dists(q, self.vectors[start:start + CHUNK])
+            local = _top_k(d, k)
+            best_ids = np.concatenate([best_ids, local + start])
+            best_d = np.concatenate([best_d, d[local]])
+            keep = _top_k(best_d, k)
+            best_ids, best_d = best_ids[keep], best_d[keep]
+        return best_ids, best_d
+
+    def _search_ivf(self, q, lists, k):
+        ids = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+        # Chaque liste est contiguë dans vectors.f32 : lecture par tranches
+        d = np.concatenate([_sq_dists(q, self.vectors[self.offsets[l]:self.offsets[l + 1]]) for l in lists])
+        order = _top_k(d, k)
+        return ids[order], d[order]
+
+    def _search_pq(self, q, lists, k, rerank):
+        sizes = self.offsets[lists + 1] - self.offsets[lists]
+        if not sizes.sum():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        ids = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists])
+        codes = np.concatenate([self.codes[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+
+        # 📐 Tables ADC : distance du résidu de la requête (par liste sondée) à chaque
+        # centroïde de chaque sous-espace → (nprobe, pq_m, PQ_KSUB), puis une somme de lookups
+        residuals = (q - self.centroids[lists]).reshape(len(lists), self.pq_m, 1, self.dsub)
+        tables = np.sum((self.codebooks[None] - residuals) ** 2, axis=3)
+        rows = np.repeat(np.arange(len(lists)), sizes)
+        approx = tables[rows[:, None], np.arange(self.pq_m), codes].sum(axis=1)
+
+        # 🎯 Re-classement exact des meilleurs candidats PQ
+        short = np.sort(ids[_top_k(approx, k * rerank)])
+        d = _sq_dists(q, self.vectors[short])
+        order = _top_k(d, k)
+        return short[order], d[order]
+
+    # 🕌 API métier
+    def neighbours(self, features, k=10, **kwargs):
+        ids, dists = self.search(features, k=k, **kwargs)
+        return [
+            {"imam": self.imams[imam_id], "sourate": sourate, "row": row, "distance": float(np.sqrt(d))}
+            for (imam_id, sourate, row), d in zip(np.asarray(self.labels[ids]).tolist(), dists)
+        ]
+
+    def top_imams(self, features, k=20, top=3, **kwargs):
+        """Vote des k voisins pondéré par 1 / distance → [(imam, score normalisé), ...]."""
+        return self._vote(self.neighbours(features, k=k, **kwargs), "imam", top)
+
+    def top_sourates(self, features, k=20, top=3, **kwargs):
+        return self._vote(self.neighbours(features, k=k, **kwargs), "sourate", top)
+
+    @staticmethod
+    def _vote(neighbours, field, top):
+        votes = defaultdict(float)
+        for n in neighbours:
+            votes[n[field]] += 1.0 / (n["distance"] + 1e-6)
+        total = sum(votes.values()) or 1.0
+        return sorted(((label, score / total) for label, score in votes.items()), key=lambda t: -t[1])[:top]
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+
+def build_vector_index(store, path=INDEX_PATH, nlist=None, pq_m=13, sample=TRAIN_SAMPLE, seed=0, rows=None):
+    """
+    Construit l'index depuis un FeatureStore (memmap, par blocs).
+    nlist par défaut ≈ 4·√N ; pq_m doit diviser la dimension (0 = sans PQ).
+    rows : sous-ensemble optionnel de lignes du store (ex. jeu d'entraînement).
+    """
+    features, meta = store.features(), store.meta()
+    rows = np.arange(len(store)) if rows is None else np.sort(np.asarray(rows))
+    n, dim = len(rows), store.dim
+    if n == 0:
+        raise ValueError("Aucun vecteur à indexer")
+    if pq_m and dim % pq_m:
+        raise ValueError(f"pq_m={pq_m} ne divise pas la dimension {dim}")
+    nlist = nlist or max(1, min(int(4 * np.sqrt(n)), n // 32 or 1))
+    rng = np.random.default_rng(seed)
+    os.makedirs(path, exist_ok=True)
+
+    def block(idx):
+        return np.asarray(features[idx], dtype=np.float64)
+
+    # ⚖️ Scaler (moyenne / écart-type) en un passage
+    total, total_sq = np.zeros(dim), np.zeros(dim)
+    for start in range(0, n, CHUNK):
+        x = block(rows[start:start + CHUNK])
+        total += x.sum(axis=0)
+        total_sq += (x ** 2).sum(axis=0)
+    mean = total / n
+    scale = np.sqrt(np.maximum(total_sq / n - mean ** 2, 0)) + 1e-8
+
+    def scaled(idx):
+        return ((block(idx) - mean) / scale).astype(np.float32)
+
+    # 🎯 Listes IVF : k-means sur un échantillon, puis affectation de tous les vecteurs
+    train_rows = np.sort(rng.choice(rows, size=min(sample, 64 * nlist, n), replace=False))
+    train = scaled(train_rows)
+    centroids = _kmeans(train, nlist, seed=seed)
+    nlist = len(centroids)
+    assign = np.concatenate([_nearest(scaled(rows[s:s + CHUNK]), centroids) for s in range(0, n, CHUNK)])
+    order = np.argsort(assign, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+
+    # 🧮 Codebooks PQ sur les résidus de l'échantillon
+    codebooks = None
+    if pq_m:
+        dsub = dim // pq_m
+        residuals = train - centroids[_nearest(train, centroids)]
+        codebooks = np.stack([
+            _kmeans(residuals[:, m * dsub:(m + 1) * dsub], PQ_KSUB, seed=seed + m) for m in range(pq_m)
+        ])
+        if codebooks.shape[1] < PQ_KSUB:  # échantillon minuscule : codebook complété par répétition
+            codebooks = np.concatenate([codebooks, np.repeat(codebooks[:, :1], PQ_KSUB - codebooks.shape[1], axis=1)], axis=1)
+
+    # 💾 Écriture rangée par liste IVF
+    with open(os.path.join(path, "vectors.f32"), "wb") as fv, \
+            open(os.path.join(path, "labels.i32"), "wb") as fl, \
+            open(os.path.join(path, "codes.u8"), "wb") as fc:
+        for start in range(0, n, CHUNK):
+            src = rows[order[start:start + CHUNK]]
+            pos = np.argsort(src)
+            x = np.empty((len(src), dim), dtype=np.float32)
+            x[pos] = scaled(src[pos])  # lecture dans l'ordre du fichier
+            fv.write(x.tobytes())
+            labels = np.empty((len(src), 3), dtype=np.int32)
+            labels[pos, :2] = np.asarray(meta[src[pos]])[:, :2]
+            labels[:, 2] = src
+            fl.write(labels.tobytes())
+            if pq_m:
+                residual = x - centroids[assign[order[start:start + CHUNK]]]
+                codes = np.stack([
+                    _nearest(residual[:, m * dsub:(m + 1) * dsub], codebooks[m]) for m in range(pq_m)
+                ], axis=1).astype(np.uint8)
+                fc.write(codes.tobytes())
+
+    centroids.astype(np.float32).tofile(os.path.join(path, "centroids.f32"))
+    offsets.tofile(os.path.join(path, "offsets.i64"))
+    if pq_m:
+        codebooks.astype(np.float32).tofile(os.path.join(path, "pq_codebooks.f32"))
+    with open(os.path.join(path, "dict_imam.txt"), "w", encoding="utf-8") as f:
+        f.write("".join(name + "\n" for name in store.dictionaries["imam"]))
+    with open(os.path.join(path, "index.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, "dim": dim, "n": int(n), "nlist": int(nlist), "pq_m": int(pq_m),
+                   "mean": mean.tolist(), "scale": scale.tolist()}, f)
+    return VectorIndex(path)
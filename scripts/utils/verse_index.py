@@ -0,0 +1,179 @@
+# 🔎 Index inversé n-grammes pour la recherche de versets
+import os
+import pickle
+from array import array
+from utils import tracing
+
+INDEX_PATH = "dataset/verse_index.pkl"
+INDEX_VERSION = 2
+NGRAM_SIZE = 3
+MAX_DF_RATIO = 0.1  # n-grammes présents dans plus de 10% des versets ignorés
+
+
+def char_ngrams(text, n=NGRAM_SIZE):
+    """
+    Retourne l'ensemble des n-grammes de caractères d'un texte normalisé
+    (espaces supprimés pour être robuste au découpage des mots de Whisper).
+    """
+    compact = "".join(text.split())
+    if len(compact) < n:
+        return {compact} if compact else set()
+    return {compact[i:i + n] for i in range(len(compact) - n + 1)}
+
+
+class VerseIndex:
+    """
+    Index inversé n-gramme → versets, construit une seule fois sur le corpus coranique.
+    Fournit une courte liste de fenêtres candidates (sourate, début, fin)
+    à re-scorer, au lieu de comparer la transcription à toutes les fenêtres.
+    """
+
+    def __init__(self, postings, sizes, verse_offsets, fingerprint):
+        self.postings = postings          # n-gramme → array des ids globaux de versets
+        self.sizes = sizes                # nombre de n-grammes indexés par verset
+        self.verse_offsets = verse_offsets  # id global du 1er verset de chaque sourate
+        self.fingerprint = fingerprint
+
+    # 🏗️ Construction
+    @classmethod
+    def build(cls, corpus, n=NGRAM_SIZE, max_df_ratio=MAX_DF_RATIO):
+        """
+        Construit l'index depuis le corpus binaire (textes déjà normalisés).
+        """
+        verse_grams = [char_ngrams(corpus.verse_text(vid), n) for vid in range(corpus.n_verses)]
+        verse_offsets = [corpus.sourate_verses(s_idx)[0] for s_idx in range(corpus.n_suras)]
+
+        raw_postings = {}
+        for vid, grams in enumerate(verse_grams):
+            for g in grams:
+                raw_postings.setdefault(g, []).append(vid)
+
+        max_df = max(1, int(len(verse_grams) * max_df_ratio))
+        postings = {g: array("i", ids) for g, ids in raw_postings.items() if len(ids) <= max_df}
+        sizes = array("i", (sum(1 for g in grams if g in postings) for grams in verse_grams))
+
+        return cls(postings, sizes, verse_offsets, corpus.fingerprint)
+
+    # 💾 Persistance
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump({
+                "version": INDEX_VERSION,
+                "postings": self.postings,
+                "sizes": self.sizes,
+                "verse_offsets": self.verse_offsets,
+                "fingerprint": self.fingerprint,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Version d'index incompatible : {data.get('version')}")
+        return cls(data["postings"], data["sizes"], data["verse_offsets"], data["fingerprint"])
+
+    # 🔍 Recherche
+    def verse_hits(self, query_grams):
+        """
+        Compte, pour chaque verset, le nombre de n-grammes partagés avec la requête.
+        """
+        hits = [0] * len(self.sizes)
+        for g in query_grams:
+            for vid in self.postings.get(g, ()):
+                hits[vid] += 1
+        return hits
+
+    def candidates(self, text, window_sizes=(1, 2, 3, 4, 5), n_seeds=30, n_candidates=40):
+        """
+        Retourne les fenêtres candidates [(first_vid, last_vid), ...] (ids globaux de versets,
+        bornes incluses, dans une même sourate), triées par score estimé.
+        Le score estimé est un Dice n-gramme calculé par sommes, sans alignement.
+        """
+        query_grams = char_ngrams(text)
+        q_size = self.query_size(query_grams)
+        if q_size == 0:
+            return []
+
+        hits = self.verse_hits(query_grams)
+
+        # 🌱 Versets « graines » : beaucoup de n-grammes partagés, peu de bruit
+        seeds = self.top_seeds((vid for vid, h in enumerate(hits) if h), hits, n_seeds)
+
+        estimates = {}
+        for vid in seeds:
+            for span in self.spans_around(vid, window_sizes):
+                if span not in estimates:
+                    estimates[span] = self.estimate(hits, q_size, span)
+
+        best = sorted(estimates.items(), key=lambda kv: -kv[1])[:n_candidates]
+        tracing.count("candidates_pruned", len(estimates) - len(best))
+        return [span for span, _ in best]
+
+    def query_size(self, query_grams):
+        """Nombre de n-grammes de la requête présents dans l'index."""
+        return sum(1 for g in query_grams if g in self.postings)
+
+    def top_seeds(self, vids, hits, n_seeds):
+        sizes = self.sizes
+        return sorted(vids, key=lambda vid: -(hits[vid] * hits[vid]) / (sizes[vid] or 1))[:n_seeds]
+
+    def spans_around(self, vid, window_sizes):
+        """Fenêtres (first_vid, last_vid) de tailles window_sizes contenant vid, sans déborder de la sourate."""
+        s_idx = self._sourate_of(vid)
+        first = self.verse_offsets[s_idx]
+        last = self._sourate_end(s_idx) - 1
+        for w in window_sizes:
+            for start in range(max(first, vid - w + 1), min(vid, last - w + 1) + 1):
+                yield (start, start + w - 1)
+
+    def estimate(self, hits, q_size, span):
+        """Dice n-gramme approché d'une fenêtre, à partir des compteurs par verset."""
+        start, end = span
+        inter = min(q_size, sum(hits[start:end + 1]))
+        size = sum(self.sizes[start:end + 1])
+        return 2 * inter / (q_size + size)
+
+    def _sourate_of(self, vid):
+        lo, hi = 0, len(self.verse_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.verse_offsets[mid] <= vid:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def _sourate_end(self, s_idx):
+        if s_idx + 1 < len(self.verse_offsets):
+            return self.verse_offsets[s_idx + 1]
+        return len(self.sizes)
+
+
+_INDEX_CACHE = {}
+
+def get_verse_index(corpus, path=INDEX_PATH):
+    """
+    Charge l'index depuis le disque (ou le construit et le sauvegarde s'il est absent
+    ou obsolète par rapport au corpus). Mémorisé en mémoire pour les requêtes suivantes.
+    """
+    cached = _INDEX_CACHE.get(path)
+    if cached is not None and cached.fingerprint == corpus.fingerprint:
+        return cached
+
+    index = None
+    if os.path.exists(path):
+        try:
+            index = VerseIndex.load(path)
+        except Exception as e:
+            print(f"⚠️ Index illisible, reconstruction : {e}")
+        if index is not None and index.fingerprint != corpus.fingerprint:
+            index = None
+
+    if index is None:
+        index = VerseIndex.build(corpus)
+        index.save(path)
+
+    _INDEX_CACHE[path] = index
+    return index
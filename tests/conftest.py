@@ -0,0 +1,7 @@
+# 🧪 Les scripts s'exécutent depuis la racine du dépôt avec scripts/ dans le chemin d'import
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+os.chdir(ROOT)
@@ -0,0 +1,48 @@
+# 🧭 Alignement d'une récitation synthétique (mots bruités, horodatage connu) sur Al-Baqara
+import random
+import pytest
+from detect_versets import load_versets
+from utils.align import align_transcript
+from utils.synthetic import perturb_text
+
+S_IDX = 1  # Al-Baqara
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return load_versets("quran_versets.json")
+
+
+def recite(corpus, vids, seed=0, error_rate=0.08):
+    """Segment Whisper synthétique (un mot toutes les 0,5 s, 1 s entre versets) et début réel de chaque verset."""
+    rng = random.Random(seed)
+    t, words, starts = 0.0, [], {}
+    for vid in vids:
+        starts[corpus.verse_id(vid)] = t
+        for w in perturb_text(corpus.verse_text(vid), error_rate, rng).split():
+            words.append({"word": " " + w, "start": t, "end": t + 0.4})
+            t += 0.5
+        t += 1.0
+    return [{"start": 0.0, "end": t, "text": "", "words": words}], starts
+
+
+def placed_within(result, starts, tolerance=0.5):
+    hits = [v for v in result["verses"] if v["verse"] in starts and abs(v["start"] - starts[v["verse"]]) < tolerance]
+    return len(hits) / len(starts)
+
+
+def test_full_sura(corpus):
+    first, count = corpus.sourate_verses(S_IDX)
+    segments, starts = recite(corpus, range(first, first + count))
+    result = align_transcript(segments, corpus, s_idx=S_IDX)
+    assert placed_within(result, starts) > 0.95
+
+
+def test_skipped_verses(corpus):
+    # Versets 1–20 puis 200–230 : les ancres font sauter la bande de plusieurs milliers de mots
+    first, _ = corpus.sourate_verses(S_IDX)
+    vids = list(range(first, first + 20)) + list(range(first + 199, first + 230))
+    segments, starts = recite(corpus, vids)
+    for band in (8, 48):
+        result = align_transcript(segments, corpus, s_idx=S_IDX, band=band)
+        assert placed_within(result, starts) > 0.9
@@ -0,0 +1,59 @@
+# 💾 Cache de features : entrées partagées entre l'indexation (01) et l'inférence
+import numpy as np
+import pytest
+import predict_imam
+from utils import audio, feature_cache
+from utils.bench import TinyCNN
+from utils.feature_cache import FeatureCache
+from utils.mfcc import extract_mfcc_from_file
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = FeatureCache(str(tmp_path / "features"))
+    monkeypatch.setattr(feature_cache, "_caches", {feature_cache.CACHE_DIR: cache})
+    return cache
+
+
+def test_inference_reuses_indexing_entries(cache, tmp_path, monkeypatch):
+    decodes = []
+
+    def fake_decode(path):
+        decodes.append(path)
+        return np.random.default_rng(len(path)).standard_normal(16000).astype(np.float32)
+
+    monkeypatch.setattr(audio, "load_audio_buffer", fake_decode)
+    path = str(tmp_path / "001-recitation.mp3")
+    with open(path, "wb") as f:
+        f.write(b"audio")
+
+    _, mfcc, error = extract_mfcc_from_file(path, use_cache=True)  # 01_index_audio.py
+    assert error is None and len(decodes) == 1
+
+    cnn = TinyCNN(n_classes=4)
+    top = predict_imam.predict_imam(path, None, None, model=cnn, label_encoder=cnn)
+    assert len(top) == 3
+    assert len(decodes) == 1  # vecteur lu dans le cache : ni décodage ni MFCC
+    assert cache.hits == 1
+
+    # Tampon déjà décodé sans chemin (pipeline.py) : entrée propre au contenu du tampon
+    y = fake_decode(path)
+    predict_imam.predict_imam(None, None, None, y=y, model=cnn, label_encoder=cnn)
+    predict_imam.predict_imam(None, None, None, y=y, model=cnn, label_encoder=cnn)
+    assert cache.hits == 2
+
+
+def test_overwrite_does_not_grow_size(tmp_path):
+    cache = FeatureCache(str(tmp_path / "features"), max_bytes=10 ** 6)
+    key = FeatureCache.key("digest")
+    for _ in range(5):
+        cache.put(key, np.zeros(1000))
+    assert cache.stats()["bytes"] == sum(size for _, _, size in cache._entries())
+    assert cache.stats()["entries"] == 1
+
+    # Avec le double comptage, ces écrasements déclenchaient l'éviction d'entrées voisines
+    small = FeatureCache(str(tmp_path / "small"), max_bytes=3 * 8200)
+    small.put(FeatureCache.key("other"), np.zeros(1000))
+    for _ in range(5):
+        small.put(key, np.zeros(1000))
+    assert small.stats()["entries"] == 2
@@ -0,0 +1,72 @@
+# 🗄️ Feature store : tri interrompu entre l'échange des features et celui des métadonnées
+import os
+import numpy as np
+import pytest
+from utils import feature_store
+from utils.feature_store import FeatureStore
+
+
+def filled_store(path, n=200):
+    store = FeatureStore(str(path), dim=4)
+    rng = np.random.default_rng(0)
+    entries = []
+    for k in range(n):
+        imam = f"imam_{rng.integers(5)}"
+        sourate = int(rng.integers(1, 115))
+        # Le vecteur encode sa propre clé : toute ligne dépareillée est détectable
+        entries.append({"imam": imam, "sourate": sourate, "file_path": f"{imam}/{k}.mp3",
+                        "augmentation": "original", "mfcc": [int(imam[-1]), sourate, k, 0]})
+    store.append(entries)
+    return store
+
+
+def assert_paired(store):
+    features, meta = np.asarray(store.features()), np.asarray(store.meta())
+    for row_feat, (imam_id, sourate, file_id, _) in zip(features, meta):
+        assert store.dictionaries["imam"][imam_id] == f"imam_{int(row_feat[0])}"
+        assert sourate == row_feat[1]
+        assert store.dictionaries["file_path"][file_id].endswith(f"/{int(row_feat[2])}.mp3")
+
+
+def test_crash_between_swaps_is_recovered(tmp_path, monkeypatch):
+    store = filled_store(tmp_path / "store")
+    replace = os.replace
+
+    def crash_on_meta(src, dst):
+        if dst.endswith("meta.i32"):
+            raise KeyboardInterrupt("crash simulé")
+        replace(src, dst)
+
+    monkeypatch.setattr(feature_store.os, "replace", crash_on_meta)
+    with pytest.raises(KeyboardInterrupt):
+        store.sort_by_key()
+    monkeypatch.setattr(feature_store.os, "replace", replace)
+    assert os.path.exists(tmp_path / "store" / "sort.json")  # features triées, métadonnées pas encore
+
+    reopened = FeatureStore(str(tmp_path / "store"), create=False)
+    assert not os.path.exists(tmp_path / "store" / "sort.json")
+    assert_paired(reopened)
+    assert not reopened.sort_by_key()  # l'échange repris a bien produit le store trié
+
+
+def test_crash_before_marker_keeps_original(tmp_path, monkeypatch):
+    store = filled_store(tmp_path / "store")
+    before = np.asarray(store.meta()).copy()
+
+    sync = feature_store._sync
+
+    def crash_on_marker(f):
+        if f.name.endswith("sort.json.tmp"):
+            raise KeyboardInterrupt("crash simulé")
+        sync(f)
+
+    monkeypatch.setattr(feature_store, "_sync", crash_on_marker)
+    with pytest.raises(KeyboardInterrupt):
+        store.sort_by_key()
+    monkeypatch.undo()
+
+    reopened = FeatureStore(str(tmp_path / "store"), create=False)
+    assert np.array_equal(np.asarray(reopened.meta()), before)
+    assert_paired(reopened)
+    assert reopened.sort_by_key()
+    assert_paired(reopened)
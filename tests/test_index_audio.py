@@ -0,0 +1,92 @@
+# 🗂️ Indexation (01_index_audio.py) contre le stand-in OpenSearch en mémoire, sans ffmpeg ni cluster
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from opensearchpy import helpers
+from utils.feature_store import FeatureStore
+
+index_audio = importlib.import_module("01_index_audio")
+
+
+@pytest.fixture
+def indexer(monkeypatch):
+    """Décodeur factice (MFCC dérivés du chemin) et workers en threads : aucun ffmpeg, aucun spawn."""
+    def fake_extract(file_path, use_cache=False):
+        seed = int(index_audio.doc_id(file_path)[:8], 16)
+        return file_path, np.random.default_rng(seed).standard_normal(26).tolist(), None
+
+    monkeypatch.setattr(index_audio, "extract_mfcc_from_file", fake_extract)
+    monkeypatch.setattr(index_audio, "ProcessPoolExecutor", lambda max_workers=None: ThreadPoolExecutor(max_workers))
+    return index_audio
+
+
+@pytest.fixture
+def audio_tree(tmp_path):
+    base = tmp_path / "data"
+    for imam in ("Dosari", "Sudais"):
+        (base / imam).mkdir(parents=True)
+        for sourate in range(1, 13):
+            (base / imam / f"{sourate:03d}-recitation.mp3").write_bytes(b"")
+    (base / "Sudais" / "notes.txt").write_text("ignoré")
+    return base
+
+
+def test_resume_set_beyond_10k_documents(indexer):
+    client = indexer.make_client(stub=True)
+    paths = [f"/data/imam_{k % 7}/{k:05d}-x.mp3" for k in range(12345)]
+    actions = ({"_index": indexer.INDEX_NAME, "_id": indexer.doc_id(p), "_source": {"file_path": p}} for p in paths)
+    helpers.bulk(client, actions, chunk_size=2000)
+
+    assert client.count(index=indexer.INDEX_NAME)["count"] == len(paths)
+    assert indexer.indexed_paths(client, scan_size=1000) == set(paths)
+    assert not client._scrolls  # scroll libéré en fin de parcours
+
+
+def test_rerun_deduplicates_by_id(indexer, audio_tree, tmp_path):
+    client = indexer.make_client(stub=True)
+    store = FeatureStore(str(tmp_path / "store"), dim=26)
+    files = indexer.collect_files(str(audio_tree), skip=set())
+    assert len(files) == 24
+
+    stats = indexer.run(client, files, store, workers=2, chunk_size=5, threads=2)
+    assert (stats["indexed"], stats["failed"], stats["errors"]) == (24, 0, 0)
+    docs = client._docs[indexer.INDEX_NAME]
+    assert set(docs) == {indexer.doc_id(path) for path, _, _ in files}
+
+    # Relance complète (sans reprise) : mêmes _id, documents remplacés et non dupliqués
+    indexer.run(client, files, store, workers=2, chunk_size=7, threads=2)
+    assert client.count(index=indexer.INDEX_NAME)["count"] == 24
+
+    # Reprise : plus rien à indexer
+    assert indexer.collect_files(str(audio_tree), indexer.indexed_paths(client)) == []
+
+
+def test_single_writer_store_output(indexer, audio_tree, tmp_path, monkeypatch):
+    client = indexer.make_client(stub=True)
+    store = FeatureStore(str(tmp_path / "store"), dim=26)
+    files = indexer.collect_files(str(audio_tree), skip=set())
+
+    writers = set()
+    append = store.append
+
+    def tracking_append(entries):
+        writers.add(threading.get_ident())
+        return append(entries)
+
+    monkeypatch.setattr(store, "append", tracking_append)
+    monkeypatch.setattr(indexer, "WRITE_BATCH", 5)  # plusieurs appends par run
+    for _ in range(2):
+        # Un seul thread écrit pendant un run (celui qui consomme les actions de parallel_bulk)
+        writers.clear()
+        indexer.run(client, files, store, workers=4, chunk_size=3, threads=3)
+        assert len(writers) == 1
+
+    assert len(store) == len(files)  # une ligne par fichier, aucune en double après la relance
+    meta = store.meta()
+    paths = [store.dictionaries["file_path"][i] for i in meta[:, 2]]
+    assert sorted(paths) == sorted(path for path, _, _ in files)
+    assert set(meta[:, 3]) == {store.code("augmentation", "original")}
+    reopened = FeatureStore(str(tmp_path / "store"), create=False)
+    assert np.array_equal(np.asarray(reopened.features()), np.asarray(store.features()))
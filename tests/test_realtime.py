@@ -0,0 +1,44 @@
+# 🎙️ Session temps réel : un verset détecté par énoncé, latence indépendante de la durée du flux
+from time import perf_counter
+import numpy as np
+import pytest
+import transcribe_audio
+from detect_versets import load_versets
+from utils.realtime import RealtimeSession
+
+S_IDX = 1  # Al-Baqara
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return load_versets("quran_versets.json")
+
+
+def test_replay_detects_every_verse_with_flat_latency(corpus, monkeypatch):
+    first, count = corpus.sourate_verses(S_IDX)
+    vids = range(first, first + count)
+    queue = []
+    # Whisper factice : chaque énoncé est transcrit en un verset exact
+    monkeypatch.setattr(transcribe_audio, "transcribe_audio",
+                        lambda audio, model=None, use_cache=False: [{"text": queue.pop(0)}])
+
+    session = RealtimeSession(corpus, whisper_model=None, scorer="difflib")
+    sr = session.sr
+    detected, costs = set(), []
+    for k, vid in enumerate(vids):
+        queue.append(corpus.verse_text(vid))
+        start = perf_counter()
+        event = session._utterance(k * sr, (k + 1) * sr, start)
+        costs.append(perf_counter() - start)
+        if event["match"]:
+            m = event["match"]
+            detected.update(range(int(m["start_verse"]), int(m["end_verse"]) + 1))
+
+    ids = {int(corpus.verse_id(vid)) for vid in vids}
+    assert len(session.matches) > count // 2  # une émission par verset (ou par paire de versets courts)
+    assert len(detected & ids) / len(ids) > 0.9
+    assert int(session.matches[-1]["end_verse"]) == int(corpus.verse_id(vids[-1]))
+    assert len(session.pending) <= session.match_window
+    # Coût par énoncé borné : la fin du flux ne coûte pas plus que le début
+    early, late = np.median(costs[10:60]), np.median(costs[-50:])
+    assert late < 3 * early + 0.01
@@ -0,0 +1,61 @@
+# 💾 Cache de transcriptions : un checkpoint Whisper = une identité, jamais ses seules dimensions
+import sys
+import types
+import numpy as np
+import pytest
+import transcribe_audio
+from utils import transcript_cache
+from utils.transcript_cache import TranscriptCache, transcript_key
+
+BASE_URL = "https://openaipublic.azureedge.net/main/whisper/models"
+
+
+class FakeModel:
+    dims = {"n_audio_state": 1280, "n_text_layer": 32}  # mêmes dimensions pour tous les checkpoints
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+
+    def transcribe(self, audio, language="ar", verbose=False, **options):
+        self.calls += 1
+        return {"segments": [{"start": 0.0, "end": 1.0, "text": self.name}]}
+
+
+@pytest.fixture
+def whisper(tmp_path, monkeypatch):
+    module = types.SimpleNamespace(
+        __version__="test",
+        _MODELS={"large-v1": f"{BASE_URL}/{'1' * 64}/large-v1.pt", "large-v2": f"{BASE_URL}/{'2' * 64}/large-v2.pt"},
+        load_model=FakeModel,
+    )
+    monkeypatch.setitem(sys.modules, "whisper", module)
+    monkeypatch.setattr(transcript_cache, "_caches",
+                        {transcript_cache.CACHE_DIR: TranscriptCache(str(tmp_path / "transcripts"))})
+    transcribe_audio.load_whisper_model.cache_clear()
+    yield module
+    transcribe_audio.load_whisper_model.cache_clear()
+
+
+def test_checkpoints_of_same_size_do_not_share_entries(whisper, tmp_path):
+    y = np.zeros(16000, dtype=np.float32)
+    checkpoint = tmp_path / "finetuned.pt"
+    checkpoint.write_bytes(b"weights")
+
+    models = [transcribe_audio.load_whisper_model(name) for name in ("large-v1", "large-v2", str(checkpoint))]
+    keys = {transcript_key(y, model, "ar", {}) for model in models}
+    assert len(keys) == 3
+
+    for model in models:
+        assert transcribe_audio.transcribe_audio(y, model=model)[0]["text"] == model.name
+        assert transcribe_audio.transcribe_audio(y, model=model)[0]["text"] == model.name
+        assert model.calls == 1  # seconde analyse servie par le cache
+
+
+def test_unknown_model_is_not_cached(whisper):
+    y = np.zeros(16000, dtype=np.float32)
+    model = FakeModel("chargé hors de load_whisper_model")
+    transcribe_audio.transcribe_audio(y, model=model)
+    transcribe_audio.transcribe_audio(y, model=model)
+    assert model.calls == 2
+    assert transcribe_audio.load_whisper_model("introuvable").sawt_tag is None